@@ -4,11 +4,16 @@ Module Description
 ==================
 This module contains the class in charge of spawning a second process to run
 the simulation. It takes care of receiving and sending messages between the
-main and simulation process via a pipe and an alternate thread. This module
-is not used in the final project as we did not find time to extensively
-test this multiprocessing. In the future, the graphics rendering will be
-decoupled from the simulation processing to prevent the graphics from slowing
-down the simulation.
+main and simulation process via a pipe and an alternate thread. The simulation
+process runs as fast as it can, independently of the graphics, and sends the
+state of the city at most FRAME_RATE times a second. The main process only
+keeps the latest frame it received, so slow rendering drops stale frames
+instead of falling behind the simulation.
+
+By default, frames are written to shared memory (see SharedFrameBuffer) instead
+of being sent over the pipe, which then only carries commands and the name of
+the shared memory. Frames sent over the pipe are delta frames (see
+GraphicsData), which are all applied as they arrive.
 
 Copyright and Usage Information
 ===============================
@@ -20,21 +25,30 @@ using this code in any other way is prohibited.
 
 This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
-import pygame
 import logging
+import time
 from multiprocessing import Process, Pipe
-from threading import Thread, Lock
-from sim.sim_manager import SimManager
-from typing import Optional
+from threading import Thread, Lock, Event
+from sim.sim_manager import SimManager, SimParams, GraphicsData
+from shared_frames import SharedFrameBuffer
+from typing import Any, Optional
 from my_queue import Queue
-import copy
+import numpy as np
 
 
 class AppSimComms:
     """
     In charge of communicating with Sim process and
     maintaining graphical info that it sends
+
+    Messages sent by the sim process are (events, frame_info) pairs, where frame_info is one of
+    the dictionaries made by GraphicsData. When frames are shared in memory, the only frame_info sent
+    is a static one holding the handle of the SharedFrameBuffer under "shared_memory". Messages sent
+    to it are "END" to end it, or (command, value) pairs, see run_simulation_process.
     """
+    # Most frames sent by the sim process per second
+    FRAME_RATE = 60
+
     def __init__(self, app):
         self._sim_process: Optional[Process] = None
         # Connection between sim process and main app process
@@ -44,40 +58,98 @@ class AppSimComms:
         self._sim_events = Queue()
         # Updated via receiver thread
         self._latest_frame_info = None
+        self._static_frame_info = None
+        self._frame_buffer: Optional[SharedFrameBuffer] = None
+        # Applies the delta frames received, and a copy of the state it decoded from them
+        self._graphics_data = GraphicsData()
+        self._latest_frame = None
         self._latest_frame_info_lock = Lock()
+        # Set once the static frame info arrives
+        self._static_received = Event()
 
         # Parent app class
         self._app = app
 
-    def get_latest_frame_info(self):
+    def get_latest_frame_info(self) -> Optional[dict]:
+        """Return the latest dynamic frame info sent by the sim, None if none arrived yet"""
         with self._latest_frame_info_lock:
             f = self._latest_frame_info
         return f
 
+    def get_latest_frame(self) -> Optional[np.ndarray]:
+        """Return the state of every person decoded from the latest delta frame (see DeltaDecoder.frame),
+        None if it isn't known yet"""
+        with self._latest_frame_info_lock:
+            f = self._latest_frame
+        return f
+
+    def get_static_frame_info(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Return the static frame info sent once by the sim when it starts, waiting up to timeout seconds
+        for it to arrive (forever if None). Return None if it didn't arrive in time"""
+        self._static_received.wait(timeout)
+        with self._latest_frame_info_lock:
+            f = self._static_frame_info
+        return f
+
+    def get_frame_buffer(self) -> Optional[SharedFrameBuffer]:
+        """Return the shared memory the sim process writes its frames to, None if it sends them over the pipe
+        or the static frame info didn't arrive yet"""
+        return self._frame_buffer
+
     def get_next_sim_event(self):
         return self._sim_events.dequeue()
 
     def is_sim_queue_empty(self):
         return self._sim_events.is_empty()
 
-    def start_simulation(self):
-        if not self._sim_process.is_alive():
+    def is_running(self) -> bool:
+        """Return whether the sim process is alive"""
+        return self._sim_process is not None and self._sim_process.is_alive()
+
+    def start_simulation(self, sim_params: SimParams, sim_speed_s: float = 10, use_shared_memory: bool = True,
+                         **kwargs) -> None:
+        """Start a sim process simulating a city made from sim_params, progressed by sim_speed_s each
+        step, and sharing its frames in memory if use_shared_memory. Other keyword arguments are passed on
+        to its SimManager"""
+        if not self.is_running():
             # Creates duplex connection pair
             self._conn, child_conn = Pipe()
 
-            # Creates and starts simulation process
+            # Creates and starts simulation process, which creates its own sim manager
             self._sim_process = Process(target=AppSimComms.run_simulation_process,
-                                        args=(SimManager(), child_conn),
+                                        args=(sim_params, child_conn, sim_speed_s, use_shared_memory, kwargs),
                                         daemon=True)
             self._sim_process.start()
+            # Only the child uses its end of the pipe
+            child_conn.close()
 
             # Starts reception thread
             Thread(target=self.sim_receiver, daemon=True).start()
 
-    def stop_simulation(self):
-        if self._sim_process.is_alive():
+    def stop_simulation(self, timeout: Optional[float] = 5) -> None:
+        """End the sim process, waiting up to timeout seconds for it to write out its data"""
+        if self.is_running():
             # Sends string to end process
-            self._conn.send("END")
+            self.send_command("END")
+            self._sim_process.join(timeout)
+        if self._frame_buffer is not None:
+            self._frame_buffer.close()
+
+    def set_sim_speed(self, sim_speed_s: float) -> None:
+        """Make the sim process progress the sim by sim_speed_s each step"""
+        self.send_command(("SPEED", sim_speed_s))
+
+    def set_paused(self, is_paused: bool) -> None:
+        """Pause or resume the sim process"""
+        self.send_command(("PAUSE", is_paused))
+
+    def send_command(self, command: Any) -> None:
+        """Send command to the sim process, if it is running"""
+        if self.is_running():
+            try:
+                self._conn.send(command)
+            except (BrokenPipeError, OSError):
+                logging.warning("Sim process closed before receiving " + repr(command))
 
     def sim_receiver(self):
         while True:
@@ -89,30 +161,43 @@ class AppSimComms:
                 for event in events:
                     self._sim_events.enqueue(event)
 
-                # Sets latest frame with lock
+                # Sets latest frame with lock, replacing any frame not drawn yet
                 with self._latest_frame_info_lock:
-                    self._latest_frame_info = frame_info
-            except TypeError:
+                    if GraphicsData.Types(frame_info["type"]) == GraphicsData.Types.STATIC:
+                        if "shared_memory" in frame_info:
+                            self._frame_buffer = SharedFrameBuffer.attach(frame_info["shared_memory"])
+                        self._static_frame_info = frame_info
+                    elif GraphicsData.Types(frame_info["type"]) == GraphicsData.Types.DELTA:
+                        # Every delta frame is applied, but only the state after the latest is kept
+                        if self._graphics_data.apply_delta_info(frame_info):
+                            self._latest_frame = self._graphics_data.frame.copy()
+                    else:
+                        self._latest_frame_info = frame_info
+                if self._static_frame_info is not None:
+                    self._static_received.set()
+            except (TypeError, ValueError, KeyError):
                 logging.error("Sim Manager sent data in an unexpected format.")
             except (EOFError, OSError):
                 # Occurs when simulation process closes its connection
                 # Or if own connection is closed
                 break
 
+        # Stops waiting for a static frame which won't come
+        self._static_received.set()
         self._conn.close()
 
     @staticmethod
-    def run_simulation_process(sim_manager, conn):
+    def run_simulation_process(sim_params: SimParams, conn, sim_speed_s: float, use_shared_memory: bool,
+                               sim_kwargs: dict):
         logging.info("Sim Process successfully started")
 
-        # Data received from main process
-        data_list = []
         # Send "END" string over pipe to end simulation process
         is_running = True
+        is_paused = False
 
         # Receives data from main app on a separate thread
         def recv_data():
-            nonlocal is_running
+            nonlocal is_running, is_paused, sim_speed_s
 
             while True:
                 try:
@@ -126,16 +211,49 @@ class AppSimComms:
                 # Send "END" special string to end this process
                 if data == "END":
                     is_running = False
+                    break
+                elif isinstance(data, tuple) and data[0] == "SPEED":
+                    sim_speed_s = data[1]
+                elif isinstance(data, tuple) and data[0] == "PAUSE":
+                    is_paused = data[1]
                 else:
-                    data_list.append(conn.recv())
-        Thread(target=recv_data, daemon=True).start()
+                    logging.warning("Sim process received unknown command " + repr(data))
 
-        while is_running:
-            # Progresses sim and gets the output of the progression
-            events, frame_info = sim_manager.progress_simulation(5)
-            conn.send(events, frame_info)
+        # The sim is built here rather than in the main process, so that only frames cross the pipe
+        sim_manager = SimManager(sim_params, **sim_kwargs)
+        frame_buffer: Optional[SharedFrameBuffer] = None
+        try:
+            if use_shared_memory:
+                frame_buffer = SharedFrameBuffer.create(sim_manager.city)
+                conn.send(([], {"type": GraphicsData.Types.STATIC.value,
+                                "shared_memory": frame_buffer.get_handle()}))
+            else:
+                conn.send(([], sim_manager.get_static_graphics_data()))
+            Thread(target=recv_data, daemon=True).start()
+
+            last_frame = 0.0
+            while is_running:
+                if is_paused:
+                    time.sleep(1 / AppSimComms.FRAME_RATE)
+                else:
+                    sim_manager.progress_simulation(sim_speed_s)
 
-        # Closes connection
-        conn.close()
+                # Steps finishing sooner than a frame after the last one sent aren't sent at all
+                if time.perf_counter() - last_frame >= 1 / AppSimComms.FRAME_RATE:
+                    if frame_buffer is not None:
+                        frame_buffer.write_frame(sim_manager.city)
+                    else:
+                        conn.send(([], sim_manager.get_delta_graphics_data()))
+                    last_frame = time.perf_counter()
+        except (BrokenPipeError, OSError):
+            # The main process is gone, so nobody is left to draw the frames
+            pass
+        finally:
+            # Writes out the sim data still buffered, and closes connection. The main process can keep
+            # reading the last frames until it closes the shared memory too
+            sim_manager.close()
+            if frame_buffer is not None:
+                frame_buffer.close()
+            conn.close()
 
         logging.info("Sim Process successfully finished")
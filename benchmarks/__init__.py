@@ -0,0 +1,17 @@
+"""CovSim Benchmarks Package
+
+Package Description
+==================
+This package contains micro-benchmarks of performance critical parts of the simulation. Each module
+can be run on its own, e.g. python -m benchmarks.bench_geometry
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
@@ -0,0 +1,109 @@
+"""CovSim Benchmarks: Geometry
+
+Module Description
+==================
+Micro-benchmark of the geometry primitives, which are created and combined on every step of
+every path. Prints the cost of each operation in nanoseconds, and the memory taken by each Point.
+Passing a git revision with --baseline also times the geometry module as it was at that revision,
+for comparison, e.g.
+
+    python -m benchmarks.bench_geometry --baseline HEAD~1
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from types import ModuleType
+from typing import Optional
+import argparse
+import subprocess
+import sys
+import timeit
+import tracemalloc
+import geometry.geometry
+
+# Statement timed for each operation, run with p, q, v and r defined as below
+OPERATIONS = {
+    'Point(x, y)': 'g.Point(1.5, 2.5)',
+    'p + q': 'p + q',
+    'p - q': 'p - q',
+    'p * 2.0': 'p * 2.0',
+    'p / 2.0': 'p / 2.0',
+    'p + (1, 1)': 'p + (1, 1)',
+    'p == q': 'p == q',
+    'p[0], p[1]': 'p[0], p[1]',
+    'x, y = p': 'x, y = p',
+    'Vector(p, q)': 'g.Vector(p, q)',
+    'v.get_bounding_box()': 'v.get_bounding_box()',
+    'Rectangle(...)': 'g.Rectangle(0, 0, 10, 10)',
+    'r.is_point_inside(p)': 'r.is_point_inside(p)',
+    'r.is_vector_intersect(v)': 'r.is_vector_intersect(v)',
+}
+
+SETUP = 'p = g.Point(1.5, 2.5); q = g.Point(3.5, 2.5); v = g.Vector(p, q); r = g.Rectangle(2, 0, 10, 10)'
+
+
+def time_operations(g: ModuleType, repeat: int = 5, number: int = 100000) -> dict[str, float]:
+    """Return the best time of each operation in OPERATIONS in nanoseconds, using the geometry module g"""
+    times = {}
+    for name, statement in OPERATIONS.items():
+        timer = timeit.Timer(statement, SETUP, globals={'g': g})
+        times[name] = min(timer.repeat(repeat, number)) / number * 1e9
+    return times
+
+
+def point_size(g: ModuleType, count: int = 100000) -> float:
+    """Return the average bytes allocated by each of count Points of the geometry module g"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    points = [g.Point(i, i) for i in range(count)]
+    size = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    del points
+    return size
+
+
+def load_revision(revision: str) -> ModuleType:
+    """Return the geometry module as it was at the git revision"""
+    source = subprocess.run(['git', 'show', revision + ':geometry/geometry.py'], capture_output=True, text=True,
+                            check=True).stdout
+    module = ModuleType('geometry_' + revision)
+    exec(compile(source, revision + ':geometry/geometry.py', 'exec'), module.__dict__)
+    return module
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run the benchmark with the command line arguments in argv (sys.argv by default)"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_geometry',
+                                     description="Time the geometry primitives")
+    parser.add_argument('--baseline', default=None, help="git revision to compare against")
+    parser.add_argument('--number', type=int, default=100000, help="runs of each operation per repeat")
+    args = parser.parse_args(argv)
+
+    modules = {'current': geometry.geometry}
+    if args.baseline is not None:
+        modules = {args.baseline: load_revision(args.baseline), **modules}
+
+    results = {label: time_operations(g, number=args.number) for label, g in modules.items()}
+    sizes = {label: point_size(g) for label, g in modules.items()}
+
+    labels = list(modules)
+    print('operation'.ljust(28) + ''.join(label.rjust(14) for label in labels) +
+          ('speedup'.rjust(10) if len(labels) == 2 else ''))
+    for name in OPERATIONS:
+        row = name.ljust(28) + ''.join((str(round(results[label][name])) + ' ns').rjust(14) for label in labels)
+        if len(labels) == 2:
+            row += (str(round(results[labels[0]][name] / results[labels[1]][name], 2)) + 'x').rjust(10)
+        print(row)
+    print('bytes per Point'.ljust(28) + ''.join(str(round(sizes[label])).rjust(14) for label in labels))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""CovSim Benchmarks: Import
+
+Module Description
+==================
+Benchmark of how long the simulation packages take to import, which every worker process of an
+ensemble pays before running anything. Each module is imported in fresh interpreters, and the median
+time is printed along with the slowest modules it pulled in. The benchmark fails if a module pulls
+in pygame, or takes longer than --max-ms, so that it can guard startup time, e.g.
+
+    python -m benchmarks.bench_import --max-ms 500
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import statistics
+import subprocess
+import sys
+
+# Modules a headless run or ensemble worker imports
+MODULES = ['sim', 'geometry.geometry', 'sim.sim_manager', 'sim.run', 'sim.ensemble']
+
+# Modules which must never be imported by the simulation
+FORBIDDEN = ['pygame']
+
+# Run in a fresh interpreter, printing the seconds the import took and the forbidden modules it imported
+PROBE = ("import sys, time\n"
+         "start = time.perf_counter()\n"
+         "import {module}\n"
+         "print(time.perf_counter() - start)\n"
+         "print(','.join(m for m in {forbidden!r} if m in sys.modules))\n")
+
+
+def time_import(module: str, runs: int = 5) -> tuple[float, list[str]]:
+    """Return the median milliseconds it took to import module in runs fresh interpreters, and the
+    forbidden modules it imported"""
+    times = []
+    forbidden = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, forbidden=FORBIDDEN)],
+                                capture_output=True, text=True, check=True).stdout.splitlines()
+        # The probe's own output comes last, after anything the imported modules printed
+        times.append(float(output[-2]) * 1000)
+        forbidden = [m for m in output[-1].split(',') if m]
+    return statistics.median(times), forbidden
+
+
+def slowest_imports(module: str, count: int = 5) -> list[tuple[str, float]]:
+    """Return the count modules imported directly by module (or its parent packages) which took the longest,
+    with their cumulative milliseconds, as reported by python -X importtime"""
+    report = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            capture_output=True, text=True, check=True).stderr
+    lines = [line[len('import time:'):].split('|') for line in report.splitlines()
+             if line.startswith('import time:') and 'cumulative' not in line]
+
+    # Everything up to site is imported at interpreter startup, before the probe runs
+    names = [name.strip() for _, _, name in lines]
+    start = len(names) - names[::-1].index('site') if 'site' in names else 0
+
+    imports = []
+    for _, cumulative, name in lines[start:]:
+        # Each level of nesting is indented by two more spaces
+        if len(name) - len(name.lstrip(' ')) == 3:
+            imports.append((name.strip(), int(cumulative) / 1000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmark with the command line arguments in argv (sys.argv by default), and return the
+    exit status"""
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_import',
+                                     description="Time importing the simulation packages")
+    parser.add_argument('modules', nargs='*', default=MODULES, help="modules to import (default: the sim packages)")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per module (default 5)")
+    parser.add_argument('--max-ms', type=float, default=None, help="fail if any import takes longer than this")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for module in args.modules:
+        median_ms, forbidden = time_import(module, args.runs)
+        print(module.ljust(24) + (str(round(median_ms, 1)) + ' ms').rjust(12))
+        for name, cumulative_ms in slowest_imports(module):
+            print('    ' + name.ljust(20) + (str(round(cumulative_ms, 1)) + ' ms').rjust(12))
+
+        if forbidden:
+            print('    FAIL: imported ' + ', '.join(forbidden))
+            status = 1
+        if args.max_ms is not None and median_ms > args.max_ms:
+            print('    FAIL: slower than ' + str(args.max_ms) + ' ms')
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
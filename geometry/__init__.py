@@ -2,7 +2,7 @@
 
 Package Description
 ==================
-This package contains three modules related to mathematics. See individual
+This package contains modules related to mathematics and spatial lookups. See individual
 descriptions
 
 Copyright and Usage Information
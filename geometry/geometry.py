@@ -17,15 +17,17 @@ This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
 from __future__ import annotations
 import math
+import operator
 from geometry.helpers import *
 from typing import Any, Callable, Union
-import pygame
 
 
 class Point:
     """
     Representation of a 2D point
     """
+    __slots__ = ('x', 'y')
+
     def __init__(self, x: float, y: float):
         self.x = float(x)
         self.y = float(y)
@@ -39,30 +41,52 @@ class Point:
         else:
             raise TypeError("Can only add numerical values to points")
 
+    # Points and numbers are checked before falling back to _perform_operation, since these operators
+    # are called on every step of every path. Their results are already floats, so __init__ is skipped
     def __add__(self, other: Any) -> Point:
-        return self._perform_operation(other, lambda a, b: a + b)
+        if type(other) is Point:
+            return _make_point(self.x + other.x, self.y + other.y)
+        elif type(other) is float or type(other) is int:
+            return _make_point(self.x + other, self.y + other)
+        return self._perform_operation(other, operator.add)
 
     def __sub__(self, other: Any) -> Point:
-        return self._perform_operation(other, lambda a, b: a - b)
+        if type(other) is Point:
+            return _make_point(self.x - other.x, self.y - other.y)
+        elif type(other) is float or type(other) is int:
+            return _make_point(self.x - other, self.y - other)
+        return self._perform_operation(other, operator.sub)
 
     def __truediv__(self, other) -> Point:
-        return self._perform_operation(other, lambda a, b: a / b)
+        if type(other) is float or type(other) is int:
+            return _make_point(self.x / other, self.y / other)
+        elif type(other) is Point:
+            return _make_point(self.x / other.x, self.y / other.y)
+        return self._perform_operation(other, operator.truediv)
 
     def __mul__(self, other) -> Point:
-        return self._perform_operation(other, lambda a, b: a * b)
+        if type(other) is float or type(other) is int:
+            return _make_point(self.x * other, self.y * other)
+        elif type(other) is Point:
+            return _make_point(self.x * other.x, self.y * other.y)
+        return self._perform_operation(other, operator.mul)
 
     def __eq__(self, other: Point):
         return math.isclose(self.x, other.x) and math.isclose(self.y, other.y)
 
     def __getitem__(self, item):
-        if not isinstance(item, int):
+        if type(item) is int and item == 0:
+            return self.x
+        elif type(item) is int and item == 1:
+            return self.y
+        elif not isinstance(item, int):
             raise TypeError("Indexing into a point must be done with integers, not " + str(type(item).__name__))
         elif item not in (0, 1):
             raise IndexError("A point can only be indexed at 0 or 1")
         return self.x if item == 0 else self.y
 
     def __iter__(self):
-        return (self.x, self.y).__iter__()
+        return iter((self.x, self.y))
 
     def __str__(self):
         return "Point" + str(tuple(self))
@@ -74,10 +98,20 @@ class Point:
         return self.__str__()
 
 
+def _make_point(x: float, y: float) -> Point:
+    """Return a new Point from coordinates which are already floats, without converting them"""
+    point = object.__new__(Point)
+    point.x = x
+    point.y = y
+    return point
+
+
 class Vector:
     """
     Representation of a 2D vector
     """
+    __slots__ = ('start', 'end')
+
     def __init__(self, start: Point, end: Point):
         self.start = start
         self.end = end
@@ -100,11 +134,11 @@ class Vector:
 
     def get_bounding_box(self) -> Rectangle:
         """Get the vector's bounding box"""
-        left = min(self.start, self.end, key=lambda p: p[0])[0]
-        width = max(self.start, self.end, key=lambda p: p[0])[0] - left
+        left = min(self.start[0], self.end[0])
+        width = max(self.start[0], self.end[0]) - left
 
-        top = min(self.start, self.end, key=lambda p: p[1])[1]
-        height = max(self.start, self.end, key=lambda p: p[1])[1] - top
+        top = min(self.start[1], self.end[1])
+        height = max(self.start[1], self.end[1]) - top
 
         return Rectangle(
             left=left,
@@ -127,6 +161,8 @@ class Path:
     """
     Representation of a path as a list of sequential points
     """
+    __slots__ = ('points',)
+
     def __init__(self, points: list[Point]):
         self.points = points
 
@@ -135,6 +171,17 @@ class Path:
         in the resulting vector list!"""
         return [Vector(self.points[i], self.points[i + 1]) for i in range(len(self.points) - 1)]
 
+    def get_bounding_box(self) -> Rectangle:
+        """Get the bounding box of all points in the path"""
+        left = min(p.x for p in self.points)
+        top = min(p.y for p in self.points)
+        return Rectangle(
+            left=left,
+            top=top,
+            width=max(p.x for p in self.points) - left,
+            height=max(p.y for p in self.points) - top
+        )
+
     def __iter__(self):
         return iter(self.points)
 
@@ -149,6 +196,8 @@ class Rectangle:
     """
     Rect shape for path finding
     """
+    __slots__ = ('left', 'top', 'width', 'height')
+
     def __init__(self, left: float, top: float, width: float, height: float):
         self.left = left
         self.top = top
@@ -157,12 +206,24 @@ class Rectangle:
 
     def is_vector_intersect(self, vector: Vector) -> bool:
         """Return if vector intersects rectangle, false if vector only touches edges or vertices"""
-        sides = self.get_sides()
-
-        # Checks if any side intersects vector, or if vector's start, end, or midpoint is inside the rect
-        return any(are_vectors_intersecting(side, vector) for side in sides) or \
-            self.is_point_inside(vector.start) or \
-            self.is_point_inside(vector.end) or self.is_point_inside(midpoint(vector))
+        # Clips the vector to the rectangle's bounds, as a range of fractions along the vector
+        t_min, t_max = 0.0, 1.0
+        dx, dy = vector.end.x - vector.start.x, vector.end.y - vector.start.y
+        for delta, start, low, high in ((dx, vector.start.x, self.left, self.left + self.width),
+                                        (dy, vector.start.y, self.top, self.top + self.height)):
+            if delta == 0:
+                if not low <= start <= high:
+                    return False
+                continue
+            t0, t1 = (low - start) / delta, (high - start) / delta
+            t_min, t_max = max(t_min, min(t0, t1)), min(t_max, max(t0, t1))
+            if t_min > t_max:
+                return False
+
+        # The clipped part runs through the inside exactly when its midpoint does, which also
+        # covers vectors crossing diagonally through two vertices
+        t_mid = (t_min + t_max) / 2
+        return self.is_point_inside(Point(vector.start.x + dx * t_mid, vector.start.y + dy * t_mid))
 
     def get_vertices(self) -> list[Point]:
         """Return all 4 corners of the rectangle"""
@@ -191,6 +252,11 @@ class Rectangle:
         return self.left < point.x < self.left + self.width and \
             self.top < point.y < self.top + self.height
 
+    def is_rect_overlapping(self, other: Rectangle) -> bool:
+        """Return if other rectangle overlaps this rectangle, touching edges count as overlapping"""
+        return self.left <= other.left + other.width and other.left <= self.left + self.width and \
+            self.top <= other.top + other.height and other.top <= self.top + self.height
+
     def is_point_inside_inclusive(self, point: Point):
         """Return if point is inside the rectangle, or on its edges"""
         return self.left <= point.x <= self.left + self.width and \
@@ -222,15 +288,18 @@ class Rectangle:
         return [bot, top, left, right]
 
     def get_pygame_rectangle(self):
-        """Pygame Rect objects only accept integers, hence we have our own Rectangle class. This method returns
-        a pygame rectangle instance of this rectangle"""
-        return pygame.Rect((self.left, self.top), (self.width, self.height))
+        """Return a pygame rectangle instance of this rectangle, see rendering.get_pygame_rect"""
+        # Imported here so that the simulation can run without a display or pygame installed
+        from geometry.rendering import get_pygame_rect
+        return get_pygame_rect(self)
 
 
 class Circle:
     """
     Circle shape for path finding
     """
+    __slots__ = ('center_x', 'center_y', 'radius')
+
     def __init__(self, center_x: float, center_y: float, radius: float):
         self.center_x = center_x
         self.center_y = center_y
@@ -18,8 +18,8 @@ This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 from __future__ import annotations
 import math
 import geometry.geometry as g
-from typing import Union, Callable
-import random
+from typing import Optional, Union, Callable
+import numpy as np
 
 SECONDS_IN_YEAR = 31536000
 
@@ -61,14 +61,18 @@ def average(values: Union[list[int], tuple[int, ...], set[int]]):
     return sum(values) / len(values)
 
 
-def generate_integers_with_average(lower_bound: int, upper_bound: int, avg: int, quantity: int) -> list[int]:
+def generate_integers_with_average(lower_bound: int, upper_bound: int, avg: int, quantity: int,
+                                   rng: Optional[np.random.Generator] = None) -> list[int]:
     """Generate quantity integers in a list within lower and upper bound inclusive such that
-    the average of the integers is close or equal to avg"""
+    the average of the integers is close or equal to avg. Random values are drawn from rng,
+    or a freshly seeded generator if it is None"""
     assert lower_bound <= avg <= upper_bound
+    if rng is None:
+        rng = np.random.default_rng()
 
     # Generates ages between bounds
     bounds = (lower_bound, upper_bound)
-    values = [random.randint(bounds[0], bounds[1]) for _ in range(quantity)]
+    values = rng.integers(bounds[0], bounds[1], endpoint=True, size=quantity).tolist()
 
     # If average is too high or too low, set the lambda while loop condition getter to tweak in appropriate direction
     eval_cond_and_id = ((lambda a: average(a) > avg), "down") \
@@ -79,9 +83,9 @@ def generate_integers_with_average(lower_bound: int, upper_bound: int, avg: int,
     while eval_cond_and_id[0](values):
         tweakable_age_indexes = [i for i in range(len(values)) if values[i] not in bounds]
         if eval_cond_and_id[1] == "down":
-            values[random.choice(tweakable_age_indexes)] -= 1
+            values[tweakable_age_indexes[rng.integers(len(tweakable_age_indexes))]] -= 1
         else:
-            values[random.choice(tweakable_age_indexes)] += 1
+            values[tweakable_age_indexes[rng.integers(len(tweakable_age_indexes))]] += 1
 
     return values
 
@@ -116,8 +120,39 @@ def distance_func_between_vectors(v1: g.Vector, v2: g.Vector, delta_time_s: floa
     return lambda time: ((r1*time + r2) ** 2 + (r3*time + r4) ** 2) ** 0.5
 
 
-def get_shuffled(lst: list) -> list:
-    """random.shuffle but returns a copy of the shuffled list"""
-    lst = [e for e in lst]
-    random.shuffle(lst)
-    return lst
+def average_distance_between_vectors(v1: g.Vector, v2: g.Vector, delta_time_s: float) -> float:
+    """Given 2 vectors which represent the motion of 2 objects which occurred over the given
+    delta time interval, return the exact average of their distance over that time interval.
+
+    The distance is the square root of a quadratic in time, which is rewritten as
+    sqrt(w^2 + h^2) where w is the signed distance travelled relative to the point of closest
+    approach and h is the distance at closest approach, and integrated with its antiderivative
+    (w * sqrt(w^2 + h^2) + h^2 * asinh(w / h)) / 2"""
+    # Relative position of v1's object to v2's object at the start, and its velocity
+    pos_x = v1.start.x - v2.start.x
+    pos_y = v1.start.y - v2.start.y
+    vel_x = (v1.end.x - v1.start.x - v2.end.x + v2.start.x) / delta_time_s
+    vel_y = (v1.end.y - v1.start.y - v2.end.y + v2.start.y) / delta_time_s
+
+    speed = math.hypot(vel_x, vel_y)
+    # Objects moving in parallel keep a constant distance
+    if speed * delta_time_s <= 1e-9 * (1 + math.hypot(pos_x, pos_y)):
+        return math.hypot(pos_x, pos_y)
+
+    closest = abs(pos_x * vel_y - pos_y * vel_x) / speed
+    w_start = (pos_x * vel_x + pos_y * vel_y) / speed
+    w_end = w_start + speed * delta_time_s
+
+    def antiderivative(w: float) -> float:
+        if closest == 0:
+            return w * abs(w) / 2
+        return (w * math.hypot(w, closest) + closest ** 2 * math.asinh(w / closest)) / 2
+
+    return (antiderivative(w_end) - antiderivative(w_start)) / (speed * delta_time_s)
+
+
+def get_shuffled(lst: list, rng: Optional[np.random.Generator] = None) -> list:
+    """Return a shuffled copy of the list, shuffled with rng or a freshly seeded generator if it is None"""
+    if rng is None:
+        rng = np.random.default_rng()
+    return [lst[i] for i in rng.permutation(len(lst))]
@@ -0,0 +1,200 @@
+"""CovSim Geometry Package: Navigation
+
+Module Description
+==================
+This module contains the NavigationGraph class which precomputes a visibility graph
+over the corners of a static set of rectangles, and answers path requests between
+any two points with A* search on that graph. Recent answers are kept in an LRU cache.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Optional
+from geometry.geometry import *
+from geometry.helpers import dist
+from geometry.spatial_hash import SpatialHashGrid
+import heapq
+import math
+import numpy as np
+
+
+class NavigationGraph:
+    """
+    Visibility graph over the corners of inflated rectangles. The rectangles are expected
+    to never change after the graph is built.
+
+    Like get_paths, rectangles are inflated by inflation_radius so that paths keep their distance,
+    except for rectangles whose inflated area consumes the start or end of a path, which are
+    avoided at their original size. Rectangles which consume the start or end are ignored.
+
+    Instance Attributes:
+        - rects: original rectangles to avoid
+        - inflated_rects: rects inflated by inflation_radius, in the same order
+        - nodes: corners of the inflated rectangles which are not inside any other inflated rectangle
+        - edges: for each node, list of (neighbour node index, distance) pairs it can see directly
+        - route_cache_size: maximum number of routes kept in the cache
+        - cache_cell_size: routes are cached per square cell of this size containing their start point
+
+    Passing the state of a graph built over the same rectangles (see get_state) skips building the graph.
+    """
+    def __init__(self, rects: list[Rectangle], inflation_radius: float,
+                 cache_cell_size: Optional[float] = None, route_cache_size: int = 4096,
+                 state: Optional[dict[str, np.ndarray]] = None):
+        self.rects = rects
+        self.inflated_rects = [r.get_inflated(inflation_radius) for r in rects]
+        self.route_cache_size = route_cache_size
+        self.cache_cell_size = cache_cell_size if cache_cell_size is not None else max(inflation_radius * 4, 1)
+
+        # Indexes rectangles by their inflated bounds, so that only rectangles near a vector are checked
+        self._rect_grid = SpatialHashGrid(max(max((r.width for r in self.inflated_rects), default=1),
+                                              max((r.height for r in self.inflated_rects), default=1)))
+        for k, r in enumerate(self.inflated_rects):
+            self._rect_grid.insert(k, r)
+
+        # Maps (start cell, end point) to the waypoints of a route after its start point
+        self._route_cache: OrderedDict[tuple, list[Point]] = OrderedDict()
+        # Maps end point to the nodes which can see it, and their distance to it
+        self._end_visibility: dict[tuple[float, float], list[tuple[int, float]]] = {}
+
+        if state is not None:
+            self._set_state(state)
+            return
+
+        self.nodes: list[Point] = []
+        for r in self.inflated_rects:
+            for vert in r.get_vertices():
+                if not any(self.inflated_rects[k].is_point_inside(vert)
+                           for k in self._rect_grid.query(Rectangle(vert.x, vert.y, 0, 0))):
+                    self.nodes.append(vert)
+
+        # Connects every pair of nodes which can see each other
+        self.edges: list[list[tuple[int, float]]] = [[] for _ in self.nodes]
+        for i in range(len(self.nodes)):
+            for j in range(i + 1, len(self.nodes)):
+                if self.is_visible(self.nodes[i], self.nodes[j]):
+                    d = dist(self.nodes[i], self.nodes[j])
+                    self.edges[i].append((j, d))
+                    self.edges[j].append((i, d))
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the graph and the cached routes as arrays, which can be passed back in as state to rebuild
+        the graph faster. Routes found depend on the cache, so it is needed to find exactly the same routes"""
+        keys = list(self._route_cache)
+        routes = list(self._route_cache.values())
+        edges = [(i, j, d) for i in range(len(self.edges)) for j, d in self.edges[i]]
+        return {'nodes': np.array([(p.x, p.y) for p in self.nodes], dtype=float).reshape(-1, 2),
+                'edge_nodes': np.array([(i, j) for i, j, _ in edges], dtype=np.int64).reshape(-1, 2),
+                'edge_lengths': np.array([d for _, _, d in edges], dtype=float),
+                'cache_keys': np.array(keys, dtype=float).reshape(-1, 4),
+                'cache_lengths': np.array([len(waypoints) for waypoints in routes], dtype=np.int64),
+                'cache_points': np.array([(p.x, p.y) for waypoints in routes for p in waypoints],
+                                         dtype=float).reshape(-1, 2)}
+
+    def _set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Restore the graph and cached routes from state, as returned by get_state"""
+        self.nodes = [Point(x, y) for x, y in state['nodes'].tolist()]
+        self.edges = [[] for _ in self.nodes]
+        for (i, j), d in zip(state['edge_nodes'].tolist(), state['edge_lengths'].tolist()):
+            self.edges[i].append((j, d))
+
+        # Routes are kept from least to most recently used
+        points = [Point(x, y) for x, y in state['cache_points'].tolist()]
+        lengths = state['cache_lengths'].tolist()
+        ends = np.cumsum(lengths, dtype=np.int64).tolist()
+        for (cell_x, cell_y, end_x, end_y), end, length in zip(state['cache_keys'].tolist(), ends, lengths):
+            self._route_cache[(int(cell_x), int(cell_y), end_x, end_y)] = points[end - length:end]
+
+    def is_visible(self, a: Point, b: Point, relaxed_points: tuple[Point, ...] = ()) -> bool:
+        """Return whether the vector from a to b intersects no rectangle. Rectangles consuming a
+        relaxed point are checked at their original size, or skipped if the original consumes it"""
+        vector = Vector(a, b)
+        for k in self._rect_grid.query_vector(vector):
+            rect = self.inflated_rects[k]
+            if any(rect.is_point_inside(pt) for pt in relaxed_points):
+                rect = self.rects[k]
+                if any(rect.is_point_inside(pt) for pt in relaxed_points):
+                    continue
+            if rect.is_vector_intersect(vector):
+                return False
+        return True
+
+    def find_path(self, start: Point, end: Point) -> Optional[tuple[Path, bool]]:
+        """Return the shortest path from start to end which avoids the rectangles, along with
+        whether the endpoint was blocked by a rectangle. Return None if end can't be reached"""
+        was_endpt_blocked = any(self.rects[k].is_point_inside(end)
+                                for k in self._rect_grid.query(Rectangle(end.x, end.y, 0, 0)))
+
+        # Reuses the route found from a nearby start point if its first leg is clear from this start
+        key = (math.floor(start.x / self.cache_cell_size), math.floor(start.y / self.cache_cell_size),
+               end.x, end.y)
+        waypoints = self._route_cache.get(key)
+        if waypoints is not None and self.is_visible(start, waypoints[0], (start, end)):
+            self._route_cache.move_to_end(key)
+            return Path([start] + waypoints), was_endpt_blocked
+
+        waypoints = self._search(start, end)
+        if waypoints is None:
+            return None
+
+        self._route_cache[key] = waypoints
+        if len(self._route_cache) > self.route_cache_size:
+            self._route_cache.popitem(last=False)
+        return Path([start] + waypoints), was_endpt_blocked
+
+    def _search(self, start: Point, end: Point) -> Optional[list[Point]]:
+        """A* search from start to end through the graph, returning the points after start"""
+        if self.is_visible(start, end, (start, end)):
+            return [end]
+
+        end_key = (end.x, end.y)
+        if end_key not in self._end_visibility:
+            self._end_visibility[end_key] = [(i, dist(n, end)) for i, n in enumerate(self.nodes)
+                                             if self.is_visible(n, end, (end,))]
+        end_neighbours = dict(self._end_visibility[end_key])
+
+        # Node indexes -1 and -2 represent the end and start points. Every node starts out queued as if the start
+        # could see it.
+        # Since a straight line is never longer than the real path, whether the start can really see a node
+        # only needs to be checked when that node is popped, which spares checking far away nodes
+        best = {}
+        came_from = {}
+        queue = [(dist(start, node) + dist(node, end), dist(start, node), i, -2) for i, node in enumerate(self.nodes)]
+        heapq.heapify(queue)
+
+        while len(queue) != 0:
+            _, cost, i, previous = heapq.heappop(queue)
+            if i == -1:
+                came_from[-1] = previous
+                break
+            if i in came_from:
+                continue
+            if previous == -2 and not self.is_visible(start, self.nodes[i], (start, end)):
+                continue
+            came_from[i] = previous
+
+            neighbours = self.edges[i] + ([(-1, end_neighbours[i])] if i in end_neighbours else [])
+            for j, d in neighbours:
+                if j not in came_from and (j not in best or cost + d < best[j]):
+                    best[j] = cost + d
+                    heapq.heappush(queue, (best[j] + (0 if j == -1 else dist(self.nodes[j], end)), best[j], j, i))
+
+        if -1 not in came_from:
+            return None
+
+        # Walks back from the end point to the start
+        waypoints = [end]
+        i = came_from[-1]
+        while i != -2:
+            waypoints.append(self.nodes[i])
+            i = came_from[i]
+        waypoints.reverse()
+        return waypoints
@@ -45,7 +45,6 @@ def get_paths(rects: list[Rectangle],
     :param is_random: Should a random path be chosen each time (best performance)
     :param max_paths: Stop executing after this many paths have been found (better performance)
     """
-    # TODO: Rectangle vector collision breaks if vector crosses diagonally through vertices!!! FiXX!!
     # TODO: Consider optimizations above
 
     # Inflate rectangles by person radius so person doesn't collide with shapes
@@ -0,0 +1,78 @@
+"""CovSim Geometry Package: Rendering
+
+Module Description
+==================
+This module contains the adapters which draw geometry objects with pygame. They are kept apart
+from the geometry module so that the simulation, which only needs the geometry itself, can be
+imported without pygame or a display.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from geometry.geometry import Circle, Path, Rectangle, Vector
+import colorsys
+import pygame
+
+
+def get_pygame_rect(rectangle: Rectangle) -> pygame.Rect:
+    """Pygame Rect objects only accept integers, hence we have our own Rectangle class. This function returns
+    a pygame rectangle instance of rectangle"""
+    return pygame.Rect((rectangle.left, rectangle.top), (rectangle.width, rectangle.height))
+
+
+def draw_paths(paths: list[Path], screen: pygame.Surface, start_circle=True, circles=False):
+    """Draws a list of paths"""
+    cols = color_brewer(len(paths))
+    for i in range(len(paths)):
+        draw_path(paths[i], screen, cols[i], start_circle=start_circle, circles=circles)
+
+
+def draw_rect(rectangle: Rectangle, screen: pygame.Surface, color: tuple[int, int, int], width=1):
+    """Draws a rectangle"""
+    pygame.draw.rect(screen, color,
+                     pygame.Rect((int(rectangle.left), int(rectangle.top)),
+                                 (int(rectangle.width), int(rectangle.height))), width=width)
+
+
+def draw_circle(circle: Circle, screen: pygame.Surface, color: tuple[int, int, int], width=1):
+    """Draws a circle"""
+    pygame.draw.circle(screen, color, (circle.center_x, circle.center_y), circle.radius, width=width)
+
+
+def draw_path(path: Path, screen: pygame.Surface, color: tuple[int, int, int],
+              start_circle=True, circles=False):
+    """Draws a single path"""
+    vecs = path.get_vectors()
+
+    for vec in vecs:
+        draw_vector(vec, screen, color, start_circle=(3 if circles else 0))
+
+    # Draws circle at start of path
+    if start_circle:
+        draw_circle(Circle(center_x=vecs[0].start.x, center_y=vecs[0].start.y, radius=3), screen, color, width=0)
+
+
+def draw_vector(vector: Vector, screen: pygame.Surface, color: tuple[int, int, int],
+                start_circle=0, end_circle=0):
+    """Draws a single vector with optional endpoint circles"""
+    pygame.draw.line(screen, color, (vector.start.x, vector.start.y), (vector.end.x, vector.end.y))
+    if start_circle > 0:
+        draw_circle(Circle(center_x=vector.start.x, center_y=vector.start.y, radius=start_circle), screen, color,
+                    width=1)
+    if end_circle > 0:
+        draw_circle(Circle(center_x=vector.end.x, center_y=vector.end.y, radius=end_circle), screen, color, width=1)
+
+
+def color_brewer(num: int) -> list[tuple[int, ...]]:
+    """Returns an equally spaced list of colors with length of num"""
+    if num == 0:
+        return []
+    val = 0.7 / num
+    return [tuple(int(c * 255) for c in colorsys.hsv_to_rgb(i * val, 0.8, 0.8)) for i in range(num)]
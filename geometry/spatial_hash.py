@@ -0,0 +1,104 @@
+"""CovSim Geometry Package: Spatial Hash
+
+Module Description
+==================
+This module contains a uniform spatial hash grid used to quickly find objects
+which are near each other, without comparing every object against every other object.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+import math
+from geometry.geometry import *
+from typing import Any
+
+
+class SpatialHashGrid:
+    """
+    Uniform grid which buckets items by the cells their bounding boxes overlap. Queries
+    return every item sharing a cell with the query area, so results are candidates
+    which may still be slightly farther than the query area and should be checked exactly.
+
+    Instance Attributes:
+        - cell_size: width and height of each square grid cell in world units (DU)
+    """
+    def __init__(self, cell_size: float):
+        assert cell_size > 0
+        self.cell_size = cell_size
+
+        # Maps cell coordinates to the items whose bounding boxes overlap that cell
+        self._cells: dict[tuple[int, int], list[Any]] = {}
+
+    def clear(self) -> None:
+        """Remove all items from the grid"""
+        self._cells.clear()
+
+    def get_cell(self, x: float, y: float) -> tuple[int, int]:
+        """Return the coordinates of the cell containing the world position x, y"""
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def get_cell_range(self, rect: Rectangle) -> tuple[range, range]:
+        """Return the ranges of cell x and cell y coordinates overlapped by rect"""
+        left, top = self.get_cell(rect.left, rect.top)
+        right, bottom = self.get_cell(rect.left + rect.width, rect.top + rect.height)
+        return range(left, right + 1), range(top, bottom + 1)
+
+    def insert(self, item: Any, rect: Rectangle) -> None:
+        """Add item to every cell overlapped by its bounding box rect"""
+        xs, ys = self.get_cell_range(rect)
+        for cx in xs:
+            for cy in ys:
+                self._cells.setdefault((cx, cy), []).append(item)
+
+    def query(self, rect: Rectangle) -> list[Any]:
+        """Return all distinct items which share a cell with rect, in no particular order. Items must be hashable"""
+        xs, ys = self.get_cell_range(rect)
+        found = set()
+        for cx in xs:
+            for cy in ys:
+                found.update(self._cells.get((cx, cy), ()))
+        return list(found)
+
+    def get_vector_cells(self, vector: Vector) -> list[tuple[int, int]]:
+        """Return the coordinates of every cell the vector passes through, in order from its start"""
+        x0, y0 = vector.start.x, vector.start.y
+        dx, dy = vector.end.x - x0, vector.end.y - y0
+        cx, cy = self.get_cell(x0, y0)
+        end_cx, end_cy = self.get_cell(vector.end.x, vector.end.y)
+
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        # Fraction of the vector travelled when it crosses the next vertical and horizontal cell border,
+        # and the fraction needed to cross a whole cell in each direction
+        next_x = ((cx + (step_x > 0)) * self.cell_size - x0) / dx if dx != 0 else math.inf
+        next_y = ((cy + (step_y > 0)) * self.cell_size - y0) / dy if dy != 0 else math.inf
+        delta_x = self.cell_size / abs(dx) if dx != 0 else math.inf
+        delta_y = self.cell_size / abs(dy) if dy != 0 else math.inf
+
+        cells = [(cx, cy)]
+        # Each step crosses one border, so the end cell is reached after this many steps
+        for _ in range(abs(end_cx - cx) + abs(end_cy - cy)):
+            if next_x < next_y:
+                cx += step_x
+                next_x += delta_x
+            else:
+                cy += step_y
+                next_y += delta_y
+            cells.append((cx, cy))
+        return cells
+
+    def query_vector(self, vector: Vector) -> list[Any]:
+        """Return all distinct items which share a cell with any part of the vector, in no particular order.
+        Items must be hashable"""
+        found = set()
+        for cell in self.get_vector_cells(vector):
+            found.update(self._cells.get(cell, ()))
+        return list(found)
@@ -0,0 +1,136 @@
+"""Shared Frames Module
+
+Module Description
+==================
+This module contains the shared memory buffer the simulation process writes the state of
+every person to, for the main process to draw. Frames are fixed width arrays (see
+sim.trajectory.get_frame_dtype), so nothing is pickled, and the cost of sending a frame
+is one copy into shared memory however many people there are. The buildings are written
+once, next to the frames.
+
+There are two frame slots, written alternately. Each slot has a sequence counter which is odd
+while the slot is being written, so the reader can tell whether a frame changed while it was
+reading it, and read the latest frame again if it did (a sequence lock).
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from multiprocessing import shared_memory, resource_tracker
+from typing import Callable, Optional, TypeVar, TYPE_CHECKING
+from sim.trajectory import get_frame_dtype, fill_frame, get_building_rows
+import numpy as np
+
+if TYPE_CHECKING:
+    import sim.sim_components as sc
+
+T = TypeVar('T')
+
+
+class SharedFrameBuffer:
+    """
+    Double buffered frames of num_people people, and the rows of num_buildings buildings, in one block of
+    shared memory. The process which creates the buffer writes to it and unlinks it when done, other
+    processes attach to it by name and read from it.
+
+    Instance Attributes:
+        - name: name of the shared memory block, to attach to it from another process
+        - num_people: number of people in each frame
+        - num_buildings: number of building rows
+        - buildings: one row of (left, top, width, height, entrance_x, entrance_y, purpose) per building
+        - is_owner: whether this process created the buffer, and so writes to it and unlinks it
+        - is_closed: whether the buffer was closed, after which it can't be used
+    """
+    # Bytes before the first slot, holding the sequence counter of each slot and the latest slot
+    CONTROL_SIZE = 64
+
+    def __init__(self, num_people: int, num_buildings: int, name: Optional[str] = None):
+        self.num_people = num_people
+        self.num_buildings = num_buildings
+        self.is_owner = name is None
+        self.is_closed = False
+
+        frame_dtype = get_frame_dtype(num_people)
+        size = SharedFrameBuffer.CONTROL_SIZE + 2 * frame_dtype.itemsize + num_buildings * 7 * 8
+        if self.is_owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = _attach(name)
+        self.name = self._shm.name
+
+        # (seq_0, seq_1, latest slot), where latest is -1 until the first frame is written
+        self._control = np.ndarray(3, dtype=np.int64, buffer=self._shm.buf)
+        self._slots = np.ndarray(2, dtype=frame_dtype, buffer=self._shm.buf, offset=SharedFrameBuffer.CONTROL_SIZE)
+        self.buildings = np.ndarray((num_buildings, 7), dtype=float, buffer=self._shm.buf,
+                                    offset=SharedFrameBuffer.CONTROL_SIZE + 2 * frame_dtype.itemsize)
+        if self.is_owner:
+            self._control[:] = (0, 0, -1)
+
+    @classmethod
+    def create(cls, city: sc.City) -> SharedFrameBuffer:
+        """Return a new buffer sized for city, holding its buildings"""
+        buffer = cls(len(city.people), len(city.buildings))
+        buffer.buildings[:] = get_building_rows(city)
+        return buffer
+
+    def get_handle(self) -> dict:
+        """Return what another process needs to attach to this buffer, see attach"""
+        return {"name": self.name, "num_people": self.num_people, "num_buildings": self.num_buildings}
+
+    @classmethod
+    def attach(cls, handle: dict) -> SharedFrameBuffer:
+        """Return a reader of the buffer described by handle, as returned by get_handle"""
+        return cls(handle["num_people"], handle["num_buildings"], handle["name"])
+
+    def write_frame(self, city: sc.City) -> None:
+        """Write the current state of city to the slot not holding the latest frame, then make it the latest"""
+        slot = 1 - self._control[2] if self._control[2] >= 0 else 0
+        self._control[slot] += 1
+        fill_frame(self._slots[slot], city)
+        self._control[slot] += 1
+        self._control[2] = slot
+
+    def read(self, reader: Callable[[np.void], T], retries: int = 3) -> Optional[T]:
+        """Return reader called on the latest frame, or None if there is no frame yet.
+
+        The frame is read in place, so reader must copy what it needs out of it. If the frame was
+        overwritten while reader ran, it is read again, up to retries times, after which None is returned.
+        Two frames have to be written while reader runs for that to happen"""
+        for _ in range(retries + 1):
+            slot = int(self._control[2])
+            if slot < 0:
+                return None
+            seq = int(self._control[slot])
+            if seq % 2 == 1:
+                # The writer moved on to this slot since it was the latest
+                continue
+            result = reader(self._slots[slot])
+            if int(self._control[slot]) == seq:
+                return result
+        return None
+
+    def close(self) -> None:
+        """Stop using the buffer, and free it if this process created it. Closing twice does nothing"""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        # Views into the block must be gone before it can be closed
+        del self._control, self._slots, self.buildings
+        self._shm.close()
+        if self.is_owner:
+            self._shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Return the shared memory block called name, which will be freed by the process that created it"""
+    shm = shared_memory.SharedMemory(name=name)
+    # Otherwise this process would free the block too when it exits
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
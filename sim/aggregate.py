@@ -0,0 +1,206 @@
+"""CovSim Sim Package: Aggregate
+
+Module Description
+==================
+This module contains the contact rate model used by the coarse day-step mode of the simulation.
+While the simulation runs at agent level, the model learns how quickly infected people infect healthy
+people, depending on which city block each of them is in and which type of building they are
+heading to. The city can then be progressed by days or weeks at a time by rolling each healthy person's
+infection from those rates, the number of infected people in each group and how susceptible that person
+is, without moving anyone. Progressing at agent level again keeps refining the rates.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterator, Optional
+import math
+import numpy as np
+
+if TYPE_CHECKING:
+    import sim.sim_components as sc
+
+
+class ContactRateModel:
+    """
+    Contact rates between groups of people, estimated from the infections scored at agent level.
+    People are grouped by the city block they are in and the type of the building their current path
+    leads to. The rate between two groups is the hazard of infection per second for a healthy person
+    of the second group, per infected person of the first group, before the healthy person's own
+    multipliers (see models.susceptibility_batch) are applied.
+
+    Rates are stored factored, as the product of a rate between blocks and a rate between building types
+    divided by the mean rate, so that memory and the work per tick grow with the number of blocks rather
+    than its square. Pairs of people are only ever scored within infection_cutoff_radius of each other,
+    so a block is only paired with the blocks within radius of it, each of which is one of the offsets.
+
+    Instance Attributes:
+        - city: the city whose people are grouped
+        - blocks_x, blocks_y: dimensions of the city in blocks
+        - block_size: distance between the top left corners of neighbouring blocks, including the road
+        - num_types: number of building types people are grouped by. People whose path doesn't lead to
+        a building are grouped under an extra type after the Building.Types
+        - radius: number of blocks away from an infected person that a healthy person can be scored
+        - offsets: (dx, dy) from the block of an infected person to the block of a healthy one, for every
+        block within radius
+        - block_hazard: for each infected block and offset, the total hazard of infection scored so far
+        - block_exposure: for each infected block and offset, the total seconds that each infected and healthy
+        pair of people spent in those blocks so far, whether they were close enough to be scored or not,
+        weighted by the susceptibility of the healthy person
+        - type_hazard, type_exposure: the same, for each pair of infected and healthy building types, over
+        the same pairs of people
+
+    Representation Invariants:
+        - self.block_hazard.sum() == self.type_hazard.sum()
+        - self.block_exposure.sum() == self.type_exposure.sum()
+    """
+    def __init__(self, city: sc.City, blocks_x: int, blocks_y: int, block_size: float):
+        self.city = city
+        self.blocks_x = blocks_x
+        self.blocks_y = blocks_y
+        self.block_size = block_size
+        # Imported here since sim_components imports this module through sim_manager
+        import sim.sim_components as sc
+        self.num_types = len(sc.Building.Types) + 1
+
+        self.radius = max(1, math.ceil(city.infection_cutoff_radius / block_size))
+        self.offsets = [(dx, dy) for dx in range(-self.radius, self.radius + 1)
+                        for dy in range(-self.radius, self.radius + 1)]
+        self.block_hazard = np.zeros((blocks_x, blocks_y, len(self.offsets)))
+        self.block_exposure = np.zeros((blocks_x, blocks_y, len(self.offsets)))
+        self.type_hazard = np.zeros((self.num_types, self.num_types))
+        self.type_exposure = np.zeros((self.num_types, self.num_types))
+
+    def get_groups(self, index: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return the block x, block y and building type of each person at index"""
+        pop = self.city.people
+        block_x = np.clip(np.floor(pop.x[index] / self.block_size), 0, self.blocks_x - 1).astype(np.int64)
+        block_y = np.clip(np.floor(pop.y[index] / self.block_size), 0, self.blocks_y - 1).astype(np.int64)
+        return block_x, block_y, self.city.get_destination_types(index)
+
+    def get_susceptibility(self, index: np.ndarray) -> np.ndarray:
+        """Return the multiplier on the rate of infection of each healthy person at index"""
+        import sim.models as models
+        pop = self.city.people
+        return models.susceptibility_batch(pop.hunger[index], pop.temp[index], pop.is_wearing_mask[index],
+                                           pop.was_infected[index], pop.is_vaccinated[index])
+
+    def record(self, contacts: sc.ContactRecord) -> None:
+        """Add the infections scored during one agent level tick to the estimated rates"""
+        if len(contacts.infected) == 0 or len(contacts.susceptible) == 0:
+            return
+        infected_counts = self._count(contacts.infected)
+        susceptible_weights = self._count(contacts.susceptible, self.get_susceptibility(contacts.susceptible))
+        for k, infected_slice, healthy_slice in self._pair_blocks():
+            infected, healthy = infected_counts[infected_slice], susceptible_weights[healthy_slice]
+            self.block_exposure[infected_slice + (k,)] += \
+                contacts.time_delta_s * infected.sum(axis=-1) * healthy.sum(axis=-1)
+            self.type_exposure += contacts.time_delta_s * np.einsum('xyt,xyu->tu', infected, healthy)
+
+        if len(contacts.probabilities) == 0:
+            return
+        # Hazard is additive over pairs and time, unlike probability
+        hazard = -np.log1p(-np.minimum(contacts.probabilities, 1 - 1e-12))
+        infected_x, infected_y, infected_types = self.get_groups(contacts.infected_pairs)
+        healthy_x, healthy_y, healthy_types = self.get_groups(contacts.healthy_pairs)
+        offset_x = np.clip(healthy_x - infected_x, -self.radius, self.radius) + self.radius
+        offset_y = np.clip(healthy_y - infected_y, -self.radius, self.radius) + self.radius
+        np.add.at(self.block_hazard, (infected_x, infected_y, offset_x * (2 * self.radius + 1) + offset_y), hazard)
+        np.add.at(self.type_hazard, (infected_types, healthy_types), hazard)
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the totals the rates are estimated from by name, so that a restored simulation can carry on
+        learning from them (see set_state)"""
+        return {'block_hazard': self.block_hazard, 'block_exposure': self.block_exposure,
+                'type_hazard': self.type_hazard, 'type_exposure': self.type_exposure}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Continue learning from the totals in state, as returned by get_state"""
+        self.block_hazard = np.array(state['block_hazard'])
+        self.block_exposure = np.array(state['block_exposure'])
+        self.type_hazard = np.array(state['type_hazard'])
+        self.type_exposure = np.array(state['type_exposure'])
+
+    def get_block_rates(self) -> np.ndarray:
+        """Return the estimated rates from each block to the block at each offset from it, with all building
+        types pooled together, 0 between blocks which were never exposed to each other"""
+        return _divide(self.block_hazard, self.block_exposure)
+
+    def get_type_rates(self) -> np.ndarray:
+        """Return the estimated rates between building types, with all city blocks pooled together, 0 between
+        types which were never exposed to each other"""
+        return _divide(self.type_hazard, self.type_exposure)
+
+    def get_mean_rate(self) -> float:
+        """Return the hazard per second between an infected and a healthy person, pooled over every pair
+        of people exposed to each other so far"""
+        exposure = self.type_exposure.sum()
+        return float(self.type_hazard.sum() / exposure) if exposure > 0 else 0.0
+
+    def get_filled_rates(self) -> tuple[np.ndarray, np.ndarray]:
+        """Return the estimated block rates and type rates (see get_block_rates and get_type_rates), where
+        those never exposed to each other are taken from get_mean_rate instead. The rate between two groups
+        is their block rate times their type rate, divided by the mean rate"""
+        mean = self.get_mean_rate()
+        block_rates = np.where(self.block_exposure > 0, self.get_block_rates(), mean)
+        type_rates = np.where(self.type_exposure > 0, self.get_type_rates(), mean)
+        return block_rates, type_rates
+
+    def spread_infection(self, time_delta_s: float, rng: np.random.Generator) -> None:
+        """Roll the infection of every healthy person over time_delta_s from the estimated rates and
+        the number of infected people, which is assumed to stay the same over the step.
+
+        Nobody moves during the step, so each healthy person is exposed to the infected people of each group
+        at the rate between that group and their own (see get_filled_rates)
+        """
+        import sim.models as models
+        infected = self.city.infected.members
+        susceptible = self.city.susceptible.members.copy()
+        mean = self.get_mean_rate()
+        if len(infected) == 0 or len(susceptible) == 0 or mean == 0:
+            return
+
+        block_rates, type_rates = self.get_filled_rates()
+        # Hazard per second on one healthy person of each group, before their own multipliers
+        type_pressure = self._count(infected) @ type_rates
+        pressure = np.zeros_like(type_pressure)
+        for k, infected_slice, healthy_slice in self._pair_blocks():
+            pressure[healthy_slice] += block_rates[infected_slice + (k,)][..., None] * type_pressure[infected_slice]
+
+        block_x, block_y, types = self.get_groups(susceptible)
+        force = pressure[block_x, block_y, types] / mean * self.get_susceptibility(susceptible)
+        probs = -np.expm1(-force * time_delta_s)
+        self.city.people.set_infected(susceptible[models.roll_probabilities(probs, rng)])
+
+    def _count(self, index: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Return the number of people at index in each block and building type, or the sum of their weights"""
+        block_x, block_y, types = self.get_groups(index)
+        groups = (block_x * self.blocks_y + block_y) * self.num_types + types
+        counts = np.bincount(groups, weights, minlength=self.blocks_x * self.blocks_y * self.num_types)
+        return counts.reshape((self.blocks_x, self.blocks_y, self.num_types)).astype(float)
+
+    def _pair_blocks(self) -> Iterator[tuple[int, tuple[slice, slice], tuple[slice, slice]]]:
+        """Yield each offset's index, with the slices of the infected blocks that have a block at that offset
+        and the slices of those blocks, in the same order"""
+        for k, (dx, dy) in enumerate(self.offsets):
+            infected_x, healthy_x = _align(dx, self.blocks_x)
+            infected_y, healthy_y = _align(dy, self.blocks_y)
+            yield k, (infected_x, infected_y), (healthy_x, healthy_y)
+
+
+def _align(offset: int, size: int) -> tuple[slice, slice]:
+    """Return the slices of the indices i in range(size) for which i + offset is in range(size), and of
+    those i + offset"""
+    return slice(max(-offset, 0), size - max(offset, 0)), slice(max(offset, 0), size - max(-offset, 0))
+
+
+def _divide(hazard: np.ndarray, exposure: np.ndarray) -> np.ndarray:
+    """Return hazard / exposure, 0 where there was no exposure"""
+    return np.divide(hazard, exposure, out=np.zeros_like(hazard), where=exposure > 0)
@@ -0,0 +1,181 @@
+"""CovSim Sim Package: Checkpoint
+
+Module Description
+==================
+This module saves running simulations to checkpoint files and restores them, so that a warmed
+up scenario can be reused instead of generating and finalizing its city again, and so that many
+runs can be forked from one shared baseline, e.g. to compare interventions:
+
+    save_checkpoint(sim, 'baseline.npz')
+    runs = fork_checkpoint('baseline.npz', 10)
+
+A checkpoint is a NumPy .npz archive holding the buildings and people as arrays, along with the
+navigation graph and its cached routes, and any contact rates and metrics collected so far. Everything
+else, such as the parameters, clock, history and random generator states, is stored as JSON in the
+same archive. Nothing is pickled, and nothing
+refers back to the sim manager, which is recreated on load.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from dataclasses import asdict
+from typing import Union
+from geometry.geometry import Point, Rectangle
+from sim.population import Population
+from sim.rng import SimRandom
+import sim.sim_components as sc
+import datetime
+import json
+import numpy as np
+
+# Format version written to every checkpoint, increased whenever older checkpoints can't be read anymore
+CHECKPOINT_VERSION = 2
+
+
+def take_snapshot(sim) -> dict[str, np.ndarray]:
+    """Return the whole state of the simulation managed by sim as arrays by name. The arrays are copies,
+    so the simulation can carry on without changing the snapshot"""
+    city = sim.city
+    buildings = city.buildings
+    snapshot = {
+        'buildings.left': np.array([b.rect.left for b in buildings]),
+        'buildings.top': np.array([b.rect.top for b in buildings]),
+        'buildings.width': np.array([b.rect.width for b in buildings]),
+        'buildings.height': np.array([b.rect.height for b in buildings]),
+        'buildings.entrance_x': np.array([b.entrance_point.x for b in buildings]),
+        'buildings.entrance_y': np.array([b.entrance_point.y for b in buildings]),
+        'buildings.purpose': np.array([int(b.purpose) for b in buildings], dtype=np.int8),
+        'buildings.floors': np.array([b.num_floors for b in buildings], dtype=np.int32),
+    }
+    for name, value in city.people.get_state().items():
+        snapshot['people.' + name] = value.copy()
+    # Saves the navigation graph, which is slow to build, along with its route cache, which is needed to
+    # find the same routes again
+    for name, value in city.navigation.get_state().items():
+        snapshot['navigation.' + name] = value
+    if sim.contact_rates is not None:
+        for name, value in sim.contact_rates.get_state().items():
+            snapshot['rates.' + name] = value.copy()
+    if sim.collector is not None:
+        for name, value in sim.collector.get_state().items():
+            snapshot['collector.' + name] = np.array(value)
+
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'params': asdict(sim.params),
+        'smallest_road_width': city.smallest_road_width,
+        'is_border_closed': city.is_border_closed,
+        'is_vaccine_available': city.is_vaccine_available,
+        'infection_cutoff_radius': city.infection_cutoff_radius,
+        'time_s': city.time_s,
+        'date_time': city.date_time.isoformat(),
+        'time_tracker': sim.time_tracker,
+        'history': sim.history,
+        'rng': sim.rng.get_state(),
+    }
+    # NumPy scalars are saved as the Python numbers they hold
+    snapshot['meta'] = np.array(json.dumps(meta, default=lambda value: value.item()))
+    return snapshot
+
+
+def save_checkpoint(sim, filename: str, compress: bool = False) -> None:
+    """Save the state of the simulation managed by sim to filename, which should end in .npz. Compressing
+    makes the file smaller, but saving and loading slower"""
+    save = np.savez_compressed if compress else np.savez
+    with open(filename, 'wb') as f:
+        save(f, **take_snapshot(sim))
+
+
+def read_checkpoint(filename: str) -> dict[str, np.ndarray]:
+    """Return the snapshot saved in filename by save_checkpoint"""
+    with np.load(filename, allow_pickle=False) as archive:
+        snapshot = {name: archive[name] for name in archive.files}
+    version = _get_meta(snapshot)['version']
+    if version != CHECKPOINT_VERSION:
+        raise ValueError("Checkpoint " + filename + " has version " + str(version) +
+                         ", expected " + str(CHECKPOINT_VERSION))
+    return snapshot
+
+
+def load_checkpoint(checkpoint: Union[str, dict[str, np.ndarray]], output_dir=None, seed=None, **kwargs):
+    """Return a new sim manager continuing the simulation saved in checkpoint, a filename or a snapshot.
+    With no seed, the saved random streams carry on, so the run continues exactly as the saved one would
+    have. Otherwise, seed starts new streams. Other arguments are passed on to SimManager, and unlike
+    the simulation itself, the data files and metrics start over"""
+    # Imported here since sim_manager imports this module
+    from sim.sim_manager import SimManager, SimParams
+
+    snapshot = read_checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+    params = SimParams(**_get_meta(snapshot)['params'])
+    return SimManager(params, output_dir, seed, snapshot=snapshot, **kwargs)
+
+
+def fork_checkpoint(checkpoint: Union[str, dict[str, np.ndarray]], seeds: Union[int, list[int]],
+                    output_dir=None, **kwargs) -> list:
+    """Return one new sim manager per seed, each continuing the simulation saved in checkpoint with its own
+    random streams (see load_checkpoint). A seeds count of n spawns n independent streams from the saved
+    ones. Parameters and people can then be changed in each fork, e.g. to compare interventions from the
+    same starting point"""
+    snapshot = read_checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+    if isinstance(seeds, int):
+        seeds = SimRandom.from_state(_get_meta(snapshot)['rng']).seed_sequence.spawn(seeds)
+    return [load_checkpoint(snapshot, output_dir, seed, **kwargs) for seed in seeds]
+
+
+def restore_city(sim, snapshot: dict[str, np.ndarray]) -> sc.City:
+    """Return the city saved in snapshot, belonging to the sim manager sim"""
+    meta = _get_meta(snapshot)
+    buildings = [sc.Building(sim, Rectangle(left, top, width, height), Point(entrance_x, entrance_y),
+                             sc.Building.Types(purpose), int(floors))
+                 for left, top, width, height, entrance_x, entrance_y, purpose, floors in
+                 zip(*(snapshot['buildings.' + name].tolist() for name in
+                       ('left', 'top', 'width', 'height', 'entrance_x', 'entrance_y', 'purpose', 'floors')))]
+    people = Population.from_state(sim, {name[len('people.'):]: value for name, value in snapshot.items()
+                                         if name.startswith('people.')})
+
+    navigation = {name[len('navigation.'):]: value for name, value in snapshot.items()
+                  if name.startswith('navigation.')}
+
+    city = sc.City(sim, buildings, people, meta['smallest_road_width'], meta['is_border_closed'],
+                   meta['is_vaccine_available'], meta['infection_cutoff_radius'], navigation)
+    city.time_s = meta['time_s']
+    city.date_time = datetime.datetime.fromisoformat(meta['date_time'])
+    return city
+
+
+def restore_state(sim, snapshot: dict[str, np.ndarray], restore_rng: bool = True) -> None:
+    """Restore everything but the city saved in snapshot into the sim manager sim, whose city was restored
+    by restore_city. The random streams are only restored if restore_rng"""
+    meta = _get_meta(snapshot)
+    sim.time_tracker = meta['time_tracker']
+    sim.history = [tuple(row) for row in meta['history']]
+    if restore_rng:
+        sim.rng = SimRandom.from_state(meta['rng'])
+
+    if sim.contact_rates is not None and has_contact_rates(snapshot):
+        sim.contact_rates.set_state({name[len('rates.'):]: value for name, value in snapshot.items()
+                                     if name.startswith('rates.')})
+
+    # Metrics carry on from the saved totals if they were collected, otherwise they start from the snapshot
+    if sim.collector is not None and 'collector.deaths' in snapshot:
+        sim.collector.set_state({name[len('collector.'):]: value for name, value in snapshot.items()
+                                 if name.startswith('collector.')})
+
+
+def has_contact_rates(snapshot: dict[str, np.ndarray]) -> bool:
+    """Return whether snapshot holds the contact rates learned by its simulation, which are only saved
+    if they were being learned"""
+    return 'rates.block_hazard' in snapshot
+
+
+def _get_meta(snapshot: dict[str, np.ndarray]) -> dict:
+    """Return the JSON part of snapshot"""
+    return json.loads(str(snapshot['meta']))
@@ -19,17 +19,18 @@ from sim.sim_components import *
 from sim.sim_manager import *
 from geometry.helpers import average, generate_integers_with_average
 from sim.city_generator_helpers import *
-import random
+from sim.population import Population
 
 
-def generate_city_people(sim_manager: SimManager, sim_param: SimParams) -> set[Person]:
+def generate_city_people(sim_manager: SimManager, sim_param: SimParams) -> Population:
     """Generates people in the city given the simulation parameters. People are
-    generated randomly and cannot be strictly defined"""
+    generated randomly from the people stream of the sim manager's RNG and cannot be strictly defined"""
+    rng = sim_manager.rng.people
     # Gets population individual ages
-    ages = generate_integers_with_average(18, 85, sim_param.avg_age, sim_param.population)
+    ages = generate_integers_with_average(18, 85, sim_param.avg_age, sim_param.population, rng)
     # Gets population individual mask wearing tendency
     mask_wearing_percentages = generate_integers_with_average(0, 100, sim_param.mask_wearing_percentage,
-                                                              sim_param.population)
+                                                              sim_param.population, rng)
 
     num_vaccinated = min(int(sim_param.population * (sim_param.initial_vaccination_percentage / 100)),
                          sim_param.population)
@@ -40,30 +41,27 @@ def generate_city_people(sim_manager: SimManager, sim_param: SimParams) -> set[P
 
     # Gets population individual vaccination, infection, and homelessness status
     vaccination_booleans = get_shuffled(([True] * num_vaccinated) +
-                                        ([False] * (sim_param.population - num_vaccinated)))
+                                        ([False] * (sim_param.population - num_vaccinated)), rng)
     infection_booleans = get_shuffled(([True] * num_infected) +
-                                      ([False] * (sim_param.population - num_infected)))
+                                      ([False] * (sim_param.population - num_infected)), rng)
     homelessness_booleans = get_shuffled(([True] * num_homeless) +
-                                         ([False] * (sim_param.population - num_homeless)))
+                                         ([False] * (sim_param.population - num_homeless)), rng)
 
-    people = set()
-    for i in range(sim_param.population):
-        people.add(Person(sim_manager, ages[i], mask_wearing_percentages[i], vaccination_booleans[i],
-                          infection_booleans[i], homelessness_booleans[i], sim_param.average_travels_per_year))
+    return Population(sim_manager, ages, mask_wearing_percentages, vaccination_booleans,
+                      infection_booleans, homelessness_booleans, sim_param.average_travels_per_year)
 
-    return people
 
+def generate_city_buildings(sim_manager: SimManager, sim_param: SimParams) -> tuple[list[Building], float]:
+    """Generates city buildings given the simulation parameters. City is generated randomly from
+    the city stream of the sim manager's RNG and cannot be strictly defined"""
+    rng = sim_manager.rng.city
 
-def generate_city_buildings(sim_manager: SimManager, sim_param: SimParams) -> tuple[set[Building], float]:
-    """Generates city buildings given the simulation parameters. City is generated randomly
-    and cannot be strictly defined"""
-
-    buildings = set()
+    buildings = []
 
     # Constructs the city layout
     building_rects, smallest_road_width = get_city_rectangle_layout(sim_param.city_blocks_x, sim_param.city_blocks_y,
                                                                     sim_param.block_dim, sim_param.road_width,
-                                                                    sim_param.buildings_constant)
+                                                                    sim_param.buildings_constant, rng)
 
     # Finds number of each buildings
     num_med = sim_param.num_medical_buildings
@@ -85,19 +83,21 @@ def generate_city_buildings(sim_manager: SimManager, sim_param: SimParams) -> tu
     nums = [num_med, num_commercial, num_travel, num_residential, num_industrial]
 
     # Loops through shuffled building indexes
-    for i in (lambda a: (random.shuffle(a), a)[1])(list(range(len(building_rects)))):
+    for i in rng.permutation(len(building_rects)).tolist():
         # Chooses type index and subtracts from that count
-        index = random.choice([i for i in range(len(nums)) if nums[i] != 0])
+        remaining_types = [i for i in range(len(nums)) if nums[i] != 0]
+        index = remaining_types[rng.integers(len(remaining_types))]
         nums[index] -= 1
 
         # Randomizes floors
-        if random.randint(1, 100) <= sim_param.high_rise_percentage:
-            floors = random.randint(5, 40)
+        if rng.integers(1, 100, endpoint=True) <= sim_param.high_rise_percentage:
+            floors = int(rng.integers(5, 40, endpoint=True))
         else:
-            floors = random.randint(1, 4)
+            floors = int(rng.integers(1, 4, endpoint=True))
 
         # Adds building
-        buildings.add(Building(sim_manager, building_rects[i], midpoint(random.choice(building_rects[i].get_sides())),
-                               Building.Types(index), floors))
+        buildings.append(Building(sim_manager, building_rects[i],
+                                  midpoint(building_rects[i].get_sides()[rng.integers(4)]),
+                                  Building.Types(index), floors))
 
     return buildings, smallest_road_width
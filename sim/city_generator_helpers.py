@@ -16,28 +16,33 @@ This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
 from geometry.geometry import *
 from geometry.helpers import *
-import random
+from typing import Optional
+import numpy as np
 
 
 def get_city_rectangle_layout(width_blocks: int, height_blocks: int,
                               block_dim: float, road_width: float,
-                              building_cap: int) -> tuple[list[Rectangle], float]:
+                              building_cap: int,
+                              rng: Optional[np.random.Generator] = None) -> tuple[list[Rectangle], float]:
     """
     Return list of rectangles for where the buildings will be located. Also return the
-    smallest road width among local roads between blocks (used for path finding parameters)
+    smallest road width among local roads between blocks (used for path finding parameters).
+    Random values are drawn from rng, or a freshly seeded generator if it is None
 
     :return: building rectangles, smallest local road width
     """
+    if rng is None:
+        rng = np.random.default_rng()
     building_rects = []
 
-    for block_x in get_shuffled(list(range(width_blocks))):
-        for block_y in get_shuffled(list(range(height_blocks))):
+    for block_x in get_shuffled(list(range(width_blocks)), rng):
+        for block_y in get_shuffled(list(range(height_blocks)), rng):
             # Top left corner of the current block
             left_top_of_block = Point((block_dim + road_width) * block_x,
                                       (block_dim + road_width) * block_y)
 
-            splits = [split_block(building_cap, len(building_rects)),
-                      split_block(building_cap, len(building_rects))]
+            splits = [split_block(building_cap, len(building_rects), rng),
+                      split_block(building_cap, len(building_rects), rng)]
 
             if max(splits) - min(splits) > 1:
                 splits[splits.index(max(splits))] = min(splits) + 1
@@ -55,17 +60,19 @@ def get_city_rectangle_layout(width_blocks: int, height_blocks: int,
     return building_rects, smallest_road_width
 
 
-def split_block(cap: int, buildings_so_far: int) -> int:
+def split_block(cap: int, buildings_so_far: int, rng: Optional[np.random.Generator] = None) -> int:
     """Given the number of buildings in the city so far, and an approximate desired
     building cap, run a randomizer to see how many times a city block should be
     split. The less buildings so far, the higher the chance it will split, to make more
-    buildings."""
+    buildings. Random values are drawn from rng, or a freshly seeded generator if it is None"""
+    if rng is None:
+        rng = np.random.default_rng()
     splits = 0
     # Initial chance to split once, multiplied to the function based on building count
     chance = 0.8
 
     f = ((-100 / cap) * buildings_so_far) + 100
-    while random.randint(1, 100) <= f * chance:
+    while rng.integers(1, 100, endpoint=True) <= f * chance:
         splits += 1
         # Decreases the chance of a subsequent split
         chance *= 0.4
@@ -94,14 +101,15 @@ def get_buildings_in_block(road_width: float, block_dim: float, splits_w: int, s
 
 def _avg_buildings(width_blocks: int, height_blocks: int, building_cap: int, sims=1000):
     """Used to find the number of buildings that appear on average for given city gen parameters"""
+    rng = np.random.default_rng()
     sim_values = []
 
     for _ in range(sims):
         buildings = 0
 
         for i in range(width_blocks * height_blocks):
-            buildings += (split_block(building_cap, buildings) + 1) * \
-                         (split_block(building_cap, buildings) + 1)
+            buildings += (split_block(building_cap, buildings, rng) + 1) * \
+                         (split_block(building_cap, buildings, rng) + 1)
 
         sim_values.append(buildings)
 
@@ -0,0 +1,228 @@
+"""CovSim Sim Package: Ensemble
+
+Module Description
+==================
+This module runs many headless simulations in parallel, one per CPU core, for parameter
+sweeps and Monte Carlo replicates. Every scenario, a set of overrides applied to a base
+SimParams, is run once per seed, and the results of each run are streamed into a single
+aggregated csv as soon as the run finishes. For example:
+
+    python -m sim.ensemble params.json --sweep sweep.json --seeds 100 --duration 86400
+
+where sweep.json maps SimParams fields to the list of values to try, e.g.
+{"mask_wearing_percentage": [0, 50, 100], "population": [500, 1000]}.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict, replace
+from typing import Optional, Union
+from sim.sim_manager import SimParams
+from sim.run import load_params, run_simulation
+from sim.scheduler import AdaptiveScheduler
+from sim.metrics_sink import MetricsSink, CsvMetricsSink, ParquetMetricsSink
+from sim.metrics import METRICS, get_metric_columns
+import argparse
+import itertools
+import json
+import logging
+import math
+import time
+import numpy as np
+
+
+@dataclass
+class RunResult:
+    """Outcome of one simulation run of an ensemble.
+
+    Instance Attributes:
+        - scenario: index of the scenario the run belongs to
+        - seed: seed the run was started with
+        - overrides: SimParams fields that differ from the base parameters in this scenario
+        - history: (time_s, case_proportion) rows recorded by the run (see SimManager)
+        - metrics: rows of epidemiological metrics recorded by the run (see sim.metrics), empty if not collected
+        - infected, dead, population: number of people infected, dead, and in total at the end of the run
+        - wall_s: real seconds the run took
+    """
+    scenario: int
+    seed: int
+    overrides: dict
+    history: list[tuple[float, float]]
+    metrics: list[tuple]
+    infected: int
+    dead: int
+    population: int
+    wall_s: float
+
+
+def expand_overrides(sweep: Union[dict[str, list], list[dict]]) -> list[dict]:
+    """Return the list of scenarios described by sweep. A dict mapping fields to lists of values
+    becomes every combination of those values, a list of dicts is used as is"""
+    if isinstance(sweep, list):
+        return [dict(overrides) for overrides in sweep]
+    fields = list(sweep)
+    return [dict(zip(fields, values)) for values in itertools.product(*(sweep[f] for f in fields))]
+
+
+def run_ensemble(base_params: SimParams, sweep: Union[dict[str, list], list[dict]], seeds: Union[int, list[int]],
+                 duration_s: float, tick_s: float, max_workers: Optional[int] = None,
+                 output_file: Optional[str] = None,
+                 scheduler: Optional[AdaptiveScheduler] = None,
+                 epi_metrics: Union[None, bool, list[str]] = None,
+                 metrics_file: Optional[str] = None) -> list[RunResult]:
+    """Run every scenario of sweep once per seed over a pool of max_workers processes (one per core
+    by default), and return the results in the order the runs finished. A seeds count of n means
+    seeds 0 to n - 1. Each seed gives its runs independent random streams (see SimRandom), and every scenario
+    shares the same seeds, so that scenarios are compared on the same random draws.
+    If output_file is given, each run is appended to it as soon as it finishes, as a Parquet file if
+    its name ends in .parquet and as a csv otherwise.
+    If a scheduler is given, it chooses the length of each step instead of tick_s.
+    If epi_metrics is given, those metrics (see SimManager) are collected by every run, and appended to
+    metrics_file in the same way if it is given.
+    """
+    scenarios = expand_overrides(sweep)
+    if isinstance(seeds, int):
+        seeds = list(range(seeds))
+
+    # Checks overrides in this process, so that a typo fails before anything is started
+    for overrides in scenarios:
+        replace(base_params, **overrides)
+
+    results = []
+    fields = sorted({field for overrides in scenarios for field in overrides})
+    sink = _open_sink(output_file, ['scenario', 'seed'] + fields + ['time_s', 'case_proportion'])
+    metrics_sink = None
+    if epi_metrics:
+        metrics_sink = _open_sink(metrics_file, ['scenario', 'seed'] + fields +
+                                  get_metric_columns(None if epi_metrics is True else epi_metrics))
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(_run_scenario, asdict(base_params), overrides, k, seed, duration_s, tick_s,
+                                       scheduler, epi_metrics)
+                       for k, overrides in enumerate(scenarios) for seed in seeds]
+
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except BaseException:
+                    # Drops the queued runs instead of waiting for them to fail the same way
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                results.append(result)
+                logging.info("Finished scenario " + str(result.scenario) + " seed " + str(result.seed) +
+                             " (" + str(len(results)) + "/" + str(len(futures)) + ")")
+
+                # Fields a scenario doesn't override are left empty
+                values = [result.overrides.get(field) for field in fields]
+                if sink is not None:
+                    for row in result.history:
+                        sink.write_row([result.scenario, result.seed] + values + list(row))
+                if metrics_sink is not None:
+                    for row in result.metrics:
+                        metrics_sink.write_row([result.scenario, result.seed] + values + list(row))
+    finally:
+        for open_sink in (sink, metrics_sink):
+            if open_sink is not None:
+                open_sink.close()
+    return results
+
+
+def summarize(results: list[RunResult]) -> dict[int, tuple[float, float, float]]:
+    """Return, for each scenario, the mean proportion of people infected at the end of its runs, and
+    the bounds of its 95% confidence interval (normal approximation)"""
+    by_scenario: dict[int, list[float]] = {}
+    for result in results:
+        by_scenario.setdefault(result.scenario, []).append(result.infected / result.population)
+
+    summary = {}
+    for scenario, proportions in sorted(by_scenario.items()):
+        mean = float(np.mean(proportions))
+        half_width = 1.96 * float(np.std(proportions, ddof=1)) / math.sqrt(len(proportions)) \
+            if len(proportions) > 1 else 0.0
+        summary[scenario] = (mean, mean - half_width, mean + half_width)
+    return summary
+
+
+def _open_sink(filename: Optional[str], columns: list[str]) -> Optional[MetricsSink]:
+    """Return a sink writing to filename, as a Parquet file if it ends in .parquet and as a csv otherwise,
+    or None if filename is None"""
+    if filename is None:
+        return None
+    sink_class = ParquetMetricsSink if filename.endswith('.parquet') else CsvMetricsSink
+    return sink_class(filename, columns)
+
+
+def _run_scenario(param_dict: dict, overrides: dict, scenario: int, seed: int,
+                  duration_s: float, tick_s: float, scheduler: Optional[AdaptiveScheduler],
+                  epi_metrics: Union[None, bool, list[str]]) -> RunResult:
+    """Run one simulation in a worker process. Parameters are sent as a dict since they are pickled"""
+    start = time.perf_counter()
+    sim = run_simulation(SimParams(**{**param_dict, **overrides}), duration_s, tick_s, output_dir=None, seed=seed,
+                         scheduler=scheduler, epi_metrics=epi_metrics)
+    people = sim.city.people
+    return RunResult(scenario=scenario, seed=seed, overrides=overrides, history=sim.history,
+                     metrics=sim.collector.sink.rows if sim.collector is not None else [],
+                     infected=int(people.is_infected.sum()), dead=int(people.is_dead.sum()),
+                     population=len(people), wall_s=time.perf_counter() - start)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run an ensemble with the command line arguments in argv (sys.argv by default)"""
+    parser = argparse.ArgumentParser(prog='python -m sim.ensemble',
+                                     description="Run many simulations in parallel without graphics")
+    parser.add_argument('params', help="JSON or YAML file holding the base SimParams fields")
+    parser.add_argument('--sweep', help="JSON file mapping fields to lists of values, or holding a list of overrides")
+    parser.add_argument('--seeds', type=int, default=1, help="number of runs per scenario (default 1)")
+    parser.add_argument('--duration', type=float, required=True, help="simulated time to run for, in seconds")
+    parser.add_argument('--tick', type=float, default=10, help="simulated seconds per step (default 10)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="take long steps while nobody can be infected, and steps of --tick otherwise")
+    parser.add_argument('--max-step', type=float, default=600, help="longest adaptive step in seconds (default 600)")
+    parser.add_argument('--workers', type=int, default=None, help="number of processes (default one per core)")
+    parser.add_argument('--output', default='./simdata/ensemble.csv', help="csv or .parquet file to write every run to")
+    parser.add_argument('--metrics', nargs='*', choices=list(METRICS), default=None,
+                        help="record these epidemiological metrics in every run, or all of them if none are given")
+    parser.add_argument('--metrics-output', default='./simdata/ensemble_metrics.csv',
+                        help="csv or .parquet file to write the metrics of every run to")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log progress")
+    args = parser.parse_args(argv)
+
+    if args.seeds < 1:
+        parser.error("--seeds must be at least 1")
+    if args.tick <= 0:
+        parser.error("--tick must be positive")
+    if args.adaptive and args.max_step < args.tick:
+        parser.error("--max-step can't be shorter than --tick")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    sweep = {}
+    if args.sweep is not None:
+        with open(args.sweep) as f:
+            sweep = json.load(f)
+
+    scenarios = expand_overrides(sweep)
+    results = run_ensemble(load_params(args.params), sweep, args.seeds, args.duration, args.tick,
+                           args.workers, args.output,
+                           AdaptiveScheduler(args.tick, args.max_step) if args.adaptive else None,
+                           (args.metrics or True) if args.metrics is not None else None, args.metrics_output)
+
+    for scenario, (mean, low, high) in summarize(results).items():
+        print("Scenario " + str(scenario) + " " + json.dumps(scenarios[scenario]) + ": " +
+              str(round(mean, 4)) + " infected (95% CI " + str(round(low, 4)) + " to " + str(round(high, 4)) + ")")
+    print("Data written to " + args.output)
+    if args.metrics is not None:
+        print("Metrics written to " + args.metrics_output)
+
+
+if __name__ == '__main__':
+    main()
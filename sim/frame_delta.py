@@ -0,0 +1,212 @@
+"""CovSim Sim Package: Frame Delta
+
+Module Description
+==================
+This module encodes the state of every person as a compact stream of frames, for sending to
+viewers over a pipe or network. Every keyframe_interval frames, a keyframe holds everyone.
+The frames in between only hold the people who moved by at least threshold since they were
+last sent, or whose state changed, so frames of a city where most people are inside or
+standing still stay small. Positions are rounded to multiples of a resolution and written as
+variable length integers, relative to the last position sent in delta frames.
+
+A frame is, in order:
+    - kind: one byte, KEYFRAME or DELTA
+    - sequence number of the frame, as a varint, so that a missing frame can be noticed
+    - simulated time, as a little endian float64
+    - resolution, as a little endian float64, in keyframes only
+    - number of people in the frame, as a varint
+    - index of each person, as varints of the gap from the previous index, in delta frames only
+    - x and y of each person, as zigzag varints of multiples of the resolution
+    - FrameFlags of each person, one byte each
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Optional
+from sim.trajectory import FrameFlags, get_frame_dtype
+import numpy as np
+
+# Kinds of frame
+KEYFRAME = 0
+DELTA = 1
+
+
+class DeltaEncoder:
+    """
+    Encodes the state of num_people people into keyframes and delta frames (see the module description).
+
+    Instance Attributes:
+        - num_people: number of people encoded
+        - keyframe_interval: number of frames from one keyframe to the next
+        - resolution: positions are rounded to multiples of this distance (DU)
+        - threshold: least distance (DU) along x or y a person outside has to move from where they were last
+        sent to be sent again
+        - num_frames: number of frames encoded so far
+    """
+    def __init__(self, num_people: int, keyframe_interval: int = 60, resolution: float = 0.5,
+                 threshold: float = 1.0):
+        assert keyframe_interval > 0
+        self.num_people = num_people
+        self.keyframe_interval = keyframe_interval
+        self.resolution = resolution
+        self.threshold = threshold
+        self.num_frames = 0
+
+        # State of everyone as last sent
+        self._sent_x = np.zeros(num_people, dtype=np.int64)
+        self._sent_y = np.zeros(num_people, dtype=np.int64)
+        self._sent_flags = np.zeros(num_people, dtype=np.uint8)
+
+    def encode(self, time_s: float, x: np.ndarray, y: np.ndarray, flags: np.ndarray) -> bytes:
+        """Return the next frame of the people with positions x and y, and FrameFlags flags. Positions of
+        people inside or dead are not looked at, and may be nan"""
+        qx = _quantize(x, self.resolution)
+        qy = _quantize(y, self.resolution)
+        is_keyframe = self.num_frames % self.keyframe_interval == 0
+
+        parts = [bytes([KEYFRAME if is_keyframe else DELTA]), encode_varints(np.array([self.num_frames])),
+                 np.float64(time_s).tobytes()]
+        if is_keyframe:
+            index = np.arange(self.num_people)
+            parts.append(np.float64(self.resolution).tobytes())
+            parts.append(encode_varints(np.array([len(index)])))
+            parts.append(encode_varints(zigzag(qx)))
+            parts.append(encode_varints(zigzag(qy)))
+        else:
+            is_outdoor = (flags & (FrameFlags.INDOOR | FrameFlags.DEAD)) == 0
+            threshold = self.threshold / self.resolution
+            has_moved = is_outdoor & ((np.abs(qx - self._sent_x) >= threshold) |
+                                      (np.abs(qy - self._sent_y) >= threshold))
+            index = np.flatnonzero(has_moved | (flags != self._sent_flags))
+            parts.append(encode_varints(np.array([len(index)])))
+            parts.append(encode_varints(np.diff(index, prepend=0)))
+            parts.append(encode_varints(zigzag(qx[index] - self._sent_x[index])))
+            parts.append(encode_varints(zigzag(qy[index] - self._sent_y[index])))
+        parts.append(flags[index].astype(np.uint8).tobytes())
+
+        self._sent_x[index] = qx[index]
+        self._sent_y[index] = qy[index]
+        self._sent_flags[index] = flags[index]
+        self.num_frames += 1
+        return b''.join(parts)
+
+
+class DeltaDecoder:
+    """
+    Rebuilds the state of every person from the frames of a DeltaEncoder. Delta frames are ignored until
+    the first keyframe arrives, and after a frame goes missing, until the next keyframe.
+
+    Instance Attributes:
+        - frame: the state of every person as of the last frame decoded, a record of get_frame_dtype. Building
+        indexes are not sent, so they are -1 for everyone. None until the first keyframe
+        - is_synced: whether frame is up to date with the last frame decoded
+    """
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+        self.is_synced = False
+
+        self._x = np.zeros(0, dtype=np.int64)
+        self._y = np.zeros(0, dtype=np.int64)
+        self._resolution = 1.0
+        self._next_frame = 0
+
+    def decode(self, data: bytes) -> bool:
+        """Apply the frame data to frame, and return is_synced"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        kind = int(buffer[0])
+        (number,), offset = decode_varints(buffer, 1, 1)
+        time_s = float(np.frombuffer(data, dtype='<f8', count=1, offset=offset)[0])
+        offset += 8
+
+        if kind == KEYFRAME:
+            self._resolution = float(np.frombuffer(data, dtype='<f8', count=1, offset=offset)[0])
+            offset += 8
+            (count,), offset = decode_varints(buffer, 1, offset)
+            qx, offset = decode_varints(buffer, count, offset)
+            qy, offset = decode_varints(buffer, count, offset)
+            self._x = unzigzag(qx)
+            self._y = unzigzag(qy)
+            if self.frame is None or len(self.frame['x']) != count:
+                self.frame = np.zeros((), dtype=get_frame_dtype(count))
+                self.frame['building'] = -1
+            self.frame['flags'] = buffer[offset:offset + count]
+            self.is_synced = True
+        elif kind == DELTA:
+            if not self.is_synced or number != self._next_frame:
+                self.is_synced = False
+                return False
+            (count,), offset = decode_varints(buffer, 1, offset)
+            gaps, offset = decode_varints(buffer, count, offset)
+            dx, offset = decode_varints(buffer, count, offset)
+            dy, offset = decode_varints(buffer, count, offset)
+            index = np.cumsum(gaps.astype(np.int64))
+            self._x[index] += unzigzag(dx)
+            self._y[index] += unzigzag(dy)
+            self.frame['flags'][index] = buffer[offset:offset + count]
+        else:
+            raise ValueError("Unknown frame kind " + str(kind))
+
+        self._next_frame = number + 1
+        self.frame['time_s'] = time_s
+        self.frame['x'] = self._x * self._resolution
+        self.frame['y'] = self._y * self._resolution
+        return self.is_synced
+
+
+def _quantize(values: np.ndarray, resolution: float) -> np.ndarray:
+    """Return values as the nearest multiples of resolution, where nan is taken as 0"""
+    return np.round(np.nan_to_num(values) / resolution).astype(np.int64)
+
+
+def zigzag(values: np.ndarray) -> np.ndarray:
+    """Return the signed integers values mapped to unsigned ones, alternating between positive and negative
+    values (0, -1, 1, -2, ... map to 0, 1, 2, 3, ...), so that small values stay small"""
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def unzigzag(values: np.ndarray) -> np.ndarray:
+    """Return the signed integers mapped to values by zigzag"""
+    values = np.asarray(values, dtype=np.uint64)
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """Return the unsigned integers values as variable length integers, 7 bits to a byte starting with the
+    lowest ones, where the top bit of every byte but the last of each value is set"""
+    values = np.asarray(values).astype(np.uint64)
+    if len(values) == 0:
+        return b''
+    lengths = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        lengths += values >= np.uint64(1 << (7 * k))
+
+    position = np.arange(lengths.max())
+    groups = (values[:, None] >> (7 * position).astype(np.uint64)) & np.uint64(0x7f)
+    groups |= np.where(position < lengths[:, None] - 1, np.uint64(0x80), np.uint64(0))
+    return groups[position < lengths[:, None]].astype(np.uint8).tobytes()
+
+
+def decode_varints(buffer: np.ndarray, count: int, offset: int) -> tuple[np.ndarray, int]:
+    """Return the count variable length integers (see encode_varints) starting at offset in the bytes of
+    buffer, and the offset just after them"""
+    if count == 0:
+        return np.zeros(0, dtype=np.uint64), offset
+    data = buffer[offset:]
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) < count:
+        raise ValueError("Frame ended before its last varint")
+    data = data[:ends[count - 1] + 1]
+
+    starts = np.concatenate(([0], ends[:count - 1] + 1))
+    position = np.arange(len(data)) - np.repeat(starts, np.diff(np.append(starts, len(data))))
+    parts = (data & 0x7f).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.bitwise_or.reduceat(parts, starts), offset + len(data)
@@ -0,0 +1,187 @@
+"""CovSim Sim Package: Metrics
+
+Module Description
+==================
+This module contains the epidemiological metrics collector, which records a time series of the
+state of the epidemic every tick: new and total infections, deaths by cause, the kind of building
+people were heading to when infected, the effective reproduction number, and more. Every metric
+is kept up to date as people are infected and die (see Population.listeners) instead of being
+recomputed from the whole population, so the collector is cheap enough to leave on.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Callable, Optional, TYPE_CHECKING
+from sim.metrics_sink import MetricsSink
+import bisect
+import math
+import numpy as np
+
+if TYPE_CHECKING:
+    import sim.sim_components as sc
+
+
+class MetricsCollector:
+    """
+    Records the chosen metrics of a city to a sink every time record is called, at most once every
+    interval_s simulated seconds. Counts of new events are since the previous row.
+
+    Instance Attributes:
+        - city: the city the metrics are taken from
+        - sink: where each row is written, with the columns given by get_metric_columns(names)
+        - names: names of the metrics recorded, in order (see METRICS)
+        - interval_s: least simulated seconds between two rows, 0 to record every tick
+        - reproduction_window_s: length of the cohorts the reproduction number is estimated from. Infections
+        in aggregate steps (see SimManager.progress_aggregate) have no known infector, so the estimate only
+        counts infections at agent level
+        - cumulative_infections: number of people ever infected, including the initially infected
+        - deaths: number of deaths of each Person.CausesOfDeath so far
+        - secondary_infections: number of people each person has infected so far
+    """
+    def __init__(self, city: sc.City, sink: MetricsSink, names: Optional[list[str]] = None,
+                 interval_s: float = 0, reproduction_window_s: float = 86400):
+        self.city = city
+        self.sink = sink
+        self.names = list(METRICS) if names is None else list(names)
+        _check_names(self.names)
+        self.interval_s = interval_s
+        self.reproduction_window_s = reproduction_window_s
+
+        num_people = len(city.people)
+        self.cumulative_infections = len(city.infected)
+        self.deaths = np.zeros(len(_get_causes_of_death()), dtype=np.int64)
+        self.secondary_infections = np.zeros(num_people, dtype=np.int32)
+
+        # Counts since the last row
+        self._new_infections = 0
+        self._new_by_type = np.zeros(len(_get_building_types()) + 1, dtype=np.int64)
+        self._new_masked = 0
+        self._new_vaccinated = 0
+
+        # Every infection in order, so that cohorts are found by bisection
+        self._infection_times: list[float] = []
+        self._infection_index: list[int] = []
+
+        self._last_row_s = -math.inf
+        city.people.listeners.append(self)
+
+    def on_infected(self, index: np.ndarray, infectors: np.ndarray) -> None:
+        """Count the infection of the people at index by infectors (see Population.listeners)"""
+        pop = self.city.people
+        self.cumulative_infections += len(index)
+        self._new_infections += len(index)
+        self._new_by_type += np.bincount(self.city.get_destination_types(index), minlength=len(self._new_by_type))
+        self._new_masked += int(pop.is_wearing_mask[index].sum())
+        self._new_vaccinated += int(pop.is_vaccinated[index].sum())
+
+        np.add.at(self.secondary_infections, infectors[infectors >= 0], 1)
+        self._infection_times.extend([self.city.time_s] * len(index))
+        self._infection_index.extend(index.tolist())
+
+    def on_killed(self, index: np.ndarray, cause: sc.Person.CausesOfDeath) -> None:
+        """Count the deaths of the people at index (see Population.listeners)"""
+        self.deaths[int(cause)] += len(index)
+
+    def record(self) -> None:
+        """Write a row of every metric if interval_s has passed since the last row"""
+        if self.city.time_s - self._last_row_s < self.interval_s:
+            return
+        row = [self.city.time_s]
+        for name in self.names:
+            row.extend(METRICS[name][1](self))
+        self.sink.write_row(row)
+
+        self._last_row_s = self.city.time_s
+        self._new_infections = 0
+        self._new_by_type[:] = 0
+        self._new_masked = 0
+        self._new_vaccinated = 0
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return the running totals of the collector by name, so that a restored simulation can carry on
+        counting from them (see set_state). Counts since the last row are not included"""
+        return {'cumulative_infections': np.array(self.cumulative_infections),
+                'deaths': self.deaths,
+                'secondary_infections': self.secondary_infections,
+                'infection_times': np.array(self._infection_times, dtype=float),
+                'infection_index': np.array(self._infection_index, dtype=np.int64)}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        """Continue counting from the running totals in state, as returned by get_state"""
+        self.cumulative_infections = int(state['cumulative_infections'])
+        self.deaths = np.array(state['deaths'])
+        self.secondary_infections = np.array(state['secondary_infections'])
+        self._infection_times = state['infection_times'].tolist()
+        self._infection_index = state['infection_index'].tolist()
+
+    def get_reproduction_number(self) -> float:
+        """Return the average number of people infected by each person infected between two and one
+        reproduction windows ago, so far, or nan if nobody was infected then. People infected more
+        recently haven't had time to infect others yet, and would bias the estimate down"""
+        end_s = self.city.time_s - self.reproduction_window_s
+        start = bisect.bisect_left(self._infection_times, end_s - self.reproduction_window_s)
+        end = bisect.bisect_left(self._infection_times, end_s)
+        if start == end:
+            return math.nan
+        return float(self.secondary_infections[self._infection_index[start:end]].mean())
+
+
+def get_metric_columns(names: Optional[list[str]] = None) -> list[str]:
+    """Return the name of every column of a row of the metrics in names (all of METRICS by default),
+    starting with the simulated time"""
+    names = list(METRICS) if names is None else names
+    _check_names(names)
+    return ['time_s'] + [column for name in names for column in METRICS[name][0]()]
+
+
+def _check_names(names: list[str]) -> None:
+    """Raise a ValueError if any of names is not in METRICS"""
+    for name in names:
+        if name not in METRICS:
+            raise ValueError("Unknown metric " + repr(name) + ", expected one of " + ", ".join(METRICS))
+
+
+def _get_causes_of_death() -> type:
+    """Return Person.CausesOfDeath"""
+    # Imported here since sim_components imports this module through sim_manager
+    import sim.sim_components as sc
+    return sc.Person.CausesOfDeath
+
+
+def _get_building_types() -> type:
+    """Return Building.Types"""
+    import sim.sim_components as sc
+    return sc.Building.Types
+
+
+def _lower_names(enum: type) -> list[str]:
+    """Return the lowercase name of each member of enum"""
+    return [member.name.lower() for member in enum]
+
+
+# Each metric that can be recorded, as a function returning the names of its columns, and a function returning
+# their values. Column names are looked up when needed, since sim_components may not be loaded yet
+METRICS: dict[str, tuple[Callable[[], list[str]], Callable[[MetricsCollector], list]]] = {
+    'new_infections': (lambda: ['new_infections'], lambda m: [m._new_infections]),
+    'cumulative_infections': (lambda: ['cumulative_infections'], lambda m: [m.cumulative_infections]),
+    'infected': (lambda: ['infected'], lambda m: [len(m.city.infected)]),
+    'susceptible': (lambda: ['susceptible'], lambda m: [len(m.city.susceptible)]),
+    'deaths': (lambda: ['deaths_' + name for name in _lower_names(_get_causes_of_death())],
+               lambda m: m.deaths.tolist()),
+    'infections_by_building': (lambda: ['new_infections_' + name for name in _lower_names(_get_building_types())]
+                               + ['new_infections_no_building'], lambda m: m._new_by_type.tolist()),
+    'reproduction_number': (lambda: ['reproduction_number'], lambda m: [m.get_reproduction_number()]),
+    'masks': (lambda: ['new_infections_masked', 'new_infections_unmasked'],
+              lambda m: [m._new_masked, m._new_infections - m._new_masked]),
+    'vaccination': (lambda: ['new_infections_vaccinated', 'new_infections_unvaccinated'],
+                    lambda m: [m._new_vaccinated, m._new_infections - m._new_vaccinated]),
+    'outdoor': (lambda: ['outdoor'], lambda m: [len(m.city.outdoor)]),
+}
@@ -0,0 +1,201 @@
+"""CovSim Sim Package: Metrics Sink
+
+Module Description
+==================
+This module contains the sinks the simulation writes its recorded rows to. A sink keeps its file
+open for the whole run and buffers rows in memory, writing them out in batches once enough rows
+or enough time has built up, and when it is closed. This keeps the number of writes low when many
+runs share slow or networked storage. Rows can be written as csv, or as columnar Parquet files
+if pyarrow is installed.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Any, Optional
+import atexit
+import csv
+import time
+import weakref
+
+
+class MetricsSink:
+    """
+    Buffers rows of metrics and writes them out in batches. Subclasses choose the file format by
+    implementing _write_rows, and closing the file in close.
+
+    Rows still buffered when the program exits are written out by every sink still open, so closing the
+    sink explicitly is only needed to release the file earlier. Sinks are only weakly referenced for this,
+    so one which is dropped without being closed is not kept alive, but loses its buffered rows.
+
+    Instance Attributes:
+        - filename: path of the file the rows are written to
+        - columns: name of each value in a row
+        - max_rows: number of buffered rows which triggers a write
+        - max_interval_s: real seconds after the last write at which the next row triggers a write,
+        or None to only write by size
+        - is_closed: whether the sink was closed, after which no more rows can be written
+    """
+    def __init__(self, filename: str, columns: list[str], max_rows: int = 1000,
+                 max_interval_s: Optional[float] = 5.0):
+        assert max_rows > 0
+        self.filename = filename
+        self.columns = list(columns)
+        self.max_rows = max_rows
+        self.max_interval_s = max_interval_s
+        self.is_closed = False
+
+        self._buffer: list[tuple] = []
+        self._last_flush = time.monotonic()
+        _open_sinks.add(self)
+
+    def write_row(self, row: Any) -> None:
+        """Buffer a row holding one value per column, writing out the buffer if a threshold is reached"""
+        if self.is_closed:
+            raise ValueError("Can't write to a closed metrics sink")
+        self._buffer.append(tuple(row))
+
+        if len(self._buffer) >= self.max_rows or \
+                (self.max_interval_s is not None and time.monotonic() - self._last_flush >= self.max_interval_s):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out every buffered row"""
+        if self._buffer:
+            self._write_rows(self._buffer)
+            self._buffer = []
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Write out every buffered row and stop accepting new ones. Closing twice does nothing"""
+        if self.is_closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.is_closed = True
+            _open_sinks.discard(self)
+
+    def _write_rows(self, rows: list[tuple]) -> None:
+        """Write rows to the file"""
+        raise NotImplementedError
+
+    def __enter__(self) -> MetricsSink:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CsvMetricsSink(MetricsSink):
+    """
+    Writes rows to a csv file, starting with a header row of the column names.
+    """
+    def __init__(self, filename: str, columns: list[str], max_rows: int = 1000,
+                 max_interval_s: Optional[float] = 5.0):
+        self._file = open(filename, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+        self._file.flush()
+        super().__init__(filename, columns, max_rows, max_interval_s)
+
+    def _write_rows(self, rows: list[tuple]) -> None:
+        self._writer.writerows(rows)
+        # Hands the rows to the OS, so that readers of the file see them
+        self._file.flush()
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._file.close()
+
+
+class ParquetMetricsSink(MetricsSink):
+    """
+    Writes rows to a Parquet file, one row group per write. The type of each column is taken from the
+    first rows written, where columns holding only None are taken to be floats. Requires pyarrow.
+
+    Parquet files can only be read once they are closed, so the rows are only readable after close.
+    A file is written even if no rows were, with every column taken to be floats.
+    """
+    def __init__(self, filename: str, columns: list[str], max_rows: int = 10000,
+                 max_interval_s: Optional[float] = None):
+        # Only needed for Parquet files, so it is not a dependency of the simulation
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("pyarrow is required to write Parquet metrics")
+        self._pa = pyarrow
+        self._writer: Optional[pyarrow.parquet.ParquetWriter] = None
+        super().__init__(filename, columns, max_rows, max_interval_s)
+
+    def _write_rows(self, rows: list[tuple]) -> None:
+        table = self._pa.Table.from_pydict({name: list(values) for name, values in zip(self.columns, zip(*rows))})
+        if self._writer is None:
+            self._open_writer([self._pa.field(f.name, self._pa.float64()) if self._pa.types.is_null(f.type)
+                               else f for f in table.schema])
+        self._writer.write_table(table.cast(self._writer.schema))
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            if self._writer is None:
+                self._open_writer([self._pa.field(name, self._pa.float64()) for name in self.columns])
+            self._writer.close()
+
+    def _open_writer(self, fields: list) -> None:
+        """Create the file, with a column of each of fields"""
+        self._writer = self._pa.parquet.ParquetWriter(self.filename, self._pa.schema(fields))
+
+
+class MemoryMetricsSink(MetricsSink):
+    """
+    Keeps rows in memory instead of writing them to a file, e.g. for runs whose results are
+    collected by the caller.
+
+    Instance Attributes:
+        - rows: every row written out so far
+    """
+    def __init__(self, columns: list[str]):
+        self.rows: list[tuple] = []
+        # Rows are kept as soon as they are written, since there is no file to batch writes to
+        super().__init__('', columns, 1, None)
+
+    def _write_rows(self, rows: list[tuple]) -> None:
+        self.rows.extend(rows)
+
+
+# Every sink not closed yet, which are closed when the program exits
+_open_sinks: weakref.WeakSet[MetricsSink] = weakref.WeakSet()
+
+
+@atexit.register
+def _close_open_sinks() -> None:
+    """Close every sink still open, writing out their buffered rows"""
+    for sink in list(_open_sinks):
+        sink.close()
+
+
+# File extension of each format, and the sink which writes it
+METRICS_FORMATS = {'csv': ('.csv', CsvMetricsSink), 'parquet': ('.parquet', ParquetMetricsSink)}
+
+
+def open_metrics_sink(path_without_extension: str, columns: list[str], metrics_format: str = 'csv',
+                      **kwargs) -> MetricsSink:
+    """Return a sink writing to path_without_extension plus the extension of metrics_format, one of
+    METRICS_FORMATS. Other keyword arguments are passed on to the sink"""
+    if metrics_format not in METRICS_FORMATS:
+        raise ValueError("Unknown metrics format " + repr(metrics_format) + ", expected one of " +
+                         ", ".join(METRICS_FORMATS))
+    extension, sink_class = METRICS_FORMATS[metrics_format]
+    return sink_class(path_without_extension + extension, columns, **kwargs)
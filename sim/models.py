@@ -16,25 +16,48 @@ using this code in any other way is prohibited.
 This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
 from __future__ import annotations
-import random
 import math
+import numpy as np
+from typing import Optional, Union
 from geometry.helpers import *
 from geometry.geometry import *
 from sim.sim_components import *
 
 
-def roll_probability(prob: float) -> bool:
+# Decimal places infection probabilities are rounded to before they are rolled
+INFECTION_ROLL_ACCURACY = 4
+
+
+def roll_probability(prob: float, rng: np.random.Generator, accuracy: Optional[int] = None) -> bool:
     """
-    Roll the probability and return whether it was successful
+    Roll the probability with the random generator rng and return whether it was successful.
+    If accuracy is given, prob is first rounded to that many decimal places, the same way as
+    roll_probabilities rounds
 
     Preconditions:
         - 0 <= prob <= 1
     """
-    total = 1
-    while prob != int(prob):
-        total *= 10
-        prob *= 10
-    return random.randint(1, total) <= prob
+    if accuracy is not None:
+        prob = np.round(prob, accuracy)
+    return bool(rng.random() < prob)
+
+
+def roll_probabilities(probs: np.ndarray, rng: np.random.Generator, accuracy: Optional[int] = None) -> np.ndarray:
+    """
+    Roll every probability in probs with the random generator rng, drawing one uniform value each,
+    and return a boolean array of which rolls were successful. If accuracy is given, probabilities
+    are first rounded to that many decimal places, so ones which round to 0 never succeed.
+
+    A value is drawn for every probability, including 0 and 1, so that the numbers drawn by later
+    rolls do not depend on the values of earlier probabilities
+
+    Preconditions:
+        - all(0 <= p <= 1 for p in probs)
+    """
+    probs = np.asarray(probs, dtype=float)
+    if accuracy is not None:
+        probs = np.round(probs, accuracy)
+    return rng.random(probs.shape) < probs
 
 
 def hunger_change_per_second() -> float:
@@ -107,12 +130,15 @@ def probability_infected_from_paths(path1: Path, path2: Path, delta_time_s: floa
                                     healthy_hunger: float, healthy_temp: float,
                                     is_mask_healthy: bool, is_mask_infected: bool,
                                     was_previously_infected_healthy: bool,
-                                    is_vaccinated_healthy: bool
+                                    is_vaccinated_healthy: bool,
+                                    is_exact_average=True
                                     ) -> float:
     """
     Given 2 paths which represent the movement of 2 people over a delta time, assuming
     one is infected and one is not, return the probability that the healthy person got
     infected using the distance model.
+
+    is_exact_average is passed on to probability_infected_from_vectors
     """
 
     distances = [sum(dist(v.start, v.end) for v in path1.get_vectors()),
@@ -189,7 +215,8 @@ def probability_infected_from_paths(path1: Path, path2: Path, delta_time_s: floa
                                                        healthy_hunger, healthy_temp,
                                                        is_mask_healthy, is_mask_infected,
                                                        was_previously_infected_healthy,
-                                                       is_vaccinated_healthy) for i in range(len(vecs_1))]
+                                                       is_vaccinated_healthy,
+                                                       is_exact_average) for i in range(len(vecs_1))]
     # in a list of probs, the chance of the event occurring is 1-(chance of event not occurring in all probs)
     return 1 - math.prod([1 - prob for prob in probabilities])
 
@@ -199,24 +226,230 @@ def probability_infected_from_vectors(v1: Vector, v2: Vector, delta_time_s: floa
                                       is_mask_healthy: bool, is_mask_infected: bool,
                                       was_previously_infected_healthy: bool,
                                       is_vaccinated_healthy: bool,
+                                      is_exact_average=True,
                                       trapezoidal_intervals_per_sec=10) -> float:
     """
     Given 2 vectors which represent the movement of 2 people over a delta time, assuming
     one is infected and one is not, return the probability that the healthy person got
     infected using the distance model.
 
-    trapezoidal_intervals_per_sec is used to specify how many intervals to use in integral
-    approximation when finding distance function average, for each second of time delta
+    If is_exact_average, the average distance between the vectors is found in closed form. Otherwise,
+    it is approximated by sampling, and trapezoidal_intervals_per_sec is used to specify how many
+    intervals to use in integral approximation when finding distance function average, for each
+    second of time delta. Sampling is slower and is kept as a reference for the exact average.
     """
-    # Distance function between vectors over time, where d(0) is the distance between vector
-    # starting points and d(delta_time_s) is the distance between their endpoints
-    d = distance_func_between_vectors(v1, v2, delta_time_s)
+    if is_exact_average:
+        average_dist = average_distance_between_vectors(v1, v2, delta_time_s)
+    else:
+        # Distance function between vectors over time, where d(0) is the distance between vector
+        # starting points and d(delta_time_s) is the distance between their endpoints
+        d = distance_func_between_vectors(v1, v2, delta_time_s)
 
-    # Find average distance between vectors on the time interval
-    average_dist = approximated_function_average_on_interval(int(round(trapezoidal_intervals_per_sec * delta_time_s)),
-                                                             0, delta_time_s, d)
+        # Find average distance between vectors on the time interval
+        average_dist = approximated_function_average_on_interval(
+            int(round(trapezoidal_intervals_per_sec * delta_time_s)), 0, delta_time_s, d)
 
     return scale_probability(
         probability_infection_per_sec_at_distance(average_dist, healthy_hunger, healthy_temp, is_mask_healthy,
                                                   is_mask_infected, was_previously_infected_healthy,
                                                   is_vaccinated_healthy), 1, delta_time_s)
+
+
+def probability_infection_per_sec_at_distance_batch(distance: np.ndarray, healthy_hunger: np.ndarray,
+                                                    healthy_temp: np.ndarray, is_mask_healthy: np.ndarray,
+                                                    is_mask_infected: np.ndarray,
+                                                    was_previously_infected_healthy: np.ndarray,
+                                                    is_vaccinated_healthy: np.ndarray) -> np.ndarray:
+    """Array version of probability_infection_per_sec_at_distance, where every argument is an array
+    (or scalar) holding one value per healthy and infected pair"""
+    # Evaluates base model probability from distance
+    prob_from_distance = np.clip(.225 * np.exp2(-np.asarray(distance, dtype=float)), 0, 1)
+
+    # Applies the infected person's mask multiplier
+    prob_from_distance *= np.where(is_mask_infected, 0.5, 1)
+
+    prob_from_distance *= susceptibility_batch(healthy_hunger, healthy_temp, is_mask_healthy,
+                                               was_previously_infected_healthy, is_vaccinated_healthy)
+
+    return prob_from_distance
+
+
+def susceptibility_batch(healthy_hunger: np.ndarray, healthy_temp: np.ndarray, is_mask_healthy: np.ndarray,
+                         was_previously_infected_healthy: np.ndarray, is_vaccinated_healthy: np.ndarray) -> np.ndarray:
+    """Return the multiplier on the probability of infection of each healthy person which only depends on
+    that person, as used by probability_infection_per_sec_at_distance_batch"""
+    # Applies cold and hunger multipliers
+    multiplier = np.maximum((-1 / 300) * np.asarray(healthy_hunger, dtype=float) + 1, 1)
+    multiplier = multiplier * np.maximum((-1 / 300) * np.asarray(healthy_temp, dtype=float) + 1, 1)
+
+    # Applies mask wearing multiplier
+    multiplier *= np.where(is_mask_healthy, 0.5, 1)
+
+    # Applies vaccination and reinfection multipliers
+    multiplier *= np.where(is_vaccinated_healthy, 0.01, 1) * np.where(was_previously_infected_healthy, 0.05, 1)
+
+    return multiplier
+
+
+def scale_probability_batch(pc: np.ndarray, sc: float, sn: np.ndarray, accuracy=3) -> np.ndarray:
+    """Array version of scale_probability"""
+    return np.round(1 - (1 - pc) ** (np.asarray(sn, dtype=float) / sc), accuracy)
+
+
+def average_distance_between_segments_batch(x1a: np.ndarray, y1a: np.ndarray, x1b: np.ndarray, y1b: np.ndarray,
+                                            x2a: np.ndarray, y2a: np.ndarray, x2b: np.ndarray, y2b: np.ndarray,
+                                            delta_time_s: Union[float, np.ndarray],
+                                            is_exact_average=True,
+                                            trapezoidal_intervals_per_sec=10) -> np.ndarray:
+    """
+    Array version of the average distance used by probability_infected_from_vectors. Row i describes
+    person 1 moving linearly from (x1a, y1a) to (x1b, y1b) while person 2 moves linearly from (x2a, y2a)
+    to (x2b, y2b), both over delta_time_s[i] seconds.
+
+    If is_exact_average, the closed form of average_distance_between_vectors is used, otherwise the
+    same trapezoidal approximation as the scalar path is used.
+    """
+    x1a, y1a, x1b, y1b, x2a, y2a, x2b, y2b = (np.asarray(a, dtype=float)
+                                              for a in (x1a, y1a, x1b, y1b, x2a, y2a, x2b, y2b))
+    delta_time_s = np.broadcast_to(np.asarray(delta_time_s, dtype=float), x1a.shape)
+
+    # Relative position of person 1 to person 2 at the start, and its change over the whole interval
+    rel_x = x1a - x2a
+    rel_y = y1a - y2a
+    change_x = x1b - x1a - x2b + x2a
+    change_y = y1b - y1a - y2b + y2a
+
+    if is_exact_average:
+        start_dist = np.hypot(rel_x, rel_y)
+        # Relative distance covered over the interval (speed * delta time)
+        travelled = np.hypot(change_x, change_y)
+        is_moving = travelled > 1e-9 * (1 + start_dist)
+        safe_travelled = np.where(is_moving, travelled, 1)
+
+        # See average_distance_between_vectors, every term here is scaled by delta time
+        closest = np.abs(rel_x * change_y - rel_y * change_x) / safe_travelled
+        w_start = (rel_x * change_x + rel_y * change_y) / safe_travelled
+        w_end = w_start + travelled
+        safe_closest = np.where(closest > 0, closest, 1)
+
+        def antiderivative(w: np.ndarray) -> np.ndarray:
+            return (w * np.hypot(w, closest) + closest ** 2 * np.arcsinh(w / safe_closest)) / 2
+
+        return np.where(is_moving, (antiderivative(w_end) - antiderivative(w_start)) / safe_travelled, start_dist)
+
+    averages = np.empty(x1a.shape)
+    intervals = np.rint(trapezoidal_intervals_per_sec * delta_time_s).astype(int)
+
+    # Rows with an equal number of trapezoidal intervals are sampled together
+    for n in np.unique(intervals):
+        rows = intervals == n
+        if n == 0:
+            # Too short to sample, so the starting distance is used
+            averages[rows] = np.hypot(rel_x[rows], rel_y[rows])
+            continue
+        # Fractions of the time interval at which the distance is sampled, shape (1, n + 1)
+        frac = np.linspace(0, 1, n + 1)[np.newaxis, :]
+        dists = np.hypot(rel_x[rows, np.newaxis] + change_x[rows, np.newaxis] * frac,
+                         rel_y[rows, np.newaxis] + change_y[rows, np.newaxis] * frac)
+        averages[rows] = (dists[:, 0] + dists[:, -1] + 2 * dists[:, 1:-1].sum(axis=1)) / (2 * n)
+
+    return averages
+
+
+def probabilities_infected_from_segments(x1a: np.ndarray, y1a: np.ndarray, x1b: np.ndarray, y1b: np.ndarray,
+                                         x2a: np.ndarray, y2a: np.ndarray, x2b: np.ndarray, y2b: np.ndarray,
+                                         delta_time_s: Union[float, np.ndarray],
+                                         healthy_hunger: np.ndarray, healthy_temp: np.ndarray,
+                                         is_mask_healthy: np.ndarray, is_mask_infected: np.ndarray,
+                                         was_previously_infected_healthy: np.ndarray,
+                                         is_vaccinated_healthy: np.ndarray,
+                                         is_exact_average=True,
+                                         trapezoidal_intervals_per_sec=10) -> np.ndarray:
+    """
+    Batched version of probability_infected_from_vectors. Row i describes an infected person 1 and a
+    healthy person 2 moving linearly over delta_time_s[i] seconds (see
+    average_distance_between_segments_batch), and the returned array holds the probability that each
+    healthy person got infected using the distance model.
+    """
+    average_dist = average_distance_between_segments_batch(x1a, y1a, x1b, y1b, x2a, y2a, x2b, y2b, delta_time_s,
+                                                           is_exact_average, trapezoidal_intervals_per_sec)
+
+    return scale_probability_batch(
+        probability_infection_per_sec_at_distance_batch(average_dist, healthy_hunger, healthy_temp,
+                                                        is_mask_healthy, is_mask_infected,
+                                                        was_previously_infected_healthy, is_vaccinated_healthy),
+        1, delta_time_s)
+
+
+def probabilities_infected_from_movements(t1: np.ndarray, x1: np.ndarray, y1: np.ndarray,
+                                          t2: np.ndarray, x2: np.ndarray, y2: np.ndarray,
+                                          healthy_hunger: np.ndarray, healthy_temp: np.ndarray,
+                                          is_mask_healthy: np.ndarray, is_mask_infected: np.ndarray,
+                                          was_previously_infected_healthy: np.ndarray,
+                                          is_vaccinated_healthy: np.ndarray,
+                                          is_exact_average=True,
+                                          trapezoidal_intervals_per_sec=10) -> np.ndarray:
+    """
+    Batched version of probability_infected_from_paths. Row i of the 2D arrays describes the movement of an
+    infected person 1 and a healthy person 2 over a tick as knots, where person 1 passed through (x1, y1)
+    at t1 seconds into the tick. Knot times must be ascending and start at 0, and the last column
+    of each row must hold the final knot at the end of the tick.
+
+    Like probability_infected_from_paths, the tick is split wherever either person passes a knot, so
+    that both move linearly during each piece, and the pieces are scored with
+    probabilities_infected_from_segments and combined.
+    """
+    def is_linear(t: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return which rows only hold knots on the line from their first to last knot, at constant speed"""
+        frac = t / t[:, -1:]
+        return np.all(np.isclose(x, x[:, :1] + frac * (x[:, -1:] - x[:, :1])) &
+                      np.isclose(y, y[:, :1] + frac * (y[:, -1:] - y[:, :1])), axis=1)
+
+    probabilities = np.empty(len(t1))
+    args = [np.asarray(a) for a in (healthy_hunger, healthy_temp, is_mask_healthy, is_mask_infected,
+                                    was_previously_infected_healthy, is_vaccinated_healthy)]
+
+    # Rows where both people move linearly over the whole tick are scored in a single piece
+    rows = is_linear(t1, x1, y1) & is_linear(t2, x2, y2)
+    probabilities[rows] = probabilities_infected_from_segments(
+        x1[rows, 0], y1[rows, 0], x1[rows, -1], y1[rows, -1], x2[rows, 0], y2[rows, 0], x2[rows, -1], y2[rows, -1],
+        t1[rows, -1], *(a[rows] for a in args), is_exact_average, trapezoidal_intervals_per_sec)
+
+    rows = ~rows
+    if rows.any():
+        # Every knot time of either person, in order. Repeated times create empty pieces which have no effect
+        times = np.sort(np.concatenate([t1[rows], t2[rows]], axis=1), axis=1)
+        px1, py1 = _interpolate_knots(t1[rows], x1[rows], y1[rows], times)
+        px2, py2 = _interpolate_knots(t2[rows], x2[rows], y2[rows], times)
+
+        num_pieces = times.shape[1] - 1
+        pieces = probabilities_infected_from_segments(
+            px1[:, :-1].ravel(), py1[:, :-1].ravel(), px1[:, 1:].ravel(), py1[:, 1:].ravel(),
+            px2[:, :-1].ravel(), py2[:, :-1].ravel(), px2[:, 1:].ravel(), py2[:, 1:].ravel(),
+            np.diff(times, axis=1).ravel(), *(np.repeat(a[rows], num_pieces) for a in args),
+            is_exact_average, trapezoidal_intervals_per_sec)
+
+        # in a list of probs, the chance of the event occurring is 1-(chance of event not occurring in all probs)
+        probabilities[rows] = 1 - np.prod(1 - pieces.reshape(-1, num_pieces), axis=1)
+
+    return probabilities
+
+
+def _interpolate_knots(t: np.ndarray, x: np.ndarray, y: np.ndarray,
+                       times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Return the positions of people moving linearly between the knots in each row of t, x, y
+    at each of the times in the same row of times"""
+    # Index of the knot starting the linear piece containing each time. Rows are shifted apart by more
+    # than their time span so that all rows can be searched at once
+    shift = (np.arange(len(t)) * (np.max(t, initial=0) + 1))[:, np.newaxis]
+    found = np.searchsorted((t + shift).ravel(), (times + shift).ravel(), side='right').reshape(times.shape)
+    start = np.clip(found - 1 - np.arange(len(t))[:, np.newaxis] * t.shape[1], 0, t.shape[1] - 2)
+    t_start = np.take_along_axis(t, start, axis=1)
+    t_end = np.take_along_axis(t, start + 1, axis=1)
+    frac = np.clip((times - t_start) / np.where(t_end > t_start, t_end - t_start, 1), 0, 1)
+
+    x_start = np.take_along_axis(x, start, axis=1)
+    y_start = np.take_along_axis(y, start, axis=1)
+    return (x_start + frac * (np.take_along_axis(x, start + 1, axis=1) - x_start),
+            y_start + frac * (np.take_along_axis(y, start + 1, axis=1) - y_start))
+
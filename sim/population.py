@@ -0,0 +1,339 @@
+"""CovSim Sim Package: Population
+
+Module Description
+==================
+This module contains the columnar store holding the state of every person in the
+simulation. Each attribute of a person is kept in a contiguous NumPy array, with one
+row per person, so that the simulation can work on whole columns at once. Person
+objects are thin views into one row of this store.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Iterator, Optional, Union, TYPE_CHECKING
+from geometry.geometry import Path
+from geometry.helpers import SECONDS_IN_YEAR
+import numpy as np
+import logging
+
+if TYPE_CHECKING:
+    import sim.sim_components as sc
+
+
+class IndexSet:
+    """
+    Set of person indexes, kept as a dense array of its members so that the people in the set can be
+    visited without scanning the whole population. Adding, removing and checking an index, and getting
+    the size of the set, take constant time.
+
+    Instance Attributes:
+        - capacity: number of people, every index in the set is in range(capacity)
+    """
+    def __init__(self, capacity: int, mask: np.ndarray):
+        self.capacity = capacity
+
+        # Members are packed at the front of _members, and _position maps each index to its slot, -1 if absent
+        self._members = np.zeros(capacity, dtype=np.int64)
+        self._position = np.full(capacity, -1, dtype=np.int64)
+        self._size = 0
+        self.add(np.flatnonzero(mask))
+
+    @classmethod
+    def from_members(cls, capacity: int, members: np.ndarray) -> IndexSet:
+        """Return a set holding members, in the order given, e.g. to restore a set exactly"""
+        index_set = cls(capacity, np.zeros(capacity, dtype=bool))
+        members = np.asarray(members, dtype=np.int64)
+        index_set._members[:len(members)] = members
+        index_set._position[members] = np.arange(len(members))
+        index_set._size = len(members)
+        return index_set
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self._position[index] >= 0)
+
+    @property
+    def members(self) -> np.ndarray:
+        """Indexes in the set, in no particular order. This is a view which changes along with the set"""
+        return self._members[:self._size]
+
+    def add(self, index: np.ndarray) -> None:
+        """Add the indexes in index to the set, ignoring ones already in it"""
+        index = np.unique(np.asarray(index, dtype=np.int64))
+        index = index[self._position[index] < 0]
+        self._members[self._size:self._size + len(index)] = index
+        self._position[index] = np.arange(self._size, self._size + len(index))
+        self._size += len(index)
+
+    def remove(self, index: np.ndarray) -> None:
+        """Remove the indexes in index from the set, ignoring ones not in it"""
+        index = np.unique(np.asarray(index, dtype=np.int64))
+        for i in index[self._position[index] >= 0].tolist():
+            # Fills the slot with the last member, so that members stay packed
+            pos = self._position[i]
+            last = self._members[self._size - 1]
+            self._members[pos] = last
+            self._position[last] = pos
+            self._position[i] = -1
+            self._size -= 1
+
+
+class Population:
+    """
+    Columnar store of people. See Person for the meaning of each attribute, every column
+    below holds that attribute for all people, indexed by person index.
+
+    Instance Attributes:
+        - sim: parent sim manager object
+        - x, y: world position of people outside (nan until finalized)
+        - building: index of the building a person is inside, -1 if outside
+        - home, work: building indexes, -1 if unassigned
+        - cause_of_death: Person.CausesOfDeath value, -1 if alive
+        - route_x, route_y: waypoints of each person's current path, excluding their current position.
+        Rows are padded up to the route capacity
+        - route_len: number of waypoints in each row of route_x and route_y
+        - path_cursor: index of the next waypoint each person is walking towards
+        - move_x, move_y, move_t: each person's last movement as the positions they passed through (knots)
+        and the seconds into the tick at which they passed them. Rows are padded with the final knot
+        - move_knots: number of knots in each row of the last movement, before padding
+        - infected: people who are infected, dead or alive
+        - susceptible: living people who are not infected
+        - dead: people who are dead
+        - indoor, outdoor: living people who are inside a building, or outside
+        - listeners: objects notified of every infection and death, e.g. to count them. Their
+        on_infected(index, infectors) method is called with the newly infected people and who infected
+        each of them (-1 if unknown), and their on_killed(index, cause) method with the people who died
+
+    The index sets are kept up to date with the is_infected, is_dead and building columns, so those
+    columns must only be changed through set_infected, kill and set_building.
+    """
+    # Names of the index sets, which are derived from the columns
+    INDEX_SETS = ('infected', 'susceptible', 'dead', 'indoor', 'outdoor')
+
+    # Initial number of waypoints that fit in each person's route
+    INITIAL_ROUTE_CAPACITY = 8
+
+    # Initial number of knots that fit in each person's movement, which is the start, the final position
+    # and every waypoint reached in between. Grows when someone passes more waypoints in a tick
+    INITIAL_MOVE_KNOTS = 6
+
+    def __init__(self, sim, ages: list[int], mask_wear_percents: list[int], is_vaccinated: list[bool],
+                 is_infected: list[bool], is_homeless: list[bool], travels_per_year: int):
+        self.sim = sim
+        n = len(ages)
+
+        self.is_infected = np.array(is_infected, dtype=bool)
+        self.is_vaccinated = np.array(is_vaccinated, dtype=bool)
+        self.is_homeless = np.array(is_homeless, dtype=bool)
+        self.was_infected = self.is_infected.copy()
+
+        self.is_dead = np.zeros(n, dtype=bool)
+        self.cause_of_death = np.full(n, -1, dtype=np.int8)
+
+        self.age = np.array(ages, dtype=np.int16)
+        self.mask_wearing_percentage = np.array(mask_wear_percents, dtype=np.int16)
+        self.travels_per_s = np.full(n, travels_per_year / SECONDS_IN_YEAR)
+
+        # Imported here since models and sim_components import this module through sim_manager
+        import sim.models as models
+        rng = sim.rng.people
+        self.is_wearing_mask = models.roll_probabilities(self.mask_wearing_percentage / 100, rng)
+
+        self.hunger = rng.integers(50, 100, endpoint=True, size=n).astype(float)
+        self.happiness = rng.integers(0, 100, endpoint=True, size=n).astype(float)
+        self.temp = np.full(n, 50.0)
+        self.clothing = np.full(n, 10.0)
+
+        self.is_male = rng.integers(2, size=n).astype(bool)
+
+        self.speed_DU_s = rng.integers(50, 80, endpoint=True, size=n) / 10
+
+        # All columns below are generated after initialization
+        self.x = np.full(n, np.nan)
+        self.y = np.full(n, np.nan)
+        self.building = np.full(n, -1, dtype=np.int32)
+
+        self.home = np.full(n, -1, dtype=np.int32)
+        self.work = np.full(n, -1, dtype=np.int32)
+
+        # All columns below are used to track decision-making
+        self.route_x = np.zeros((n, Population.INITIAL_ROUTE_CAPACITY))
+        self.route_y = np.zeros((n, Population.INITIAL_ROUTE_CAPACITY))
+        self.route_len = np.zeros(n, dtype=np.int32)
+        self.path_cursor = np.zeros(n, dtype=np.int32)
+
+        self.move_x = np.full((n, Population.INITIAL_MOVE_KNOTS), np.nan)
+        self.move_y = np.full((n, Population.INITIAL_MOVE_KNOTS), np.nan)
+        self.move_t = np.zeros((n, Population.INITIAL_MOVE_KNOTS))
+        self.move_knots = np.ones(n, dtype=np.int32)
+
+        self.infected = IndexSet(n, self.is_infected)
+        self.susceptible = IndexSet(n, ~self.is_infected & ~self.is_dead)
+        self.dead = IndexSet(n, self.is_dead)
+        self.indoor = IndexSet(n, (self.building >= 0) & ~self.is_dead)
+        self.outdoor = IndexSet(n, (self.building < 0) & ~self.is_dead)
+
+        self.listeners = []
+
+    @classmethod
+    def from_state(cls, sim, state: dict[str, np.ndarray]) -> Population:
+        """Return a population with the columns and index sets in state, as returned by get_state, belonging
+        to the sim manager sim. The arrays in state are copied, so one state can be restored many times"""
+        pop = cls.__new__(cls)
+        pop.sim = sim
+        for name, value in state.items():
+            if name not in Population.INDEX_SETS:
+                setattr(pop, name, np.array(value))
+        for name in Population.INDEX_SETS:
+            setattr(pop, name, IndexSet.from_members(len(pop.age), state[name]))
+        pop.listeners = []
+        return pop
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """Return every column, and the members of every index set in order, by name"""
+        state = {name: value for name, value in vars(self).items() if isinstance(value, np.ndarray)}
+        for name in Population.INDEX_SETS:
+            state[name] = getattr(self, name).members
+        return state
+
+    def __len__(self):
+        return len(self.age)
+
+    def __iter__(self) -> Iterator[sc.Person]:
+        import sim.sim_components as sc
+        return (sc.Person(self, i) for i in range(len(self)))
+
+    def __getitem__(self, index: int) -> sc.Person:
+        import sim.sim_components as sc
+        if not 0 <= index < len(self):
+            raise IndexError("Person index out of range")
+        return sc.Person(self, index)
+
+    def set_route(self, index: int, path: Path) -> None:
+        """Make the person at index follow path, whose first point is their current position"""
+        waypoints = path.points[1:]
+        if len(waypoints) > self.route_x.shape[1]:
+            # Grows the route capacity for everyone so that the columns stay rectangular
+            capacity = max(len(waypoints), self.route_x.shape[1] * 2)
+            padding = ((0, 0), (0, capacity - self.route_x.shape[1]))
+            self.route_x = np.pad(self.route_x, padding)
+            self.route_y = np.pad(self.route_y, padding)
+
+        self.route_x[index, :len(waypoints)] = [pt.x for pt in waypoints]
+        self.route_y[index, :len(waypoints)] = [pt.y for pt in waypoints]
+        self.route_len[index] = len(waypoints)
+        self.path_cursor[index] = 0
+
+    def start_movement(self, index: np.ndarray, time_delta_s: float) -> None:
+        """Begin recording the movement of the people at index over a tick of time_delta_s, with
+        their current position as the only knot. Until more knots are added, they stand still.
+        Starting everyone's movement at once also shrinks the knot capacity back to its initial size"""
+        if isinstance(index, slice) and index == slice(None) and self.move_x.shape[1] > Population.INITIAL_MOVE_KNOTS:
+            shape = (len(self), Population.INITIAL_MOVE_KNOTS)
+            self.move_x, self.move_y, self.move_t = np.empty(shape), np.empty(shape), np.empty(shape)
+
+        self.move_x[index] = self.x[index, np.newaxis]
+        self.move_y[index] = self.y[index, np.newaxis]
+        self.move_t[index] = time_delta_s
+        self.move_t[index, 0] = 0
+        self.move_knots[index] = 1
+
+    def add_movement_knot(self, index: np.ndarray, time_s: np.ndarray) -> None:
+        """Record the current position of the people at index as having been reached time_s seconds
+        into the tick. The knot is also copied into the padding after it"""
+        col = self.move_knots[index]
+        time_s = np.broadcast_to(time_s, col.shape)
+        if len(col) != 0 and col.max() >= self.move_x.shape[1]:
+            # Grows the knot capacity for everyone, padding with each row's final knot
+            padding = ((0, 0), (0, self.move_x.shape[1]))
+            self.move_x = np.pad(self.move_x, padding, mode='edge')
+            self.move_y = np.pad(self.move_y, padding, mode='edge')
+            self.move_t = np.pad(self.move_t, padding, mode='edge')
+
+        # Marks the knot's column and every column after it
+        padding = np.arange(self.move_x.shape[1])[np.newaxis, :] >= col[:, np.newaxis]
+        self.move_x[index] = np.where(padding, self.x[index, np.newaxis], self.move_x[index])
+        self.move_y[index] = np.where(padding, self.y[index, np.newaxis], self.move_y[index])
+        self.move_t[index] = np.where(padding, time_s[:, np.newaxis], self.move_t[index])
+        self.move_knots[index] += 1
+
+    def set_infected(self, index: np.ndarray, is_infected: bool = True,
+                     infectors: Optional[np.ndarray] = None) -> None:
+        """Infect the people at index, or cure them if is_infected is False. infectors optionally holds the
+        person who infected each person at index, for listeners"""
+        index = np.asarray(index, dtype=np.int64).reshape(-1)
+        if is_infected:
+            # Only people who weren't infected yet count as new infections, once each
+            index, first = np.unique(index, return_index=True)
+            is_new = ~self.is_infected[index]
+            infectors = np.full(len(index), -1, dtype=np.int64) if infectors is None \
+                else np.asarray(infectors, dtype=np.int64).reshape(-1)[first]
+
+            self.is_infected[index] = True
+            self.was_infected[index] = True
+            self.infected.add(index)
+            self.susceptible.remove(index)
+            if self.listeners and is_new.any():
+                for listener in self.listeners:
+                    listener.on_infected(index[is_new], infectors[is_new])
+        else:
+            self.is_infected[index] = False
+            self.infected.remove(index)
+            self.susceptible.add(index[~self.is_dead[index]])
+
+    def set_building(self, index: int, building: int) -> None:
+        """Put the person at index inside the building with index building, or outside if it is -1"""
+        self.building[index] = building
+        if not self.is_dead[index]:
+            if building >= 0:
+                self.outdoor.remove([index])
+                self.indoor.add([index])
+            else:
+                self.indoor.remove([index])
+                self.outdoor.add([index])
+
+    def kill(self, index: np.ndarray, cause: sc.Person.CausesOfDeath) -> None:
+        """Mark the living people at index as dead from cause"""
+        index = np.asarray(index, dtype=np.int64)
+        index = index[~self.is_dead[index]]
+        self.is_dead[index] = True
+        self.cause_of_death[index] = cause
+        self.dead.add(index)
+        for index_set in (self.susceptible, self.indoor, self.outdoor):
+            index_set.remove(index)
+        if len(index) != 0:
+            for listener in self.listeners:
+                listener.on_killed(index, cause)
+
+    def change_hunger(self, hunger_delta: Union[float, np.ndarray], index=slice(None)) -> None:
+        """Change hunger of the people at index (everyone by default) and execute consequences, if any"""
+        import sim.sim_components as sc
+        self.hunger[index] += hunger_delta
+        # Need... food.... *dying noises*
+        self._kill_where(self.hunger <= -100, sc.Person.CausesOfDeath.STARVATION)
+        np.minimum(self.hunger, 120, out=self.hunger)
+
+    def change_temperature(self, temp_delta: Union[float, np.ndarray], index=slice(None)) -> None:
+        """Change temperature of the people at index (everyone by default) and execute consequences, if any"""
+        import sim.sim_components as sc
+        self.temp[index] += temp_delta
+        # Brrrrr....
+        self._kill_where(self.temp <= -100, sc.Person.CausesOfDeath.COLD)
+        np.minimum(self.temp, 150, out=self.temp)
+
+    def _kill_where(self, condition: np.ndarray, cause: sc.Person.CausesOfDeath) -> None:
+        """Mark alive people matching condition as dead from cause"""
+        dying = np.flatnonzero(condition & ~self.is_dead)
+        if len(dying) != 0:
+            self.kill(dying, cause)
+            logging.info(str(len(dying)) + " people have died of " + cause.name.lower())
@@ -0,0 +1,88 @@
+"""CovSim Sim Package: RNG
+
+Module Description
+==================
+This module contains the random number streams used by a simulation. Every simulation owns
+one SimRandom, which splits a single seed into independent NumPy generators for each part of
+the simulation, so that runs with the same seed are identical, and so that changing how much
+randomness one part uses does not change the random numbers seen by the others.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Union
+import numpy as np
+
+
+class SimRandom:
+    """
+    Independent random generators for each part of a simulation, all derived from one seed.
+
+    Instance Attributes:
+        - seed_sequence: the NumPy SeedSequence the generators are spawned from
+        - city: generator for the city layout and buildings
+        - people: generator for people's attributes and where they are placed
+        - pathing: generator for where people decide to go
+        - infection: generator for whether people get infected
+    """
+    # Names of the generators
+    STREAMS = ('city', 'people', 'pathing', 'infection')
+
+    def __init__(self, seed: Union[None, int, np.random.SeedSequence] = None):
+        # A seed of None takes fresh entropy from the OS, which is kept in the seed sequence
+        self.seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+
+        city, people, pathing, infection = self.seed_sequence.spawn(4)
+        self.city = np.random.Generator(np.random.PCG64(city))
+        self.people = np.random.Generator(np.random.PCG64(people))
+        self.pathing = np.random.Generator(np.random.PCG64(pathing))
+        self.infection = np.random.Generator(np.random.PCG64(infection))
+
+    @property
+    def entropy(self) -> Union[int, list[int]]:
+        """Root seed of the streams. Unless this object was spawned from another, passing it back in
+        as the seed recreates the same streams"""
+        return self.seed_sequence.entropy
+
+    def get_stable_integer(self, low: int, high: int) -> int:
+        """Return an integer from low to high inclusive, always the same for the same seed, without drawing
+        from any of the streams"""
+        # The seed sequence's own output is independent of the streams, which are spawned from it
+        return low + int(self.seed_sequence.generate_state(1, np.uint64)[0] % np.uint64(high - low + 1))
+
+    def get_state(self) -> dict:
+        """Return the state of the seed sequence and of every generator, as plain data that can be saved as
+        JSON. Passing it to set_state continues every stream from where it is now"""
+        return {'entropy': self.seed_sequence.entropy,
+                'spawn_key': list(self.seed_sequence.spawn_key),
+                'pool_size': self.seed_sequence.pool_size,
+                'n_children_spawned': self.seed_sequence.n_children_spawned,
+                'streams': {name: getattr(self, name).bit_generator.state for name in SimRandom.STREAMS}}
+
+    @classmethod
+    def from_state(cls, state: dict) -> SimRandom:
+        """Return generators continuing from state, as returned by get_state"""
+        seed_sequence = np.random.SeedSequence(state['entropy'], spawn_key=state['spawn_key'],
+                                               pool_size=state['pool_size'],
+                                               n_children_spawned=state['n_children_spawned'])
+        rng = cls.__new__(cls)
+        rng.seed_sequence = seed_sequence
+        for name in SimRandom.STREAMS:
+            bit_generator = np.random.PCG64()
+            bit_generator.state = state['streams'][name]
+            setattr(rng, name, np.random.Generator(bit_generator))
+        return rng
+
+    def spawn(self, n: int) -> list[SimRandom]:
+        """Return n new SimRandom objects which are statistically independent of this one and each
+        other, e.g. for parallel runs"""
+        return [SimRandom(s) for s in self.seed_sequence.spawn(n)]
+
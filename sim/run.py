@@ -0,0 +1,167 @@
+"""CovSim Sim Package: Run
+
+Module Description
+==================
+This module runs a single simulation headlessly from the command line, without a window,
+frame cap, or pygame. It is meant for running many scenarios on servers, e.g.
+
+    python -m sim.run params.json --duration 86400 --tick 10 --output-dir ./simdata/
+
+The parameters file holds the fields of SimParams as a JSON or YAML mapping. Long projections can be
+run in day steps once the contact rates have been learned at agent level, e.g. one day in detail and
+then a year a day at a time:
+
+    python -m sim.run params.json --duration 31536000 --aggregate-after 86400
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Optional, Union
+from sim.sim_manager import SimManager, SimParams
+from sim.scheduler import AdaptiveScheduler
+from sim.metrics_sink import METRICS_FORMATS
+from sim.metrics import METRICS
+import argparse
+import json
+import logging
+import time
+
+
+def load_params(filename: str) -> SimParams:
+    """Read simulation parameters from a JSON or YAML file, chosen by its extension"""
+    with open(filename) as f:
+        if filename.endswith(('.yaml', '.yml')):
+            # Only needed for YAML files, so it is not a dependency of the simulation
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required to read YAML parameter files")
+            param_dict = yaml.safe_load(f)
+        else:
+            param_dict = json.load(f)
+
+    if not isinstance(param_dict, dict):
+        raise ValueError("Parameters file must contain a mapping of SimParams fields")
+    return SimParams(**param_dict)
+
+
+def run_simulation(sim_params: SimParams, duration_s: float, tick_s: float,
+                   output_dir: Optional[str] = './simdata/', seed: Optional[int] = None,
+                   scheduler: Optional[AdaptiveScheduler] = None, aggregate_after_s: Optional[float] = None,
+                   aggregate_step_s: float = 86400, metrics_format: str = 'csv',
+                   epi_metrics: Union[None, bool, list[str]] = None, epi_interval_s: float = 0,
+                   trajectory_file: Optional[str] = None, trajectory_interval_s: float = 0) -> SimManager:
+    """Create a simulation seeded with seed and progress it by tick_s seconds at a time, as fast as possible,
+    until duration_s seconds of simulation time have passed. If a scheduler is given, it chooses the length
+    of each step instead. The final step is shortened to fit the duration.
+
+    If aggregate_after_s is given, only that much time is simulated at agent level, and the rest is
+    progressed aggregate_step_s at a time from the contact rates learned meanwhile (see
+    SimManager.progress_aggregate).
+
+    The recorded data, along with the epidemiological metrics chosen by epi_metrics, is written to output_dir
+    in metrics_format (see SimManager), and is complete once this returns. So is the trajectory of every
+    person, if a trajectory_file is given (see sim.trajectory).
+
+    Preconditions:
+        - duration_s >= 0
+        - tick_s > 0
+        - aggregate_after_s is None or aggregate_after_s > 0
+        - aggregate_step_s > 0
+    """
+    sim = SimManager(sim_params, output_dir, seed, metrics_format, epi_metrics, epi_interval_s,
+                     trajectory_file=trajectory_file, trajectory_interval_s=trajectory_interval_s,
+                     learn_contact_rates=aggregate_after_s is not None)
+    agent_level_s = duration_s if aggregate_after_s is None else min(aggregate_after_s, duration_s)
+
+    try:
+        elapsed_s = 0
+        while elapsed_s < agent_level_s:
+            step_s = tick_s if scheduler is None else scheduler.next_step(sim.city)
+            step_s = min(step_s, agent_level_s - elapsed_s)
+            sim.progress_simulation(step_s)
+            elapsed_s += step_s
+
+        while elapsed_s < duration_s:
+            step_s = min(aggregate_step_s, duration_s - elapsed_s)
+            sim.progress_aggregate(step_s)
+            elapsed_s += step_s
+    finally:
+        # Writes out the buffered data even if the run failed partway
+        sim.close()
+    return sim
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Run a simulation with the command line arguments in argv (sys.argv by default)"""
+    parser = argparse.ArgumentParser(prog='python -m sim.run', description="Run a simulation without graphics")
+    parser.add_argument('params', help="JSON or YAML file holding the SimParams fields")
+    parser.add_argument('--duration', type=float, required=True, help="simulated time to run for, in seconds")
+    parser.add_argument('--tick', type=float, default=10, help="simulated seconds per step (default 10)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="take long steps while nobody can be infected, and steps of --tick otherwise")
+    parser.add_argument('--max-step', type=float, default=600, help="longest adaptive step in seconds (default 600)")
+    parser.add_argument('--aggregate-after', type=float, default=None,
+                        help="simulated seconds to run at agent level before switching to day steps (default never)")
+    parser.add_argument('--aggregate-step', type=float, default=86400,
+                        help="simulated seconds per step after switching (default 86400)")
+    parser.add_argument('--output-dir', default='./simdata/', help="folder to write the data to")
+    parser.add_argument('--format', choices=list(METRICS_FORMATS), default='csv',
+                        help="file format of the data (default csv, parquet needs pyarrow)")
+    parser.add_argument('--metrics', nargs='*', choices=list(METRICS), default=None,
+                        help="record these epidemiological metrics after every step, or all of them if none are given")
+    parser.add_argument('--metrics-interval', type=float, default=0,
+                        help="least simulated seconds between two rows of metrics (default 0, every step)")
+    parser.add_argument('--trajectory', default=None,
+                        help="file to record every person's position and state to after every step, for replay")
+    parser.add_argument('--trajectory-interval', type=float, default=0,
+                        help="least simulated seconds between two recorded frames (default 0, every step)")
+    parser.add_argument('--seed', type=int, default=None, help="seed to reproduce a run (default random)")
+    parser.add_argument('--no-output', action='store_true', help="do not write any files")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log simulation events")
+    args = parser.parse_args(argv)
+
+    if args.duration < 0:
+        parser.error("--duration can't be negative")
+    if args.tick <= 0:
+        parser.error("--tick must be positive")
+    if args.adaptive and args.max_step < args.tick:
+        parser.error("--max-step can't be shorter than --tick")
+    if args.aggregate_after is not None and args.aggregate_after <= 0:
+        parser.error("--aggregate-after must be positive")
+    if args.aggregate_step <= 0:
+        parser.error("--aggregate-step must be positive")
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    start = time.perf_counter()
+    sim = run_simulation(load_params(args.params), args.duration, args.tick,
+                         None if args.no_output else args.output_dir, args.seed,
+                         AdaptiveScheduler(args.tick, args.max_step) if args.adaptive else None,
+                         args.aggregate_after, args.aggregate_step, args.format,
+                         (args.metrics or True) if args.metrics is not None else None, args.metrics_interval,
+                         args.trajectory, args.trajectory_interval)
+    wall_s = time.perf_counter() - start
+
+    people = sim.city.people
+    print("Simulated " + str(args.duration) + " s in " + str(round(wall_s, 2)) + " s, " +
+          str(int(people.is_infected.sum())) + "/" + str(len(people)) + " infected, " +
+          str(int(people.is_dead.sum())) + " dead, seed " + str(sim.rng.entropy))
+    if not args.no_output:
+        print("Data written to " + sim.metrics.filename)
+        if sim.collector is not None:
+            print("Metrics written to " + sim.collector.sink.filename)
+    if sim.recorder is not None:
+        print(str(sim.recorder.num_frames) + " frames recorded to " + sim.recorder.filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""CovSim Sim Package: Scheduler
+
+Module Description
+==================
+This module contains the adaptive scheduler, which picks how far to progress the simulation
+at each step instead of always using a fixed tick. Infection is the only part of the simulation
+which needs fine steps, so the scheduler jumps straight to the earliest moment an infected
+and a healthy person could come within infection range of each other, given how fast they
+walk. Sparse or fully infected cities are crossed in large steps, and fine steps are only
+taken while people are close enough to infect each other.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+import math
+import numpy as np
+
+
+class AdaptiveScheduler:
+    """
+    Chooses the length of each simulation step from the state of the city.
+
+    Waypoint arrivals never need to end a step, since City.move_people follows paths exactly
+    through any number of waypoints and new paths within one step. Infection is also scored
+    exactly over the whole step, so steps never need to end exactly when people meet. The
+    shortest step is the contact step, which is how long a newly infected person waits before
+    they can infect others.
+
+    Instance Attributes:
+        - contact_step_s: step taken while an infected and a healthy person are within infection range,
+        or could be within it before this much time has passed
+        - max_step_s: longest step taken, which also bounds how stale the recorded data can get
+    """
+    def __init__(self, contact_step_s: float = 10, max_step_s: float = 600):
+        assert 0 < contact_step_s <= max_step_s
+        self.contact_step_s = contact_step_s
+        self.max_step_s = max_step_s
+
+    def next_step(self, city) -> float:
+        """Return how many seconds the city should be progressed by next"""
+        return max(self.get_time_to_contact(city, self.max_step_s), self.contact_step_s)
+
+    def get_time_to_contact(self, city, horizon_s: float) -> float:
+        """Return a lower bound on the seconds until an infected and a healthy person in city come within
+        infection range, 0 if some already are, or horizon_s if none can within horizon_s seconds"""
+        pop = city.people
+        infected = city.infected.members
+        susceptible = city.susceptible.members
+        # Only people outside have a position, people inside buildings are not scored for infection
+        infected = infected[pop.building[infected] < 0]
+        susceptible = susceptible[pop.building[susceptible] < 0]
+        if len(infected) == 0 or len(susceptible) == 0:
+            return horizon_s
+
+        # Dead people don't walk
+        inf_speed = np.where(pop.is_dead[infected], 0, pop.speed_DU_s[infected])
+        sus_speed = pop.speed_DU_s[susceptible]
+        max_closing_speed = inf_speed.max() + sus_speed.max()
+        cutoff = city.infection_cutoff_radius
+
+        # Searches for pairs within reach of each other over growing windows of time, starting from the
+        # contact step, so that a crowded city only needs the smallest search
+        window_s = min(self.contact_step_s, horizon_s)
+        while True:
+            reach = cutoff + max_closing_speed * window_s
+            k, j = _get_pairs_within(pop.x[infected], pop.y[infected], pop.x[susceptible], pop.y[susceptible], reach)
+            if len(k) != 0:
+                distance = np.hypot(pop.x[infected[k]] - pop.x[susceptible[j]],
+                                    pop.y[infected[k]] - pop.y[susceptible[j]])
+                closing_speed = inf_speed[k] + sus_speed[j]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    times = np.where(distance <= cutoff, 0,
+                                     np.where(closing_speed > 0, (distance - cutoff) / closing_speed, math.inf))
+                # Pairs out of reach can't meet within window_s, but may meet sooner than the pairs found
+                return float(min(times.min(), window_s))
+            if window_s >= horizon_s:
+                return horizon_s
+            window_s = min(window_s * 4, horizon_s)
+
+
+def _get_pairs_within(x1: np.ndarray, y1: np.ndarray, x2: np.ndarray, y2: np.ndarray,
+                      reach: float) -> tuple[np.ndarray, np.ndarray]:
+    """Return the positions k in x1, y1 and j in x2, y2 of candidate pairs of points which may be within
+    reach of each other. Every pair within reach is returned, along with some farther pairs.
+
+    Like SpatialHashGrid, the points are bucketed into square cells of width reach, so that each point only
+    needs to be compared against the points in its own and neighbouring cells. The cells are kept as
+    sorted arrays of cell keys rather than a dict, so that all points are bucketed and looked up at once"""
+    cx1, cy1 = np.floor(x1 / reach).astype(np.int64), np.floor(y1 / reach).astype(np.int64)
+    cx2, cy2 = np.floor(x2 / reach).astype(np.int64), np.floor(y2 / reach).astype(np.int64)
+    # Shifts the cell coordinates so that neighbouring cells of every point have non-negative keys
+    min_x, min_y = min(cx1.min(), cx2.min()) - 1, min(cy1.min(), cy2.min()) - 1
+    rows = max(cy1.max(), cy2.max()) - min_y + 2
+
+    keys = (cx2 - min_x) * rows + (cy2 - min_y)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pos_1 = []
+    pos_2 = []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            neighbour_keys = (cx1 + dx - min_x) * rows + (cy1 + dy - min_y)
+            start = np.searchsorted(sorted_keys, neighbour_keys, side='left')
+            counts = np.searchsorted(sorted_keys, neighbour_keys, side='right') - start
+
+            # Expands each point's run of matching sorted points into one pair per match
+            firsts = np.repeat(start - np.cumsum(counts) + counts, counts)
+            pos_1.append(np.repeat(np.arange(len(x1)), counts))
+            pos_2.append(order[firsts + np.arange(counts.sum())])
+    return np.concatenate(pos_1), np.concatenate(pos_2)
@@ -19,20 +19,46 @@ from dataclasses import dataclass
 from typing import Optional
 from enum import IntEnum
 from geometry.geometry import *
-from geometry.helpers import SECONDS_IN_YEAR
-from geometry.path_finding import get_paths
+from geometry.navigation import NavigationGraph
+from geometry.spatial_hash import SpatialHashGrid
 from sim.sim_manager import *
 import sim.models as models
 import datetime
-import random
 import logging
+import numpy as np
+
+
+class _Column:
+    """Descriptor exposing one column of the person's Population as a Person attribute. Columns with
+    a setter are changed by calling that Population method with the person's index and the new value"""
+    def __init__(self, setter: Optional[str] = None):
+        self.setter = setter
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, person: Optional[Person], owner=None):
+        if person is None:
+            return self
+        return getattr(person.population, self.name)[person.index].item()
+
+    def __set__(self, person: Person, value) -> None:
+        if self.setter is not None:
+            getattr(person.population, self.setter)([person.index], value)
+        else:
+            getattr(person.population, self.name)[person.index] = value
 
 
 class Person:
     """
+    View of a single person in a Population. A person's state lives in the population's
+    columns, so a Person only holds the population and its own row index, and is
+    cheap to create and throw away.
 
     Instance Attributes:
-        - location: location object to specify where person is
+        - population: columnar store holding this person's state
+        - index: row of this person in population
+        - location: location object to specify where person is (a copy, assign to it to move the person)
         - is_infected, is_vaccinated, is_homeless: duh
         - is_dead: Rest in peace homie
         - cause_of_death: It would suck to die of starvation
@@ -55,114 +81,127 @@ class Person:
         COLD = 3
         SUICIDE = 4
 
-    def __init__(self, sim: SimManager, age: int, mask_wear_percent: int, is_vaccinated: bool, is_infected: bool,
-                 is_homeless: bool, travels_per_year: int):
-        # Parent sim manager object
-        self.sim = sim
-
-        self.is_infected = is_infected
-        self.is_vaccinated = is_vaccinated
-        self.is_homeless = is_homeless
-        self.was_infected = is_infected
-
-        self.is_dead = False
-        self.cause_of_death = None
-
-        self.age = age
-        self.mask_wearing_percentage = mask_wear_percent
-        self.travels_per_s = travels_per_year / SECONDS_IN_YEAR
-
-        self.is_wearing_mask = models.roll_probability(mask_wear_percent / 100)
-
-        self._hunger = random.randint(50, 100)
-        self.happiness = random.randint(0, 100)
-        self._temp = 50
-        self.clothing = 10
-
-        self.is_male = random.choice((True, False))
-
-        self.speed_DU_s = random.randint(50, 80) / 10
-
-        # All attributes below are generated after initialization
-        self.location: Optional[Location] = None
-
-        self.home: Optional[Building] = None
-        self.work: Optional[Building] = None
-
-        # TODO: Implement people action queue
-
-        # All attributes below are used to track decision-making
-        self.last_movement: Optional[Path] = None
-        self.current_path: Optional[Path] = None
+    __slots__ = ("population", "index")
+
+    is_infected = _Column(setter="set_infected")
+    is_vaccinated = _Column()
+    is_homeless = _Column()
+    was_infected = _Column()
+    age = _Column()
+    mask_wearing_percentage = _Column()
+    travels_per_s = _Column()
+    is_wearing_mask = _Column()
+    happiness = _Column()
+    clothing = _Column()
+    is_male = _Column()
+    speed_DU_s = _Column()
+
+    def __init__(self, population, index: int):
+        self.population = population
+        self.index = index
+
+    @property
+    def sim(self) -> SimManager:
+        """Parent sim manager object"""
+        return self.population.sim
+
+    @property
+    def is_dead(self) -> bool:
+        """Rest in peace homie, set by Population.kill"""
+        return self.population.is_dead[self.index].item()
+
+    @property
+    def cause_of_death(self) -> Optional[Person.CausesOfDeath]:
+        """Cause of death, None if alive"""
+        cause = self.population.cause_of_death[self.index]
+        return None if cause < 0 else Person.CausesOfDeath(cause)
+
+    @property
+    def location(self) -> Optional[Location]:
+        """Copy of the person's current location, None before the person is finalized"""
+        pop, i = self.population, self.index
+        if pop.building[i] >= 0:
+            return Location(building=self.sim.city.buildings[pop.building[i]])
+        if np.isnan(pop.x[i]):
+            return None
+        return Location(point=Point(pop.x[i], pop.y[i]))
+
+    @location.setter
+    def location(self, location: Location) -> None:
+        pop, i = self.population, self.index
+        if location.building is not None:
+            pop.set_building(i, self.sim.city.buildings.index(location.building))
+        else:
+            pop.set_building(i, -1)
+            pop.x[i], pop.y[i] = location.point.x, location.point.y
+
+    @property
+    def home(self) -> Optional[Building]:
+        """Building this person lives in"""
+        return self._get_building(self.population.home[self.index])
+
+    @property
+    def work(self) -> Optional[Building]:
+        """Building this person works in"""
+        return self._get_building(self.population.work[self.index])
+
+    def _get_building(self, building_index: int) -> Optional[Building]:
+        return None if building_index < 0 else self.sim.city.buildings[building_index]
+
+    @property
+    def last_movement(self) -> Path:
+        """Path the person moved along during the last act"""
+        pop, i = self.population, self.index
+        return Path([Point(pop.move_x[i, k], pop.move_y[i, k]) for k in range(max(pop.move_knots[i], 2))])
+
+    @property
+    def current_path(self) -> Path:
+        """Rest of the path the person is following, starting from their current position"""
+        pop, i = self.population, self.index
+        return Path([Point(pop.x[i], pop.y[i])] +
+                    [Point(pop.route_x[i, j], pop.route_y[i, j]) for j in range(pop.path_cursor[i], pop.route_len[i])])
+
+    @current_path.setter
+    def current_path(self, path: Path) -> None:
+        self.population.set_route(self.index, path)
 
     def act(self, time_delta_s) -> None:
         """Run the person's core action/decision-making process over the given time delta"""
-        # TODO: Make this algorithm precisely move along the path, currently it can move along
-        #  at most one vector of the path during a single call
-        old_pos = Point(self.location.point.x, self.location.point.y)
-
-        d = self.speed_DU_s * time_delta_s
-        first_vec_length = dist(self.current_path.points[0], self.current_path.points[1])
-
-        self.last_movement = Path([self.location.point, self.location.point])
-        if first_vec_length <= d:
-            if self.sim.city.move(self,
-                                  self.current_path.points[1].x - self.location.point.x,
-                                  self.current_path.points[1].y - self.location.point.y):
-
-                # Updates path from new location
-                self.current_path = Path([self.location.point] + self.current_path.points[2:])
-
-                self.last_movement = Path([old_pos, self.location.point])
-
-                # If path finished, make new
-                if len(self.current_path.points) <= 1:
-                    self.current_path, is_endpt_blocked = self.sim.city.path_find(
-                        self.location.point,
-                        self.sim.city.get_random_building().entrance_point
-                    )
-        else:
-            if self.sim.city.move(self,
-                                  (d / first_vec_length) * (self.current_path.points[1].x - self.current_path.points[0].x),
-                                  (d / first_vec_length) * (self.current_path.points[1].y - self.current_path.points[0].y)):
-                # Updates path from new location
-                self.current_path = Path([self.location.point] + self.current_path.points[1:])
+        self.sim.city.move_people(time_delta_s, np.array([self.index]))
 
-                self.last_movement = Path([old_pos, self.location.point])
+    def new_random_path(self) -> None:
+        """Make the person follow a new path to a random building"""
+        path = self.sim.city.path_find(Point(self.population.x[self.index], self.population.y[self.index]),
+                                       self.sim.city.get_random_building().entrance_point)
+        if path is not None:
+            self.current_path = path[0]
 
     def finalize(self, location) -> None:
         """Assigns attributes that have not been assigned upon initialization"""
         self.location = location
-        self.current_path, is_endpt_blocked = self.sim.city.path_find(self.location.point,
-                                                                      self.sim.city.get_random_building().entrance_point)
+        self.new_random_path()
 
     def change_hunger(self, hunger_delta: float) -> None:
         """Change hunger and execute consequences, if any"""
-        self._hunger += hunger_delta
-        # Need... food.... *dying noises*
-        if self._hunger <= -100:
-            self.is_dead = True
-            self.cause_of_death = Person.CausesOfDeath.STARVATION
-            logging.info("Person has died of starvation")
-        self._hunger = min(self._hunger, 120)
+        self.population.change_hunger(hunger_delta, self.index)
 
     def change_temperature(self, temp_delta: float) -> None:
         """Change temperature and execute consequences, if any"""
-        self._temp += temp_delta
-        # Brrrrr....
-        if self._temp <= -100:
-            self.is_dead = True
-            self.cause_of_death = Person.CausesOfDeath.COLD
-            logging.info("Person has died of cold")
-        self._temp = min(self._hunger, 150)
+        self.population.change_temperature(temp_delta, self.index)
 
     def get_temperature(self):
         """Return person's temperature"""
-        return self._temp
+        return self.population.temp[self.index].item()
 
     def get_hunger(self):
         """Return person's hunger"""
-        return self._hunger
+        return self.population.hunger[self.index].item()
+
+    def __eq__(self, other):
+        return isinstance(other, Person) and other.population is self.population and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.population), self.index))
 
     def __str__(self):
         return "Person" + str({
@@ -207,21 +246,32 @@ class City:
     """
 
     Instance Attributes:
-        - buildings, people: lists of buildings and people in the simulation
+        - buildings: list of buildings in the simulation, people refer to buildings by their index here
+        - people: columnar store of the people in the simulation
         - smallest_road_width: width of the narrowest distance between buildings in the city
         - is_border_closed: prevents travel
         - is_vaccine_available: allows vaccination
         - time_s: total time passed since sim started.
         - date_time: tracks date and time in sim
+        - infection_cutoff_radius: pairs of people whose movements stay farther apart than this
+        distance (DU) during a tick are not scored for infection
+        - navigation: visibility graph over the buildings, used for path finding
+        - infected, susceptible, dead, indoor, outdoor: live index sets of people in each state (see Population),
+        whose sizes are the number of people in that state
+        - last_contacts: the pairs of people scored for infection during the last tick, None before the first
     """
+    # Longest time step the temperature of people is progressed by at once, so that long steps stay stable
+    TEMPERATURE_STEP_S = 600
+
     class Seasons(IntEnum):
         SPRING = 0
         SUMMER = 1
         FALL = 2
         WINTER = 3
 
-    def __init__(self, sim, buildings: set[Building], people: set[Person], smallest_road_width: float,
-                 is_border_closed: bool, is_vaccine_available: bool):
+    def __init__(self, sim, buildings: list[Building], people: Population, smallest_road_width: float,
+                 is_border_closed: bool, is_vaccine_available: bool, infection_cutoff_radius: float = 20.0,
+                 navigation_state: Optional[dict[str, np.ndarray]] = None):
         # Parent sim manager object
         self.sim = sim
 
@@ -231,10 +281,59 @@ class City:
         self.smallest_road_width = smallest_road_width
         self.is_border_closed = is_border_closed
         self.is_vaccine_available = is_vaccine_available
+        self.infection_cutoff_radius = infection_cutoff_radius
+
+        # Maps each entrance to the type of its building, since paths lead to entrances
+        self._entrance_types = {(b.entrance_point.x, b.entrance_point.y): int(b.purpose) for b in buildings}
+
+        # Buildings never change after generation, so routes between them are searched on a precomputed graph
+        self.navigation = NavigationGraph([b.rect for b in buildings], smallest_road_width / 4,
+                                          cache_cell_size=smallest_road_width, state=navigation_state)
+
+        # Buckets healthy people by their last movement, rebuilt every tick
+        self._contact_grid = SpatialHashGrid(infection_cutoff_radius)
+        self.last_contacts: Optional[ContactRecord] = None
 
         self.time_s = 0
         self.date_time = datetime.datetime(year=2021, month=1, day=1, hour=9, minute=0, second=0)
 
+    @property
+    def infected(self) -> IndexSet:
+        """Indexes of people who are infected"""
+        return self.people.infected
+
+    @property
+    def susceptible(self) -> IndexSet:
+        """Indexes of living people who are not infected"""
+        return self.people.susceptible
+
+    @property
+    def dead(self) -> IndexSet:
+        """Indexes of dead people"""
+        return self.people.dead
+
+    @property
+    def indoor(self) -> IndexSet:
+        """Indexes of living people inside a building"""
+        return self.people.indoor
+
+    @property
+    def outdoor(self) -> IndexSet:
+        """Indexes of living people outside"""
+        return self.people.outdoor
+
+    def get_destination_types(self, index: np.ndarray) -> np.ndarray:
+        """Return the Building.Types value of the building at the end of the path of each person at index,
+        or len(Building.Types) for people whose path doesn't lead to a building"""
+        pop = self.people
+        no_building = len(Building.Types)
+        types = np.full(len(index), no_building, dtype=np.int64)
+        route_len = pop.route_len[index]
+        for k in np.flatnonzero(route_len > 0).tolist():
+            i, last = index[k], route_len[k] - 1
+            types[k] = self._entrance_types.get((pop.route_x[i, last], pop.route_y[i, last]), no_building)
+        return types
+
     def progress_time(self, time_delta_s: int):
         """
         Move the simulation time ahead by time_delta_s
@@ -242,68 +341,165 @@ class City:
         Preconditions:
             - time_delta_s > 0
         """
-        # Moves time forward
-        self.time_s += time_delta_s
-        self.date_time += datetime.timedelta(seconds=time_delta_s)
+        self.progress_clock(time_delta_s)
 
-        # Activates people's brain cells, and makes them realize cold and hunger mwahahaha
-        for p in self.people:
+        # Activates people's brain cells
+        self.move_people(time_delta_s)
+
+        self.spread_infection(time_delta_s)
+
+    def progress_clock(self, time_delta_s: float) -> None:
+        """Move the simulation time ahead by time_delta_s along with the things that only depend on time,
+        without moving anyone or spreading infection"""
+        while time_delta_s > 0:
+            step_s = min(time_delta_s, City.TEMPERATURE_STEP_S)
+            time_delta_s -= step_s
+
+            # Moves time forward
+            self.time_s += step_s
+            self.date_time += datetime.timedelta(seconds=step_s)
+
+            # Makes people realize cold and hunger mwahahaha
             # The gods have been merciful, world hunger is temporarily solved
-            # p.change_hunger(models.hunger_change_per_second())
-            p.change_temperature(models.temperature_change_per_second(self.get_season().value,
-                                                                      p.get_temperature(),
-                                                                      p.clothing))
-            p.act(time_delta_s)
-
-        for p1 in self.people:
-            if p1.is_infected:
-                for p2 in self.people:
-                    if not p2.is_infected:
-                        prob = models.probability_infected_from_paths(p1.last_movement, p2.last_movement, time_delta_s,
-                                                                      p2.get_hunger(), p2.get_temperature(),
-                                                                      p2.is_wearing_mask, p1.is_wearing_mask,
-                                                                      p1.was_infected, p1.is_vaccinated)
-                        # print(prob)
-                        if round(prob, 4) != 0 and models.roll_probability(round(prob, 4)):
-                            p1.is_infected = True
+            # self.people.change_hunger(models.hunger_change_per_second() * step_s)
+            self.people.change_temperature(models.temperature_change_per_second(self.get_season().value,
+                                                                                self.people.temp,
+                                                                                self.people.clothing) * step_s)
+
+    def spread_infection(self, time_delta_s: int) -> None:
+        """Roll infections between infected and healthy people whose last movements came within
+        infection_cutoff_radius of each other. Farther pairs have a negligible probability of
+        infection, so they are never scored."""
+        pop = self.people
+        infected = self.infected.members.copy()
+        susceptible = self.susceptible.members.copy()
+        no_pairs = np.zeros(0, dtype=np.int64)
+        self.last_contacts = ContactRecord(time_delta_s, infected, susceptible, no_pairs, no_pairs, np.zeros(0))
+        if len(infected) == 0 or len(susceptible) == 0:
+            return
+
+        # Bounding boxes of the last movement of everyone involved, people are referred to by their
+        # position in the infected and susceptible arrays from here on
+        inf_lefts, inf_rights = pop.move_x[infected].min(axis=1), pop.move_x[infected].max(axis=1)
+        inf_tops, inf_bottoms = pop.move_y[infected].min(axis=1), pop.move_y[infected].max(axis=1)
+        sus_lefts, sus_rights = pop.move_x[susceptible].min(axis=1), pop.move_x[susceptible].max(axis=1)
+        sus_tops, sus_bottoms = pop.move_y[susceptible].min(axis=1), pop.move_y[susceptible].max(axis=1)
+
+        # Buckets healthy people by the bounding box of their last movement
+        self._contact_grid.clear()
+        for j in range(len(susceptible)):
+            self._contact_grid.insert(j, Rectangle(sus_lefts[j], sus_tops[j],
+                                                   sus_rights[j] - sus_lefts[j], sus_bottoms[j] - sus_tops[j]))
+
+        # Gathers candidate pairs as positions of infected and healthy people
+        cutoff = self.infection_cutoff_radius
+        infected_pos = []
+        healthy_pos = []
+        for k in range(len(infected)):
+            # Only healthy people whose movement box is within the cutoff of k's movement box are scored
+            area = Rectangle(inf_lefts[k], inf_tops[k], inf_rights[k] - inf_lefts[k],
+                             inf_bottoms[k] - inf_tops[k]).get_inflated(cutoff)
+            candidates = self._contact_grid.query(area)
+            infected_pos += [k] * len(candidates)
+            healthy_pos += candidates
+
+        if len(healthy_pos) == 0:
+            return
+        k = np.array(infected_pos)
+        j = np.array(healthy_pos)
+
+        # Keeps pairs whose movement boxes are actually within the cutoff
+        is_near = (sus_lefts[j] <= inf_rights[k] + cutoff) & (inf_lefts[k] - cutoff <= sus_rights[j]) & \
+                  (sus_tops[j] <= inf_bottoms[k] + cutoff) & (inf_tops[k] - cutoff <= sus_bottoms[j])
+        i1 = infected[k[is_near]]
+        i2 = susceptible[j[is_near]]
+
+        probs = models.probabilities_infected_from_movements(
+            pop.move_t[i1], pop.move_x[i1], pop.move_y[i1], pop.move_t[i2], pop.move_x[i2], pop.move_y[i2],
+            pop.hunger[i2], pop.temp[i2], pop.is_wearing_mask[i2], pop.is_wearing_mask[i1],
+            pop.was_infected[i2], pop.is_vaccinated[i2])
+        self.last_contacts = ContactRecord(time_delta_s, infected, susceptible, i1, i2, probs)
+
+        # Healthy people are infected if any of their rolls succeed
+        is_infecting = models.roll_probabilities(probs, self.sim.rng.infection, models.INFECTION_ROLL_ACCURACY)
+        pop.set_infected(i2[is_infecting], infectors=i1[is_infecting])
 
     def finalize_people(self):
         """Generates the remaining attributes of people"""
         for p in self.people:
             p.finalize(self.get_random_free_location())
+        self.people.start_movement(np.arange(len(self.people)), 0)
+
+    def move_people(self, time_delta_s: float, index: Optional[np.ndarray] = None) -> None:
+        """Move the people at index (everyone outdoors by default) along their current paths for time_delta_s
+        seconds, all at once, and record the movement. People can pass any number of waypoints in a
+        single call, and people who finish their path get a new one and keep walking along it with
+        the time they have left, so long calls move people exactly like many short ones.
+
+        Paths are found around buildings, so following them needs no collision checks (see move)"""
+        pop = self.people
+        if index is None:
+            # Everyone else stands still for the tick
+            pop.start_movement(slice(None), time_delta_s)
+            moving = np.sort(self.outdoor.members)
+        else:
+            pop.start_movement(index, time_delta_s)
+            # Only living people outside move
+            moving = index[(pop.building[index] < 0) & ~pop.is_dead[index]]
+        index = moving
+        budget = pop.speed_DU_s[index] * time_delta_s
+        remaining = budget.copy()
+
+        while True:
+            # People who finished their path partway through the call pick a new one
+            for i in index[(pop.path_cursor[index] >= pop.route_len[index]) & (remaining > 0)].tolist():
+                Person(pop, i).new_random_path()
+
+            is_walking = (pop.path_cursor[index] < pop.route_len[index]) & (remaining > 0)
+            if not is_walking.any():
+                break
+            index, budget, remaining = index[is_walking], budget[is_walking], remaining[is_walking]
+
+            cursor = pop.path_cursor[index]
+            target_x = pop.route_x[index, cursor]
+            target_y = pop.route_y[index, cursor]
+            seg_x = target_x - pop.x[index]
+            seg_y = target_y - pop.y[index]
+            seg_length = np.hypot(seg_x, seg_y)
+
+            # People who can reach the next waypoint step onto it, the rest walk as far as they can
+            is_reached = seg_length <= remaining
+            frac = np.where(is_reached, 1, remaining / np.where(is_reached, 1, seg_length))
+            pop.x[index] = np.where(is_reached, target_x, pop.x[index] + frac * seg_x)
+            pop.y[index] = np.where(is_reached, target_y, pop.y[index] + frac * seg_y)
+            pop.path_cursor[index] += is_reached
+            remaining = np.where(is_reached, remaining - seg_length, 0)
+
+            # People walk at constant speed, so time passed is proportional to the distance walked
+            pop.add_movement_knot(index, time_delta_s * (1 - remaining / budget))
+
+        # People who stopped early stand still for the rest of the tick
+        is_early = (pop.move_knots[moving] > 1) & (pop.move_t[moving, pop.move_knots[moving] - 1] < time_delta_s)
+        pop.add_movement_knot(moving[is_early], np.full(np.count_nonzero(is_early), time_delta_s))
+
+        # If path finished, make new
+        for i in moving[pop.path_cursor[moving] >= pop.route_len[moving]].tolist():
+            Person(pop, i).new_random_path()
 
     def path_find(self, start: Point, end: Point) -> Optional[tuple[Path, bool]]:
-        """Evaluates a random path and returns it along with whether the endpoint was blocked by a shape"""
-        paths, was_endpoint_blocked = get_paths([b.rect for b in self.buildings], Vector(start, end),
-                                                self.smallest_road_width / 4, max_paths=10, is_random=True)
-        if len(paths) != 0:
-            return paths[0], was_endpoint_blocked
-
-    def move(self, person: Person, delta_x: float, delta_y: float) -> bool:
-        """Mutate person's position if possible and return success. This method ensures that no illegal
-        movement is done, and prevents any such movement (like moving through walls)"""
-        # Can't move inside buildings
-        if person.location.point is None:
-            return False
-
-        # Gets vector representing current location and end point location
-        motion_vector = Vector(person.location.point, person.location.point + Point(delta_x, delta_y))
-
-        # Checks if vector intersects any buildings
-        if not any(s.rect.is_vector_intersect(motion_vector) for s in self.buildings):
-            # Performs motion
-            person.location.point += Point(delta_x, delta_y)
-            return True
-        return False
+        """Evaluates the shortest path around buildings and returns it along with whether the endpoint
+        was blocked by a shape. Return None if there is no such path"""
+        return self.navigation.find_path(start, end)
 
     def get_random_free_location(self, player_radius=5) -> Location:
         """Return a location within the city bounding box that doesn't collide with any buildings"""
         bound = self.get_bounding_box()
+        rng = self.sim.rng.people
 
         # Do-while loop lads
         while True:
-            pt = Point(random.randint(int(bound.left), int(bound.left + bound.width)),
-                       random.randint(int(bound.top), int(bound.top + bound.height)))
+            pt = Point(rng.integers(int(bound.left), int(bound.left + bound.width), endpoint=True),
+                       rng.integers(int(bound.top), int(bound.top + bound.height), endpoint=True))
             if not any([b.rect.get_inflated(player_radius).is_point_inside(pt) for b in self.buildings]):
                 break
         return Location(point=pt)
@@ -332,12 +528,31 @@ class City:
         return City.Seasons(int(((self.date_time.month-3) % 12) // 3))
 
     def get_random_building(self) -> Building:
-        """Return a random building from buildings"""
-        return random.choice(list(self.buildings))
+        """Return a random building from buildings, chosen with the pathing random stream"""
+        return self.buildings[self.sim.rng.pathing.integers(len(self.buildings))]
 
     def get_random_person(self) -> Person:
-        """Return a random person from people"""
-        return random.choice(list(self.people))
+        """Return a random person from people, chosen with the people random stream"""
+        return self.people[int(self.sim.rng.people.integers(len(self.people)))]
+
+
+@dataclass
+class ContactRecord:
+    """
+    Pairs of infected and healthy people scored for infection during one tick.
+
+    Instance Attributes:
+        - time_delta_s: length of the tick
+        - infected, susceptible: indexes of every infected and healthy person at the start of the tick
+        - infected_pairs, healthy_pairs: indexes of the infected and healthy person in each scored pair
+        - probabilities: probability of infection of each scored pair over the tick
+    """
+    time_delta_s: float
+    infected: np.ndarray
+    susceptible: np.ndarray
+    infected_pairs: np.ndarray
+    healthy_pairs: np.ndarray
+    probabilities: np.ndarray
 
 
 @dataclass
@@ -18,27 +18,19 @@ This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
 from __future__ import annotations
 from enum import IntEnum
-import random
 import sim.sim_components as sc
 import sim.city_generator as city_gen
+from sim.rng import SimRandom
+import sim.checkpoint as checkpoint
+from sim.aggregate import ContactRateModel
+from sim.metrics_sink import MetricsSink, MemoryMetricsSink, open_metrics_sink
+from sim.metrics import MetricsCollector, get_metric_columns
+from sim.trajectory import TrajectoryRecorder, get_frame_flags
+from sim.frame_delta import DeltaEncoder, DeltaDecoder
 from dataclasses import dataclass
-from geometry.geometry import Point, Rectangle
-import csv
-from os.path import exists
-
-
-def write_to_csv(filename: str, row: list) -> None:
-    """Adds a row to a specified csv file. File name is the name of the csv, without .csv,
-    and without a path. The path will be automatically set to simdata folder"""
-    # open the file in the write mode
-
-    with open('./simdata/' + filename + '.csv', 'a') as f:
-
-        # create the csv writer
-        writer = csv.writer(f)
-
-        # write a row to the csv file
-        writer.writerow(row)
+import numpy as np
+from typing import Optional, Union
+import os
 
 
 @dataclass
@@ -68,6 +60,7 @@ class SimParams:
         - quarantine_tendency:
         - vaccination_tendency:
         - social_distancing:
+        - infection_cutoff_radius: distance (DU) beyond which two people are never scored for infection
     """
     city_blocks_x: int
     city_blocks_y: int
@@ -99,31 +92,79 @@ class SimParams:
     social_distancing: float  # TODO: Exact measure TBD
     world_threat_level_local: float  # TODO: Exact measure TBD
     world_threat_level_international: float  # TODO: Exact measure TBD
+    infection_cutoff_radius: float = 20.0
 
 
 # Keeps track of graphics data
 class GraphicsData:
     """
     Keeps track of sim data necessary to render sim-related graphics. The dictionaries
-    outputted by the getter methods would be sent over the pipe between the graphics
-    process and the sim process, but this was not fully implemented in time, so
-    this class is unused
+    outputted by the getter methods are sent over the pipe between the graphics
+    process and the sim process (see AppSimComms)
+
+    Instead of the full people list, the state of people can be sent as delta frames (see
+    sim.frame_delta), which only hold the people who moved or changed since the last frame, plus a
+    keyframe of everyone every KEYFRAME_INTERVAL frames. Every delta frame has to be applied in order.
 
     Instance Attributes:
-        - buildings: List of building locations (id, top, left, width, height)
-        - people: List of people info (id, is_infected, x, y) potentially more later
+        - buildings: List of building locations (id, top, left, width, height, entrance_x, entrance_y)
+        - people: List of info on people outside (id, is_infected, is_wearing_mask, x, y)
         - objects: List of interactables, (id, top, left, width, height)
+        - delta: The latest delta frame encoded
+        - frame: State of every person decoded from the delta frames applied so far, see DeltaDecoder
     """
     class Types(IntEnum):
         STATIC = 0
         DYNAMIC = 1
         BOTH = 2
+        DELTA = 3
+
+    # Delta frames from one keyframe to the next
+    KEYFRAME_INTERVAL = 60
 
     def __init__(self):
         self.buildings: list[tuple[int, int, int, int, int]] = []
         self.people: list[tuple[int, bool, int, int]] = []
         self.objects: list[tuple[int, int, int, int, int]] = []
-    
+        self.delta = b''
+
+        self._encoder: Optional[DeltaEncoder] = None
+        self._decoder = DeltaDecoder()
+
+    @property
+    def frame(self) -> Optional[np.ndarray]:
+        """State of every person decoded from the delta frames applied so far"""
+        return self._decoder.frame
+
+    def update_buildings(self, city: sc.City) -> None:
+        """Take the building locations from city"""
+        self.buildings = [(i, b.rect.top, b.rect.left, b.rect.width, b.rect.height,
+                           b.entrance_point.x, b.entrance_point.y) for i, b in enumerate(city.buildings)]
+
+    def update_people(self, city: sc.City) -> None:
+        """Take the info on the people of city who are outside, who are the only ones drawn"""
+        pop = city.people
+        outdoor = city.outdoor.members
+        self.people = list(zip(outdoor.tolist(), pop.is_infected[outdoor].tolist(),
+                               pop.is_wearing_mask[outdoor].tolist(), pop.x[outdoor].tolist(),
+                               pop.y[outdoor].tolist()))
+
+    def update_delta(self, city: sc.City) -> None:
+        """Encode the next delta frame of the people of city"""
+        pop = city.people
+        if self._encoder is None:
+            self._encoder = DeltaEncoder(len(pop), GraphicsData.KEYFRAME_INTERVAL)
+        self.delta = self._encoder.encode(city.time_s, pop.x, pop.y, get_frame_flags(pop))
+
+    def apply_delta_info(self, info: dict) -> bool:
+        """Apply the delta frame in info, as returned by get_delta_sendable_info, to frame. Return whether
+        frame is up to date, which it isn't until a keyframe arrives"""
+        return self._decoder.decode(info["delta"])
+
+    def get_delta_sendable_info(self) -> dict:
+        return {"type": GraphicsData.Types.DELTA.value,
+                "delta": self.delta}
+
     def get_dynamic_sendable_info(self) -> dict:
         return {"type": GraphicsData.Types.DYNAMIC.value,
                 "people": self.people}
@@ -141,35 +182,99 @@ class GraphicsData:
 
 
 class SimManager:
-    """"""
+    """
+    Creates the city from the simulation parameters and progresses it through time,
+    recording the proportion of infected people as it goes.
+
+    The city is progressed either at agent level, moving every person (progress_simulation), or in
+    coarse steps of hours to weeks which only spread infection from contact rates learned at agent
+    level so far (progress_aggregate). The two can be mixed freely, e.g. to calibrate the rates over
+    a day at agent level before projecting a year ahead, and then looking at the city in detail again.
+
+    Passing a snapshot (see sim.checkpoint) restores the simulation it was taken from instead of generating
+    a new city. load_checkpoint and fork_checkpoint are the usual way to do this.
+
+    Instance Attributes:
+        - params: parameters the simulation was created from
+        - city: the simulated city
+        - rng: random streams every random decision of the simulation is drawn from, so that a seed
+        reproduces the same run exactly
+        - output_dir: folder the recorded data is written to, or None to not write any files
+        - metrics: sink the recorded rows are written to, None if output_dir is None. It buffers rows,
+        so call close once the simulation is done to write out the rest
+        - collector: epidemiological metrics recorded after every step, None if not enabled. Its rows are
+        written next to the csv data as metrics<sim_file_id>, or kept in memory if output_dir is None
+        - recorder: records every person's position and state to trajectory_file after every step, at most
+        once every trajectory_interval_s simulated seconds, None if no file is given (see sim.trajectory)
+        - sim_file_id: value derived from the seed so files for each sim are unique
+        - history: every (time_s, case_proportion) row recorded so far, time_s being the simulated seconds
+        elapsed when the row was recorded
+        - contact_rates: contact rates between groups of people learned from every agent level step so far,
+        used by progress_aggregate. None unless learn_contact_rates is set or the snapshot holds them, since
+        learning them costs time on every step
+    """
     # Proportion of main road_width that local roads should be
     LOCAL_ROAD_MULTIPLIER = 0.5
 
-    def __init__(self, sim_params: SimParams):
+    def __init__(self, sim_params: SimParams, output_dir: Optional[str] = './simdata/',
+                 seed: Union[None, int, np.random.SeedSequence] = None, metrics_format: str = 'csv',
+                 epi_metrics: Union[None, bool, list[str]] = None, epi_interval_s: float = 0,
+                 snapshot: Optional[dict[str, np.ndarray]] = None, trajectory_file: Optional[str] = None,
+                 trajectory_interval_s: float = 0, learn_contact_rates: bool = False):
+        self.params = sim_params
+        self.rng = SimRandom(seed)
+
+        if snapshot is None:
+            # Generate city
+            buildings, smallest_road = city_gen.generate_city_buildings(self, sim_params)
+            people = city_gen.generate_city_people(self, sim_params)
+
+            self.city = sc.City(self, buildings, people, smallest_road, sim_params.is_closed_border,
+                                sim_params.is_vaccine_available, sim_params.infection_cutoff_radius)
+            self.city.finalize_people()
+        else:
+            # Restores the city saved by checkpoint.take_snapshot instead, skipping generation
+            self.city = checkpoint.restore_city(self, snapshot)
         self.__graphics_data = GraphicsData()
+        self.__graphics_data.update_buildings(self.city)
 
-        # DEBUG: Creates arbitrary building, object, and people graphical data
-        self.__graphics_data.buildings = [tuple(i for _ in range(5)) for i in range(10)]
-        self.__graphics_data.objects = [tuple(i for _ in range(5)) for i in range(20, 30)]
-        self.__graphics_data.people = [tuple(i for _ in range(5)) for i in range(40, 50)]
-
-        # Generate city
-        buildings, smallest_road = city_gen.generate_city_buildings(self, sim_params)
-        people = city_gen.generate_city_people(self, sim_params)
+        self.contact_rates: Optional[ContactRateModel] = None
+        if learn_contact_rates or (snapshot is not None and checkpoint.has_contact_rates(snapshot)):
+            self.contact_rates = ContactRateModel(self.city, sim_params.city_blocks_x, sim_params.city_blocks_y,
+                                                  sim_params.block_dim + sim_params.road_width)
 
-        self.city = sc.City(self, buildings, people, smallest_road, sim_params.is_closed_border,
-                            sim_params.is_vaccine_available)
-        self.city.finalize_people()
-
-        # Creates random value so files for each sim are unique
-        self.sim_file_id = random.randint(10000, 99999)
+        # Creates value so files for each sim are unique, which a seed reproduces along with the rest of the run
+        self.sim_file_id = self.rng.get_stable_integer(10000, 99999)
 
         self.time_tracker = 0
-        self.day_count = 0
-
-        write_to_csv('sim' + str(self.sim_file_id), ['day_number', 'case_proportion'])
 
-    def progress_simulation(self, time_delta_s: int):  # -> dict:
+        self.output_dir = output_dir
+        self.history: list[tuple[float, float]] = []
+        self.metrics: Optional[MetricsSink] = None
+        if self.output_dir is not None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self.metrics = open_metrics_sink(os.path.join(self.output_dir, 'sim' + str(self.sim_file_id)),
+                                             ['time_s', 'case_proportion'], metrics_format)
+
+        # epi_metrics names the metrics to collect (see sim.metrics.METRICS), or True for all of them
+        self.collector: Optional[MetricsCollector] = None
+        if epi_metrics:
+            names = None if epi_metrics is True else list(epi_metrics)
+            columns = get_metric_columns(names)
+            sink = MemoryMetricsSink(columns) if self.output_dir is None else \
+                open_metrics_sink(os.path.join(self.output_dir, 'metrics' + str(self.sim_file_id)), columns,
+                                  metrics_format)
+            self.collector = MetricsCollector(self.city, sink, names, epi_interval_s)
+
+        if snapshot is not None:
+            # A seed starts new random streams from the snapshot, otherwise the saved ones carry on
+            checkpoint.restore_state(self, snapshot, restore_rng=seed is None)
+
+        self.recorder: Optional[TrajectoryRecorder] = None
+        if trajectory_file is not None:
+            self.recorder = TrajectoryRecorder(self.city, trajectory_file, trajectory_interval_s)
+
+    def progress_simulation(self, time_delta_s: int) -> None:
         """
         Progress the simulation world by the provided time_delta_s in simulation
         world time measurement
@@ -179,19 +284,70 @@ class SimManager:
         """
         # Progresses simulation
         self.city.progress_time(time_delta_s)
+        if self.contact_rates is not None and self.city.last_contacts is not None:
+            self.contact_rates.record(self.city.last_contacts)
 
-        # Records csv data
+        self._record_history()
+        if self.collector is not None:
+            self.collector.record()
+        if self.recorder is not None:
+            self.recorder.record()
+
+    def progress_aggregate(self, time_delta_s: float) -> None:
+        """
+        Progress the simulation world by the provided time_delta_s without moving anyone, spreading infection
+        from the contact rates learned at agent level so far. Steps of a day or more are expected, and
+        people are found where they were left when progress_simulation is called again.
+
+        Preconditions:
+            - time_delta_s > 0
+        """
+        if self.contact_rates is None:
+            raise ValueError("progress_aggregate needs contact rates, create the simulation with "
+                             "learn_contact_rates=True")
+        self.city.progress_clock(time_delta_s)
+        self.contact_rates.spread_infection(time_delta_s, self.rng.infection)
+
+        self._record_history()
+        if self.collector is not None:
+            self.collector.record()
+        if self.recorder is not None:
+            self.recorder.record()
+
+    def _record_history(self) -> None:
+        """Record a row of csv data if more than 500 s of simulation time passed since the last one"""
         if self.city.time_s - self.time_tracker > 500:
-            write_to_csv('sim' + str(self.sim_file_id),
-                         [self.day_count,
-                          len([p for p in self.city.people if p.is_infected]) / len(self.city.people)])
-            self.day_count += 1
+            row = (self.city.time_s, len(self.city.infected) / len(self.city.people))
+            self.history.append(row)
+            if self.metrics is not None:
+                self.metrics.write_row(row)
             self.time_tracker = self.city.time_s
 
-        # return self.__graphics_data.get_dynamic_sendable_info()
+    def close(self) -> None:
+        """Write out any recorded data still buffered and close the output files"""
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.collector is not None:
+            self.collector.sink.close()
+        if self.recorder is not None:
+            self.recorder.close()
 
     def get_static_graphics_data(self) -> dict:
         """
         Return info on static simulation objects such as buildings and interactables
         """
         return self.__graphics_data.get_static_sendable_info()
+
+    def get_dynamic_graphics_data(self) -> dict:
+        """
+        Return info on the current state of simulation objects which move or change, such as people
+        """
+        self.__graphics_data.update_people(self.city)
+        return self.__graphics_data.get_dynamic_sendable_info()
+
+    def get_delta_graphics_data(self) -> dict:
+        """
+        Return the next delta frame of the state of people, see GraphicsData
+        """
+        self.__graphics_data.update_delta(self.city)
+        return self.__graphics_data.get_delta_sendable_info()
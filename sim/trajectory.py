@@ -0,0 +1,210 @@
+"""CovSim Sim Package: Trajectory
+
+Module Description
+==================
+This module records the position and state of every person to a binary file as the simulation
+runs, and reads such files back for replay and analysis. Every frame has the same width, so
+the file is opened as a memory-mapped array of frames: any frame, or any person's trajectory,
+is read straight from the file without loading the rest of the run into memory, e.g.
+
+    trajectory = Trajectory('run.traj')
+    frame = trajectory[trajectory.get_frame_index(3600)]
+    xs = trajectory.frames['x'][:, 42]
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from enum import IntFlag
+from typing import Optional, TYPE_CHECKING
+import atexit
+import json
+import math
+import numpy as np
+
+if TYPE_CHECKING:
+    import sim.sim_components as sc
+
+# First bytes of every trajectory file, followed by the length of its JSON header
+TRAJECTORY_MAGIC = b'CSTRAJ01'
+# Frames start at a multiple of this many bytes
+HEADER_ALIGNMENT = 64
+
+
+class FrameFlags(IntFlag):
+    """State of a person in a frame, packed into one byte"""
+    INFECTED = 1
+    WEARING_MASK = 2
+    VACCINATED = 4
+    INDOOR = 8
+    DEAD = 16
+
+
+def get_frame_dtype(num_people: int) -> np.dtype:
+    """Return the type of one frame of num_people people. Positions are only meaningful for people who are
+    outside, and building is -1 for them"""
+    return np.dtype([('time_s', '<f8'), ('x', '<f4', (num_people,)), ('y', '<f4', (num_people,)),
+                     ('building', '<i4', (num_people,)), ('flags', 'u1', (num_people,))])
+
+
+def get_frame_flags(people) -> np.ndarray:
+    """Return the FrameFlags of every person in the population people"""
+    flags = people.is_infected.astype(np.uint8) * np.uint8(FrameFlags.INFECTED)
+    flags |= people.is_wearing_mask.astype(np.uint8) * np.uint8(FrameFlags.WEARING_MASK)
+    flags |= people.is_vaccinated.astype(np.uint8) * np.uint8(FrameFlags.VACCINATED)
+    flags |= (people.building >= 0).astype(np.uint8) * np.uint8(FrameFlags.INDOOR)
+    flags |= people.is_dead.astype(np.uint8) * np.uint8(FrameFlags.DEAD)
+    return flags
+
+
+def get_building_rows(city: sc.City) -> np.ndarray:
+    """Return one row of (left, top, width, height, entrance_x, entrance_y, purpose) per building of city"""
+    return np.array([[b.rect.left, b.rect.top, b.rect.width, b.rect.height, b.entrance_point.x,
+                      b.entrance_point.y, int(b.purpose)] for b in city.buildings], dtype=float).reshape(-1, 7)
+
+
+def fill_frame(frame: np.ndarray, city: sc.City) -> None:
+    """Write the current time and the position and state of every person of city into frame, an array or
+    record of get_frame_dtype(len(city.people))"""
+    pop = city.people
+    frame['time_s'] = city.time_s
+    frame['x'] = pop.x
+    frame['y'] = pop.y
+    frame['building'] = pop.building
+    frame['flags'] = get_frame_flags(pop)
+
+
+class TrajectoryRecorder:
+    """
+    Appends a frame of every person's position and state to a trajectory file every time record is
+    called, at most once every interval_s simulated seconds. The buildings are written once, in the
+    header, so that the file can be replayed on its own.
+
+    Frames still buffered when the program exits are written out, so closing the recorder explicitly is
+    only needed to release the file earlier.
+
+    Instance Attributes:
+        - city: the city whose people are recorded
+        - filename: path of the trajectory file
+        - interval_s: least simulated seconds between two frames, 0 to record every tick
+        - num_frames: number of frames recorded so far
+        - is_closed: whether the recorder was closed, after which no more frames can be recorded
+    """
+    def __init__(self, city: sc.City, filename: str, interval_s: float = 0):
+        self.city = city
+        self.filename = filename
+        self.interval_s = interval_s
+        self.num_frames = 0
+        self.is_closed = False
+
+        num_people = len(city.people)
+        # Reused for every frame, so that recording allocates nothing per person
+        self._frame = np.zeros((), dtype=get_frame_dtype(num_people))
+        self._last_frame_s = -math.inf
+
+        header = {'num_people': num_people, 'buildings': get_building_rows(city).tolist()}
+        header_bytes = json.dumps(header).encode()
+        # Pads the header with spaces, which JSON ignores, so that frames are aligned
+        padding = -(len(TRAJECTORY_MAGIC) + 8 + len(header_bytes)) % HEADER_ALIGNMENT
+        header_bytes += b' ' * padding
+
+        self._file = open(filename, 'wb')
+        self._file.write(TRAJECTORY_MAGIC)
+        self._file.write(np.uint64(len(header_bytes)).tobytes())
+        self._file.write(header_bytes)
+        # So that the file can be opened by Trajectory before any frame is written out
+        self._file.flush()
+        atexit.register(self.close)
+
+    def record(self) -> None:
+        """Append a frame of every person if interval_s has passed since the last frame"""
+        if self.is_closed:
+            raise ValueError("Can't record to a closed trajectory recorder")
+        if self.city.time_s - self._last_frame_s < self.interval_s:
+            return
+        fill_frame(self._frame, self.city)
+        self._file.write(self._frame.tobytes())
+
+        self.num_frames += 1
+        self._last_frame_s = self.city.time_s
+
+    def close(self) -> None:
+        """Write out every buffered frame and close the file. Closing twice does nothing"""
+        if self.is_closed:
+            return
+        try:
+            self._file.close()
+        finally:
+            self.is_closed = True
+            atexit.unregister(self.close)
+
+    def __enter__(self) -> TrajectoryRecorder:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class Trajectory:
+    """
+    Read-only view of a trajectory file written by TrajectoryRecorder. Frames are memory-mapped, so
+    indexing only reads the parts of the file that are used.
+
+    Instance Attributes:
+        - filename: path of the trajectory file
+        - num_people: number of people in every frame
+        - buildings: one row of (left, top, width, height, entrance_x, entrance_y, purpose) per building
+        - frames: array of every frame in the file (see get_frame_dtype), mapped from the file
+    """
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            magic = f.read(len(TRAJECTORY_MAGIC))
+            if magic != TRAJECTORY_MAGIC:
+                raise ValueError(filename + " is not a trajectory file")
+            header_length = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+            header = json.loads(f.read(header_length))
+
+        self.num_people: int = header['num_people']
+        self.buildings = np.array(header['buildings'], dtype=float).reshape(-1, 7)
+        self._offset = len(TRAJECTORY_MAGIC) + 8 + header_length
+        self.frames = np.zeros(0, dtype=get_frame_dtype(self.num_people))
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Map the frames appended to the file since it was opened, e.g. while its simulation is still running.
+        A frame which is only partly written yet is left out"""
+        with open(self.filename, 'rb') as f:
+            size = f.seek(0, 2)
+        num_frames = (size - self._offset) // self.frames.dtype.itemsize
+        # Files without frames can't be mapped
+        if num_frames > 0:
+            self.frames = np.memmap(self.filename, dtype=self.frames.dtype, mode='r', offset=self._offset,
+                                    shape=(num_frames,))
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
+
+    @property
+    def times(self) -> np.ndarray:
+        """Simulated time of every frame, in seconds"""
+        return self.frames['time_s']
+
+    def get_frame_index(self, time_s: float) -> int:
+        """Return the index of the last frame recorded at or before time_s, or of the first frame if time_s is
+        before all of them
+
+        Preconditions:
+            - len(self) > 0
+        """
+        return max(int(np.searchsorted(self.times, time_s, side='right')) - 1, 0)
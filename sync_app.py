@@ -3,7 +3,13 @@
 Module Description
 ==================
 This module implements an App class which engages with the simulation synchronously when
-called by the launcher.
+called by the launcher. The simulation can also be run in a separate process, so that
+rendering and simulating don't slow each other down, and the app can replay a trajectory
+recorded by a finished run (see sim.trajectory) at any speed, without running the
+simulation again:
+
+    python sync_app.py --params params.json --process
+    python sync_app.py run.traj
 
 Copyright and Usage Information
 ===============================
@@ -16,11 +22,20 @@ using this code in any other way is prohibited.
 This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
 """
 from dataclasses import dataclass
+from typing import Optional
 from sim.sim_manager import SimManager, SimParams
+from sim.trajectory import Trajectory, FrameFlags
+from app_sim_comms import AppSimComms
 from geometry.geometry import *
+from geometry.rendering import *
+from geometry.spatial_hash import SpatialHashGrid
+from geometry.helpers import average
+import argparse
+import json
 import logging
+import math
 import pygame
-import colorsys
+import numpy as np
 #pygame.init()
 
 
@@ -46,6 +61,13 @@ class SyncApp:
     class will later be deleted and the App class will be used in place of it,
     when everything is complete
 
+    With use_sim_process, the simulation runs in a child process instead (see AppSimComms), as fast as
+    it can, and each frame draws the latest state it sent. Either way, it is progressed by sim_speed_s
+    each step.
+
+    Given a replay trajectory instead of parameters, the recorded frames are played back in place of
+    the simulation. The + and - keys change the playback speed, space pauses and home restarts it.
+
     Instance Attributes:
         - SCREEN_DIMS: user screen dimensions constant
         - WINDOW_DIMS: window dimensions constant
@@ -53,15 +75,42 @@ class SyncApp:
         - _window: app window
         - _is_running: main loop flag
         - _events: pygame event list
-        - _sim: the sim object
+        - _sim: the sim object, None when replaying or simulating in another process
+        - _comms: communicator with the sim process, None when simulating in this process
+        - _last_people: people drawn in the last frame from the sim process, drawn again when no newer
+        frame can be read
+        - _replay: the trajectory played back, None when simulating
+        - _replay_time_s: simulated time of the frame being played back
+        - _is_paused: whether the sim or the replay is paused
         - _sim_speed_s: By how many seconds the sim should be progressed each frame
+        - _buildings: rectangle and entrance point of each building
+        - _building_pyrects: pygame rectangle of each building
+        - _building_grid: grid of the indexes of buildings, to find the ones in view
+        - _city_rect: world area holding every building and entrance
+        - _building_layer: buildings drawn off screen, None until first rendered
+        - _building_layer_rect: world area drawn on the building layer
+        - _building_layer_ratio: pixels per world unit of the building layer
         - _camera: Eyes to see the world
     """
     SCREEN_SIZE_CONSTANT = 0.7
     ZOOM_IN_VAL = 0.95
     ZOOM_OUT_VAL = 1.05
 
-    def __init__(self, param_dict: dict):
+    BACKGROUND_COLOR = (70, 70, 70)
+
+    # Buildings are drawn once to a layer, which is drawn again once the zoom changes by more than this
+    # fraction, and which is at most this many pixels wide and high
+    LAYER_ZOOM_TOLERANCE = 0.2
+    LAYER_MAX_PX = 2048
+
+    # People are drawn as the density of each square of this many pixels once they would be drawn smaller
+    # than DENSITY_MIN_RADIUS_PX pixels, or once more than DENSITY_MAX_PEOPLE are in view
+    DENSITY_CELL_PX = 8
+    DENSITY_MIN_RADIUS_PX = 2
+    DENSITY_MAX_PEOPLE = 5000
+
+    def __init__(self, param_dict: Optional[dict] = None, replay: Optional[Trajectory] = None,
+                 use_sim_process: bool = False, sim_speed_s: float = 10):
         # User screen dimensions, and app window dimensions
         self.SCREEN_DIMS = (pygame.display.Info().current_w,
                             pygame.display.Info().current_h)
@@ -78,18 +127,59 @@ class SyncApp:
         # Event queue gotten from pygame each frame
         self._events = []
 
-        # Sim manager object
-        self._sim = SimManager(self.parse_params(param_dict))
+        # Sim manager object, or the recorded run played back instead
+        self._sim: Optional[SimManager] = None
+        self._comms: Optional[AppSimComms] = None
+        self._last_people = (np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool), np.zeros(0, dtype=bool))
+        self._replay = replay
+        self._replay_time_s = 0.0
+        self._is_paused = False
 
         # Seconds to progress the sim by each frame
-        self._sim_speed_s = 10
-
-        self._camera = Camera(topleft=[-20, -20], width=self._sim.city.get_bounding_box().width+40,
+        self._sim_speed_s = sim_speed_s
+
+        if replay is None and use_sim_process:
+            self._comms = AppSimComms(self)
+            self._comms.start_simulation(self.parse_params(param_dict), self._sim_speed_s)
+            static_info = self._comms.get_static_frame_info()
+            if static_info is None:
+                raise RuntimeError("Sim process ended before sending the city")
+            frame_buffer = self._comms.get_frame_buffer()
+            if frame_buffer is not None:
+                self._buildings = [(Rectangle(left, top, width, height), Point(entrance_x, entrance_y))
+                                   for left, top, width, height, entrance_x, entrance_y, _ in
+                                   frame_buffer.buildings.tolist()]
+            else:
+                self._buildings = [(Rectangle(left, top, width, height), Point(entrance_x, entrance_y))
+                                   for _, top, left, width, height, entrance_x, entrance_y in static_info["buildings"]]
+        elif replay is None:
+            self._sim = SimManager(self.parse_params(param_dict))
+            self._buildings = [(b.rect, b.entrance_point) for b in self._sim.city.buildings]
+        else:
+            self._buildings = [(Rectangle(left, top, width, height), Point(entrance_x, entrance_y))
+                               for left, top, width, height, entrance_x, entrance_y, _ in replay.buildings.tolist()]
+            if len(replay) > 0:
+                self._replay_time_s = float(replay.times[0])
+
+        self._building_pyrects = [get_pygame_rect(rect) for rect, _ in self._buildings]
+        self._building_grid = SpatialHashGrid(average([max(rect.width, rect.height) for rect, _ in self._buildings]))
+        for k, (rect, _) in enumerate(self._buildings):
+            self._building_grid.insert(k, rect)
+
+        # Entrances are drawn as circles of radius 7 around points on the edge of buildings
+        self._city_rect = self._building_pyrects[0].unionall(self._building_pyrects).inflate(16, 16)
+        self._building_layer: Optional[pygame.Surface] = None
+        self._building_layer_rect = self._city_rect
+        self._building_layer_ratio = 1.0
+
+        city_width = max(r.left + r.width for r, _ in self._buildings) - min(r.left for r, _ in self._buildings)
+        self._camera = Camera(topleft=[-20, -20], width=city_width+40,
                               height_frac=self.WINDOW_DIMS[1] / self.WINDOW_DIMS[0])
 
         # Log the people
-        for p in self._sim.city.people:
-            logging.info(str(p))
+        if self._sim is not None:
+            for p in self._sim.city.people:
+                logging.info(str(p))
 
     def parse_params(self, param_dict: dict) -> SimParams:
         """Takes the parameter dict passed in from the GUI and converts
@@ -107,10 +197,14 @@ class SyncApp:
     def run_sim(self):
         """Runs main app loop"""
         while self._is_running:
-            self._window.fill((70, 70, 70))
+            self._window.fill(SyncApp.BACKGROUND_COLOR)
 
-            # Progresses simulation
-            self._sim.progress_simulation(self._sim_speed_s)
+            # Progresses simulation, or the replay. The sim process progresses on its own
+            if not self._is_paused:
+                if self._sim is not None:
+                    self._sim.progress_simulation(self._sim_speed_s)
+                elif self._replay is not None:
+                    self._replay_time_s += self._sim_speed_s
 
             # Stores events, captures quit event
             self._events = pygame.event.get()
@@ -120,6 +214,8 @@ class SyncApp:
                 # Camera zoom feature
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     self.scroll_manager(event)
+                elif event.type == pygame.KEYDOWN:
+                    self.key_manager(event)
 
             # camera movement
             if pygame.key.get_pressed()[pygame.K_RIGHT]:
@@ -138,6 +234,27 @@ class SyncApp:
             self._clock.tick(100)
             pygame.display.set_caption("CovSim    FPS: " + str(self._clock.get_fps()))
 
+        # Writes out the sim data still buffered, so that it can be plotted
+        if self._sim is not None:
+            self._sim.close()
+        if self._comms is not None:
+            self._comms.stop_simulation()
+
+    def key_manager(self, key_event):
+        """Changes the speed of the sim or replay, pauses it, or restarts the replay"""
+        if key_event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+            self._sim_speed_s *= 2
+        elif key_event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+            self._sim_speed_s /= 2
+        elif key_event.key == pygame.K_SPACE:
+            self._is_paused = not self._is_paused
+        elif key_event.key == pygame.K_HOME and self._replay is not None and len(self._replay) > 0:
+            self._replay_time_s = float(self._replay.times[0])
+
+        if self._comms is not None:
+            self._comms.set_sim_speed(self._sim_speed_s)
+            self._comms.set_paused(self._is_paused)
+
     def render(self):
         """Renders simulation frame using camera object and world data from sim"""
         cam_rect = pygame.Rect(self._camera.topleft, (self._camera.width,
@@ -148,29 +265,162 @@ class SyncApp:
         self.render_people(ratio, cam_rect)
 
     def render_buildings(self, ratio: float, cam_rect: pygame.Rect) -> None:
-        """Renders buildings using camera"""
-        for b in self._sim.city.buildings:
+        """Renders buildings using camera, by blitting the part of the building layer in view"""
+        self.update_building_layer(ratio, cam_rect)
+        layer_ratio = self._building_layer_ratio
+        layer_rect = self._building_layer_rect
+
+        # Part of the layer in view, in layer pixels
+        area = pygame.Rect(round((cam_rect.left - layer_rect.left) * layer_ratio),
+                           round((cam_rect.top - layer_rect.top) * layer_ratio),
+                           math.ceil(cam_rect.width * layer_ratio) + 1, math.ceil(cam_rect.height * layer_ratio) + 1)
+        area = area.clip(self._building_layer.get_rect())
+        if area.width == 0 or area.height == 0:
+            return
+        dest = SyncApp.get_relative_pos((layer_rect.left + area.left / layer_ratio,
+                                         layer_rect.top + area.top / layer_ratio), ratio, cam_rect)
+
+        if ratio == layer_ratio:
+            self._window.blit(self._building_layer, dest, area)
+        else:
+            # Zoomed since the layer was drawn, but not by enough to draw it again
+            scale = ratio / layer_ratio
+            scaled = pygame.transform.scale(self._building_layer.subsurface(area),
+                                            (round(area.width * scale), round(area.height * scale)))
+            self._window.blit(scaled, dest)
+
+    def update_building_layer(self, ratio: float, cam_rect: pygame.Rect) -> None:
+        """Draws the building layer again if the zoom changed by more than LAYER_ZOOM_TOLERANCE since it was
+        drawn, or if the camera moved out of it. The layer covers the whole city if it fits in LAYER_MAX_PX
+        pixels, otherwise the camera view and half a view's width and height around it"""
+        if self._building_layer is not None and \
+                abs(ratio / self._building_layer_ratio - 1) <= SyncApp.LAYER_ZOOM_TOLERANCE and \
+                (self._building_layer_rect == self._city_rect or self._building_layer_rect.contains(cam_rect)):
+            return
+
+        if max(self._city_rect.width, self._city_rect.height) * ratio <= SyncApp.LAYER_MAX_PX:
+            # Nothing is drawn outside the city, so the layer is only drawn again on zoom
+            layer_rect = self._city_rect
+        else:
+            layer_rect = cam_rect.inflate(cam_rect.width, cam_rect.height)
+
+        # Same pixel format as the window, so that blits don't have to convert
+        layer = pygame.Surface((math.ceil(layer_rect.width * ratio), math.ceil(layer_rect.height * ratio)), 0,
+                               self._window)
+        layer.fill(SyncApp.BACKGROUND_COLOR)
+        self.draw_buildings(layer, ratio, layer_rect)
+        self._building_layer = layer
+        self._building_layer_rect = layer_rect
+        self._building_layer_ratio = ratio
+
+    def draw_buildings(self, surface: pygame.Surface, ratio: float, view_rect: pygame.Rect) -> None:
+        """Draws the buildings in the world area view_rect onto surface, scaled by ratio"""
+        # Only buildings sharing a grid cell with the view can be in it
+        for k in self._building_grid.query(Rectangle(view_rect.left, view_rect.top, view_rect.width,
+                                                     view_rect.height)):
             # Building pygame rectangle
-            b_pyrect = b.rect.get_pygame_rectangle()
+            b_pyrect = self._building_pyrects[k]
+            entrance_point = self._buildings[k][1]
 
-            if cam_rect.colliderect(b_pyrect):
-                blit_rect = pygame.Rect(SyncApp.get_relative_pos(b_pyrect.topleft, ratio, cam_rect),
+            if view_rect.colliderect(b_pyrect):
+                blit_rect = pygame.Rect(SyncApp.get_relative_pos(b_pyrect.topleft, ratio, view_rect),
                                         (b_pyrect.width * ratio,
                                          b_pyrect.height * ratio))
 
-                pygame.draw.rect(self._window, (180, 180, 200), blit_rect)
-                ent_pt = SyncApp.get_relative_pos(b.entrance_point, ratio, cam_rect)
-                draw_circle(Circle(ent_pt[0], ent_pt[1], 7 * ratio), self._window, (255, 255, 255))
+                pygame.draw.rect(surface, (180, 180, 200), blit_rect)
+                ent_pt = SyncApp.get_relative_pos(entrance_point, ratio, view_rect)
+                draw_circle(Circle(ent_pt[0], ent_pt[1], 7 * ratio), surface, (255, 255, 255))
 
     def render_people(self, ratio: float, cam_rect: pygame.Rect) -> None:
         """Renders people using camera"""
-        for p in self._sim.city.people:
-            if p.location.point is not None and cam_rect.collidepoint(p.location.point.x, p.location.point.y):
-                pt = SyncApp.get_relative_pos(p.location.point, ratio, cam_rect)
-                if p.is_wearing_mask:
-                    draw_circle(Circle(pt[0], pt[1], 6 * ratio), self._window, (0, 0, 255), width=0)
-                draw_circle(Circle(pt[0], pt[1], 4 * ratio), self._window,
-                            (255, 0, 0) if p.is_infected else (0, 255, 0), width=0)
+        x, y, is_infected, is_wearing_mask = self.get_outdoor_people()
+
+        # People within the camera view
+        visible = np.flatnonzero((cam_rect.left <= x) & (x < cam_rect.right) &
+                                 (cam_rect.top <= y) & (y < cam_rect.bottom))
+
+        # Too small or too many to tell apart, so only how many there are and how many are infected is drawn
+        if 4 * ratio < SyncApp.DENSITY_MIN_RADIUS_PX or len(visible) > SyncApp.DENSITY_MAX_PEOPLE:
+            self.render_density(ratio, cam_rect, x[visible], y[visible], is_infected[visible])
+            return
+
+        for i in visible.tolist():
+            pt = SyncApp.get_relative_pos((x[i], y[i]), ratio, cam_rect)
+            if is_wearing_mask[i]:
+                draw_circle(Circle(pt[0], pt[1], 6 * ratio), self._window, (0, 0, 255), width=0)
+            draw_circle(Circle(pt[0], pt[1], 4 * ratio), self._window,
+                        (255, 0, 0) if is_infected[i] else (0, 255, 0), width=0)
+
+    def render_density(self, ratio: float, cam_rect: pygame.Rect, x: np.ndarray, y: np.ndarray,
+                       is_infected: np.ndarray) -> None:
+        """Renders the people at x, y as one square per DENSITY_CELL_PX pixels, brighter the more people are in
+        it, and redder the more of them are infected. Squares are fixed in the world, so they don't flicker as
+        the camera moves"""
+        cell_size = SyncApp.DENSITY_CELL_PX / ratio
+        first_x = math.floor(cam_rect.left / cell_size)
+        first_y = math.floor(cam_rect.top / cell_size)
+        num_x = math.floor(cam_rect.right / cell_size) - first_x + 1
+        num_y = math.floor(cam_rect.bottom / cell_size) - first_y + 1
+
+        cx = np.clip(np.floor(x / cell_size).astype(np.int64) - first_x, 0, num_x - 1)
+        cy = np.clip(np.floor(y / cell_size).astype(np.int64) - first_y, 0, num_y - 1)
+        cell = cx * num_y + cy
+        counts = np.bincount(cell, minlength=num_x * num_y).reshape(num_x, num_y)
+        if counts.max(initial=0) == 0:
+            return
+        infected = np.bincount(cell, is_infected.astype(float), minlength=num_x * num_y).reshape(num_x, num_y)
+
+        share = np.divide(infected, counts, out=np.zeros(counts.shape), where=counts > 0)
+        brightness = 0.35 + 0.65 * np.log1p(counts) / np.log1p(counts.max())
+        colors = np.zeros((num_x, num_y, 3), dtype=np.uint8)
+        colors[..., 0] = 255 * share * brightness
+        colors[..., 1] = 255 * (1 - share) * brightness
+        # Black is see-through, so that empty squares show the buildings below
+        colors[counts == 0] = 0
+
+        # One small image of the squares, scaled up to the window in one blit
+        density = pygame.surfarray.make_surface(colors)
+        density.set_colorkey((0, 0, 0))
+        density = pygame.transform.scale(density, (num_x * SyncApp.DENSITY_CELL_PX, num_y * SyncApp.DENSITY_CELL_PX))
+        self._window.blit(density, SyncApp.get_relative_pos((first_x * cell_size, first_y * cell_size), ratio,
+                                                            cam_rect))
+
+    def get_outdoor_people(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return the x and y positions, and whether they are infected and wearing a mask, of the living
+        people outside, from the sim, the latest frame sent by the sim process, or the frame of the replay
+        being played back"""
+        if self._sim is not None:
+            pop = self._sim.city.people
+            outdoor = self._sim.city.outdoor.members
+            return pop.x[outdoor], pop.y[outdoor], pop.is_infected[outdoor], pop.is_wearing_mask[outdoor]
+
+        if self._comms is not None:
+            frame_buffer = self._comms.get_frame_buffer()
+            if frame_buffer is not None:
+                # Copies the people out of shared memory, unless the frame is being overwritten
+                people = frame_buffer.read(SyncApp.get_outdoor_people_in_frame)
+            else:
+                # Decoded from the delta frames sent over the pipe
+                frame = self._comms.get_latest_frame()
+                people = SyncApp.get_outdoor_people_in_frame(frame) if frame is not None else None
+            if people is not None:
+                self._last_people = people
+            return self._last_people
+
+        if len(self._replay) == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty.astype(bool), empty.astype(bool)
+        # Reads only this frame from the file
+        return SyncApp.get_outdoor_people_in_frame(self._replay[self._replay.get_frame_index(self._replay_time_s)])
+
+    @staticmethod
+    def get_outdoor_people_in_frame(frame: np.void) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Return copies of the x and y positions, and whether they are infected and wearing a mask, of the
+        living people outside in frame (see sim.trajectory.get_frame_dtype)"""
+        flags = frame['flags']
+        outdoor = np.flatnonzero((flags & (FrameFlags.INDOOR | FrameFlags.DEAD)) == 0)
+        return (frame['x'][outdoor], frame['y'][outdoor], (flags[outdoor] & FrameFlags.INFECTED) != 0,
+                (flags[outdoor] & FrameFlags.WEARING_MASK) != 0)
 
     @staticmethod
     def get_relative_pos(
@@ -225,52 +475,23 @@ class SyncApp:
             self._camera.topleft[1] += diff[1]
 
 
-def draw_paths(paths: list[Path], screen: pygame.Surface, start_circle=True, circles=False):
-    """Draws a list of paths"""
-    cols = color_brewer(len(paths))
-    for i in range(len(paths)):
-        draw_path(paths[i], screen, cols[i], start_circle=start_circle, circles=circles)
-
-
-def draw_rect(rectangle: Rectangle, screen: pygame.Surface, color: tuple[int, int, int], width=1):
-    """Draws a rectangle"""
-    pygame.draw.rect(screen, color,
-                     pygame.Rect((int(rectangle.left), int(rectangle.top)),
-                                 (int(rectangle.width), int(rectangle.height))), width=width)
-
-
-def draw_circle(circle: Circle, screen: pygame.Surface, color: tuple[int, int, int], width=1):
-    """Draws a circle"""
-    pygame.draw.circle(screen, color, (circle.center_x, circle.center_y), circle.radius, width=width)
-
-
-def draw_path(path: Path, screen: pygame.Surface, color: tuple[int, int, int],
-              start_circle=True, circles=False):
-    """Draws a single path"""
-    vecs = path.get_vectors()
-
-    for vec in vecs:
-        draw_vector(vec, screen, color, start_circle=(3 if circles else 0))
-
-    # Draws circle at start of path
-    if start_circle:
-        draw_circle(Circle(center_x=vecs[0].start.x, center_y=vecs[0].start.y, radius=3), screen, color, width=0)
-
-
-def draw_vector(vector: Vector, screen: pygame.Surface, color: tuple[int, int, int],
-                start_circle=0, end_circle=0):
-    """Draws a single vector with optional endpoint circles"""
-    pygame.draw.line(screen, color, (vector.start.x, vector.start.y), (vector.end.x, vector.end.y))
-    if start_circle > 0:
-        draw_circle(Circle(center_x=vector.start.x, center_y=vector.start.y, radius=start_circle), screen, color,
-                    width=1)
-    if end_circle > 0:
-        draw_circle(Circle(center_x=vector.end.x, center_y=vector.end.y, radius=end_circle), screen, color, width=1)
-
-
-def color_brewer(num: int) -> list[tuple[int, ...]]:
-    """Returns an equally spaced list of colors with length of num"""
-    if num == 0:
-        return []
-    val = 0.7 / num
-    return [tuple(int(c * 255) for c in colorsys.hsv_to_rgb(i * val, 0.8, 0.8)) for i in range(num)]
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(prog='python sync_app.py',
+                                         description="Show a simulation, or replay a recorded one")
+    arg_parser.add_argument('trajectory', nargs='?', default=None,
+                            help="trajectory file recorded by a run to replay (see sim.run --trajectory)")
+    arg_parser.add_argument('--params', default=None, help="JSON file holding the SimParams fields to simulate")
+    arg_parser.add_argument('--process', action='store_true', help="run the simulation in a separate process")
+    arg_parser.add_argument('--speed', type=float, default=10,
+                            help="simulated seconds progressed or played back per frame (default 10)")
+    args = arg_parser.parse_args()
+    if (args.trajectory is None) == (args.params is None):
+        arg_parser.error("expected either a trajectory or --params")
+
+    pygame.init()
+    if args.trajectory is not None:
+        app = SyncApp(replay=Trajectory(args.trajectory), sim_speed_s=args.speed)
+    else:
+        with open(args.params) as f:
+            app = SyncApp(json.load(f), use_sim_process=args.process, sim_speed_s=args.speed)
+    app.start()
@@ -0,0 +1,54 @@
+"""CovSim Tests: Fixtures
+
+Module Description
+==================
+This module contains the fixtures shared by the tests: a small city, which builds in a fraction of a
+second, and a factory of seeded simulations of it.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from __future__ import annotations
+from typing import Callable, Iterator
+from sim.sim_manager import SimManager, SimParams
+import pytest
+
+# Parameters of a city of 4 blocks and 100 people, a tenth of them infected
+SMALL_PARAMS = {
+    'city_blocks_x': 2, 'city_blocks_y': 2, 'block_dim': 200, 'buildings_constant': 30, 'road_width': 40,
+    'high_rise_percentage': 10, 'num_medical_buildings': 1, 'num_travel_buildings': 1, 'residential_ratio': 5,
+    'commercial_ratio': 3, 'industrial_ratio': 2, 'population': 100, 'avg_age': 40, 'mask_wearing_percentage': 50,
+    'average_travels_per_year': 5, 'is_closed_border': False, 'initial_vaccination_percentage': 10,
+    'initial_infection_percentage': 10, 'is_vaccine_available': False, 'homelessness_percentage': 0,
+    'quarantine_tendency': 0, 'vaccination_tendency': 0, 'social_distancing': 0,
+    'world_threat_level_local': 0, 'world_threat_level_international': 0,
+}
+
+
+@pytest.fixture
+def small_params() -> SimParams:
+    """Return the parameters of a small city"""
+    return SimParams(**SMALL_PARAMS)
+
+
+@pytest.fixture
+def make_sim(small_params: SimParams) -> Iterator[Callable[..., SimManager]]:
+    """Return a function making a simulation of the small city, seeded with seed, which writes no data files
+    unless given an output_dir. Other keyword arguments are passed on to SimManager"""
+    sims = []
+
+    def make(seed: int = 1, output_dir=None, **kwargs) -> SimManager:
+        sim = SimManager(small_params, output_dir, seed, **kwargs)
+        sims.append(sim)
+        return sim
+
+    yield make
+    for sim in sims:
+        sim.close()
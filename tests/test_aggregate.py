@@ -0,0 +1,112 @@
+"""CovSim Tests: Aggregate
+
+Module Description
+==================
+Tests of the contact rate model behind the aggregate day-step mode.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+import numpy as np
+import pytest
+
+
+def test_record_matches_every_pair(make_sim) -> None:
+    """The exposure recorded in one tick is that of every infected and healthy pair within radius blocks,
+    counted one pair at a time"""
+    sim = make_sim(learn_contact_rates=True)
+    sim.progress_simulation(10)
+    model = sim.contact_rates
+    contacts = sim.city.last_contacts
+    assert len(contacts.infected) > 0 and len(contacts.susceptible) > 0
+
+    infected_x, infected_y, infected_types = model.get_groups(contacts.infected)
+    healthy_x, healthy_y, healthy_types = model.get_groups(contacts.susceptible)
+    susceptibility = model.get_susceptibility(contacts.susceptible)
+    block_exposure = np.zeros_like(model.block_exposure)
+    type_exposure = np.zeros_like(model.type_exposure)
+    for x, y, t in zip(infected_x, infected_y, infected_types):
+        for x2, y2, u, weight in zip(healthy_x, healthy_y, healthy_types, susceptibility):
+            if (x2 - x, y2 - y) in model.offsets:
+                block_exposure[x, y, model.offsets.index((x2 - x, y2 - y))] += contacts.time_delta_s * weight
+                type_exposure[t, u] += contacts.time_delta_s * weight
+
+    assert model.block_exposure == pytest.approx(block_exposure)
+    assert model.type_exposure == pytest.approx(type_exposure)
+    assert model.block_hazard.sum() == pytest.approx(model.type_hazard.sum())
+
+
+def test_infection_follows_type_rates(make_sim) -> None:
+    """Only healthy people of the building type the infected people spread to are infected"""
+    sim = make_sim(learn_contact_rates=True)
+    model = sim.contact_rates
+    susceptible = sim.city.susceptible.members.copy()
+    types = model.get_groups(susceptible)[2]
+    target = np.bincount(types).argmax()
+
+    model.block_exposure[:] = 1
+    model.block_hazard[:] = 1
+    model.type_exposure[:] = 1
+    model.type_hazard[:, target] = 1
+    model.spread_infection(86400, sim.rng.infection)
+
+    pop = sim.city.people
+    assert pop.is_infected[susceptible[types == target]].any()
+    assert not pop.is_infected[susceptible[types != target]].any()
+
+
+def test_infection_follows_block_rates(make_sim) -> None:
+    """Only healthy people in the block the infected people spread to are infected"""
+    sim = make_sim(learn_contact_rates=True)
+    model = sim.contact_rates
+    infected_x, infected_y, _ = model.get_groups(sim.city.infected.members)
+    susceptible = sim.city.susceptible.members.copy()
+    block_x, block_y, _ = model.get_groups(susceptible)
+    # Spreads only within the block of one infected person
+    x, y = infected_x[0], infected_y[0]
+
+    model.block_exposure[:] = 1
+    model.block_hazard[x, y, model.offsets.index((0, 0))] = 1
+    model.type_exposure[:] = 1
+    model.type_hazard[:] = 1
+    model.spread_infection(86400, sim.rng.infection)
+
+    pop = sim.city.people
+    in_block = (block_x == x) & (block_y == y)
+    assert pop.is_infected[susceptible[in_block]].any()
+    assert not pop.is_infected[susceptible[~in_block]].any()
+
+
+def test_filled_rates_fall_back_to_mean_rate(make_sim) -> None:
+    """Rates between blocks or types never exposed to each other are the mean rate"""
+    model = make_sim(learn_contact_rates=True).contact_rates
+    model.block_exposure[0, 0, 0] = 2
+    model.block_hazard[0, 0, 0] = 1
+    model.block_exposure[1, 0, 0] = 6
+    model.type_exposure[0, 1] = 8
+    model.type_hazard[0, 1] = 1
+
+    assert model.get_mean_rate() == 1 / 8
+    block_rates, type_rates = model.get_filled_rates()
+    assert block_rates[0, 0, 0] == 0.5
+    # Exposed without any infection
+    assert block_rates[1, 0, 0] == 0
+    assert block_rates[0, 1, 0] == 1 / 8
+    assert type_rates[0, 1] == 1 / 8
+    assert type_rates[1, 0] == 1 / 8
+
+
+def test_aggregate_needs_contact_rates(make_sim) -> None:
+    """Contact rates are only learned when asked for, and aggregate steps can't be taken without them"""
+    sim = make_sim()
+    assert sim.contact_rates is None
+    sim.progress_simulation(10)
+    with pytest.raises(ValueError):
+        sim.progress_aggregate(86400)
@@ -0,0 +1,134 @@
+"""CovSim Tests: Checkpoint
+
+Module Description
+==================
+Tests that simulations restored from checkpoints carry on exactly as the saved ones do, and that forks
+are reproducible.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.checkpoint import CHECKPOINT_VERSION, take_snapshot, save_checkpoint, read_checkpoint, \
+    load_checkpoint, fork_checkpoint
+import json
+import numpy as np
+import pytest
+
+
+def progress(sim, steps: int = 50, tick_s: float = 10) -> None:
+    """Progress sim by steps ticks of tick_s"""
+    for _ in range(steps):
+        sim.progress_simulation(tick_s)
+
+
+def assert_same_state(a, b) -> None:
+    """Assert that the simulations a and b are in the same state"""
+    state_a = a.city.people.get_state()
+    state_b = b.city.people.get_state()
+    assert state_a.keys() == state_b.keys()
+    for name in state_a:
+        assert np.array_equal(state_a[name], state_b[name], equal_nan=True), name
+    assert a.city.time_s == b.city.time_s
+    assert a.history == b.history
+    assert a.rng.get_state() == b.rng.get_state()
+
+
+def test_restore_carries_on_exactly(make_sim, tmp_path) -> None:
+    """A simulation loaded from a checkpoint reaches the same state as the one it was saved from"""
+    filename = str(tmp_path / 'baseline.npz')
+    sim = make_sim(seed=7, epi_metrics=True)
+    progress(sim)
+    save_checkpoint(sim, filename)
+
+    restored = load_checkpoint(filename, epi_metrics=True)
+    try:
+        assert_same_state(sim, restored)
+        progress(sim)
+        progress(restored)
+        assert_same_state(sim, restored)
+        assert sim.collector.cumulative_infections == restored.collector.cumulative_infections
+    finally:
+        restored.close()
+
+
+def test_snapshot_is_a_copy(make_sim) -> None:
+    """Progressing a simulation doesn't change a snapshot taken of it"""
+    sim = make_sim()
+    snapshot = take_snapshot(sim)
+    x = snapshot['people.x'].copy()
+    progress(sim, 5)
+    assert np.array_equal(snapshot['people.x'], x, equal_nan=True)
+
+
+def test_navigation_is_restored(make_sim, tmp_path) -> None:
+    """The navigation graph and its route cache are restored rather than built again"""
+    filename = str(tmp_path / 'baseline.npz')
+    sim = make_sim()
+    progress(sim, 10)
+    save_checkpoint(sim, filename, compress=True)
+    restored = load_checkpoint(filename)
+    try:
+        state = sim.city.navigation.get_state()
+        restored_state = restored.city.navigation.get_state()
+        assert state.keys() == restored_state.keys()
+        for name in state:
+            assert np.array_equal(state[name], restored_state[name]), name
+    finally:
+        restored.close()
+
+
+def test_forks_are_reproducible(make_sim, tmp_path) -> None:
+    """Forks with the same seeds follow the same runs, which differ between seeds"""
+    filename = str(tmp_path / 'baseline.npz')
+    sim = make_sim(seed=3)
+    progress(sim, 20)
+    save_checkpoint(sim, filename)
+
+    first = fork_checkpoint(filename, 3)
+    second = fork_checkpoint(filename, 3)
+    try:
+        for a, b in zip(first, second):
+            progress(a, 100)
+            progress(b, 100)
+            assert_same_state(a, b)
+        assert len({f.rng.get_state()['spawn_key'][-1] for f in first}) == 3
+        assert not np.array_equal(first[0].city.people.x, first[1].city.people.x, equal_nan=True)
+    finally:
+        for fork in first + second:
+            fork.close()
+
+
+def test_contact_rates_are_saved_only_if_learned(make_sim) -> None:
+    """Contact rates are saved and restored along with a simulation learning them, and left out otherwise"""
+    assert not any(name.startswith('rates.') for name in take_snapshot(make_sim()))
+
+    sim = make_sim(learn_contact_rates=True)
+    progress(sim)
+    restored = load_checkpoint(take_snapshot(sim))
+    try:
+        state = sim.contact_rates.get_state()
+        restored_state = restored.contact_rates.get_state()
+        assert state.keys() == restored_state.keys()
+        for name in state:
+            assert np.array_equal(state[name], restored_state[name]), name
+    finally:
+        restored.close()
+
+
+def test_rejects_other_versions(make_sim, tmp_path) -> None:
+    """Checkpoints of another format version aren't read"""
+    filename = str(tmp_path / 'old.npz')
+    snapshot = take_snapshot(make_sim())
+    meta = json.loads(str(snapshot['meta']))
+    meta['version'] = CHECKPOINT_VERSION + 1
+    snapshot['meta'] = np.array(json.dumps(meta))
+    np.savez(filename, **snapshot)
+    with pytest.raises(ValueError):
+        read_checkpoint(filename)
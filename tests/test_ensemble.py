@@ -0,0 +1,59 @@
+"""CovSim Tests: Ensemble
+
+Module Description
+==================
+Tests of running many simulations in parallel.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.ensemble import expand_overrides, run_ensemble, summarize
+import csv
+
+
+def run(small_params, output_file=None) -> dict:
+    """Return the results of two runs of the small city, with seeds 0 and 1, by seed"""
+    results = run_ensemble(small_params, [{}], 2, 1000, 10, max_workers=2, output_file=output_file,
+                           epi_metrics=['cumulative_infections'])
+    return {result.seed: result for result in results}
+
+
+def test_runs_are_reproducible_and_independent(small_params, tmp_path) -> None:
+    """Seeded runs give the same results every time, and each seed gives its run its own random streams"""
+    output_file = tmp_path / 'ensemble.csv'
+    first = run(small_params, str(output_file))
+    second = run(small_params)
+    assert sorted(first) == [0, 1]
+
+    for seed in first:
+        assert first[seed].history == second[seed].history
+        assert first[seed].metrics == second[seed].metrics
+        assert first[seed].infected == second[seed].infected
+    assert first[0].history != first[1].history
+
+    with open(output_file, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ['scenario', 'seed', 'time_s', 'case_proportion']
+    assert len(rows) == 1 + len(first[0].history) + len(first[1].history)
+
+
+def test_expand_overrides() -> None:
+    """A dict of lists becomes every combination of its values, and a list of dicts is kept as is"""
+    assert expand_overrides({'a': [1, 2], 'b': [3]}) == [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    assert expand_overrides([{'a': 1}, {}]) == [{'a': 1}, {}]
+
+
+def test_summarize(small_params) -> None:
+    """Scenarios are summarized by the mean proportion of people infected, with its confidence interval"""
+    results = list(run(small_params).values())
+    mean, low, high = summarize(results)[0]
+    proportions = [result.infected / result.population for result in results]
+    assert mean == sum(proportions) / 2
+    assert low <= mean <= high
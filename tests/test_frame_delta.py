@@ -0,0 +1,119 @@
+"""CovSim Tests: Frame Delta
+
+Module Description
+==================
+Tests of the varint coding and the keyframe and delta frames of sim.frame_delta.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.frame_delta import DeltaEncoder, DeltaDecoder, KEYFRAME, DELTA, zigzag, unzigzag, encode_varints, \
+    decode_varints
+from sim.sim_manager import GraphicsData
+from sim.trajectory import FrameFlags, get_frame_flags
+import numpy as np
+import pytest
+
+
+def test_zigzag_round_trip() -> None:
+    """Small values of either sign map to small unsigned values, and back"""
+    values = np.array([0, -1, 1, -2, 2, 2 ** 62, -2 ** 62, 2 ** 63 - 1, -2 ** 63], dtype=np.int64)
+    assert zigzag(values[:5]).tolist() == [0, 1, 2, 3, 4]
+    assert np.array_equal(unzigzag(zigzag(values)), values)
+
+
+def test_varint_round_trip() -> None:
+    """Values of every length are decoded back, with the offset just after the last one"""
+    values = np.array([0, 1, 127, 128, 300, 16383, 16384, 2 ** 35, 2 ** 64 - 1], dtype=np.uint64)
+    data = encode_varints(values)
+    assert len(encode_varints(np.array([127]))) == 1
+    assert len(encode_varints(np.array([128]))) == 2
+    assert len(encode_varints(np.array([2 ** 64 - 1], dtype=np.uint64))) == 10
+
+    buffer = np.frombuffer(b'\x05' + data + b'\x07', dtype=np.uint8)
+    decoded, offset = decode_varints(buffer, len(values), 1)
+    assert np.array_equal(decoded, values)
+    assert offset == len(buffer) - 1
+    assert decode_varints(buffer, 0, 1)[1] == 1
+    with pytest.raises(ValueError):
+        decode_varints(buffer[:-2], len(values), 1)
+
+
+def random_walk(rng: np.random.Generator, num_people: int, num_frames: int):
+    """Yield the positions and flags of num_people people walking randomly, some inside"""
+    x = rng.uniform(0, 1000, num_people)
+    y = rng.uniform(0, 1000, num_people)
+    for _ in range(num_frames):
+        x = x + rng.normal(0, 2, num_people)
+        y = y + rng.normal(0, 2, num_people)
+        flags = np.where(rng.random(num_people) < 0.3, FrameFlags.INDOOR, 0).astype(np.uint8)
+        flags |= np.where(rng.random(num_people) < 0.1, FrameFlags.INFECTED, 0).astype(np.uint8)
+        yield x, y, flags
+
+
+def test_decoder_tracks_encoder() -> None:
+    """Decoded positions of people outside stay within the resolution and threshold of the true ones, and
+    flags are exact"""
+    rng = np.random.default_rng(1)
+    encoder = DeltaEncoder(200, keyframe_interval=10, resolution=0.5, threshold=1.0)
+    decoder = DeltaDecoder()
+    kinds = []
+    for k, (x, y, flags) in enumerate(random_walk(rng, 200, 25)):
+        data = encoder.encode(k * 10.0, x, y, flags)
+        kinds.append(data[0])
+        assert decoder.decode(data)
+
+        frame = decoder.frame
+        outdoor = (flags & FrameFlags.INDOOR) == 0
+        assert frame['time_s'] == k * 10.0
+        assert np.array_equal(frame['flags'], flags)
+        assert np.all(np.abs(frame['x'][outdoor] - x[outdoor]) < 1.0 + 0.25 + 1e-3)
+        assert np.all(np.abs(frame['y'][outdoor] - y[outdoor]) < 1.0 + 0.25 + 1e-3)
+    assert [k for k, kind in enumerate(kinds) if kind == KEYFRAME] == [0, 10, 20]
+    assert all(kind == DELTA for k, kind in enumerate(kinds) if k % 10 != 0)
+
+
+def test_still_people_are_not_sent() -> None:
+    """Delta frames of people who neither moved nor changed are only the frame header"""
+    encoder = DeltaEncoder(1000)
+    x = np.arange(1000, dtype=float)
+    flags = np.zeros(1000, dtype=np.uint8)
+    keyframe = encoder.encode(0, x, x, flags)
+    delta = encoder.encode(10, x + 0.2, x, flags)
+    assert len(delta) < 16 < len(keyframe)
+
+
+def test_decoder_waits_for_keyframe_after_gap() -> None:
+    """Deltas are ignored before the first keyframe, and after a missing frame until the next keyframe"""
+    rng = np.random.default_rng(2)
+    encoder = DeltaEncoder(50, keyframe_interval=5)
+    frames = [encoder.encode(k, x, y, flags) for k, (x, y, flags) in enumerate(random_walk(rng, 50, 10))]
+
+    decoder = DeltaDecoder()
+    assert not decoder.decode(frames[1])
+    assert decoder.frame is None
+    assert decoder.decode(frames[0])
+    assert decoder.decode(frames[1])
+    # Frame 2 is lost
+    assert not decoder.decode(frames[3])
+    assert not decoder.decode(frames[4])
+    assert decoder.frame['time_s'] == 1
+    assert decoder.decode(frames[5])
+    assert decoder.frame['time_s'] == 5
+
+
+def test_graphics_data_round_trip(make_sim) -> None:
+    """Delta frames sent by a simulation decode to the flags of its people"""
+    sim = make_sim()
+    receiver = GraphicsData()
+    for _ in range(5):
+        sim.progress_simulation(10)
+        assert receiver.apply_delta_info(sim.get_delta_graphics_data())
+        assert np.array_equal(receiver.frame['flags'], get_frame_flags(sim.city.people))
@@ -0,0 +1,54 @@
+"""CovSim Tests: Imports
+
+Module Description
+==================
+Tests that every module of the simulation can be the first one imported. The simulation modules import
+each other in a cycle through sim_manager, so a module importing its neighbours at the wrong time only
+fails when nothing else was imported before it, which is checked in a fresh interpreter.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+import os
+import subprocess
+import sys
+import pytest
+
+# Root of the repository, which the fresh interpreters import from
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Each statement is run on its own in a fresh interpreter
+FIRST_IMPORTS = [
+    'import sim',
+    'from sim.sim_manager import SimManager, SimParams',
+    'from sim.sim_components import City',
+    'from sim.population import Population',
+    'from sim.rng import SimRandom',
+    'from sim.run import run_simulation',
+    'from sim.ensemble import run_ensemble',
+    'from sim.scheduler import AdaptiveScheduler',
+    'from sim.aggregate import ContactRateModel',
+    'from sim.metrics_sink import MetricsSink',
+    'from sim.metrics import MetricsCollector',
+    'from sim.checkpoint import save_checkpoint, load_checkpoint, fork_checkpoint',
+    'from sim.trajectory import Trajectory, TrajectoryRecorder',
+    'from sim.frame_delta import DeltaEncoder, DeltaDecoder',
+    'from shared_frames import SharedFrameBuffer',
+    'from geometry.navigation import NavigationGraph',
+    'from geometry.spatial_hash import SpatialHashGrid',
+    'import sim; from sim.trajectory import Trajectory',
+]
+
+
+@pytest.mark.parametrize('statement', FIRST_IMPORTS)
+def test_first_import(statement: str) -> None:
+    """statement works in an interpreter which imported nothing else"""
+    result = subprocess.run([sys.executable, '-c', statement], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,105 @@
+"""CovSim Tests: Metrics
+
+Module Description
+==================
+Tests of the epidemiological metrics collector.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.metrics import get_metric_columns
+import sim.sim_components as sc
+import math
+import numpy as np
+import pytest
+
+
+def get_rows(sim) -> list[dict]:
+    """Return the rows recorded by the collector of sim, by column name"""
+    columns = get_metric_columns(sim.collector.names)
+    return [dict(zip(columns, row)) for row in sim.collector.sink.rows]
+
+
+def test_counts_infections_and_deaths(make_sim) -> None:
+    """Rows count the infections and deaths since the last row, and the totals so far"""
+    sim = make_sim(epi_metrics=True)
+    pop = sim.city.people
+    initially_infected = len(sim.city.infected)
+    initially_susceptible = len(sim.city.susceptible)
+    patient_zero = sim.city.infected.members[0]
+    a, b, c, d = sim.city.susceptible.members[:4]
+
+    sim.collector.record()
+    pop.set_infected(np.array([a, b]), infectors=np.array([patient_zero, patient_zero]))
+    pop.kill(np.array([a]), sc.Person.CausesOfDeath.COVID)
+    pop.kill(np.array([c]), sc.Person.CausesOfDeath.AGE)
+    # Only counted once
+    pop.kill(np.array([c]), sc.Person.CausesOfDeath.STARVATION)
+    sim.collector.record()
+
+    first, second = get_rows(sim)
+    assert first['new_infections'] == 0
+    assert first['cumulative_infections'] == initially_infected
+    assert second['new_infections'] == 2
+    assert second['cumulative_infections'] == initially_infected + 2
+    # The dead stay in the infected set
+    assert second['infected'] == initially_infected + 2
+    assert second['susceptible'] == initially_susceptible - 3
+    assert [second['deaths_' + cause.name.lower()] for cause in sc.Person.CausesOfDeath] == [1, 1, 0, 0, 0]
+    assert second['new_infections_masked'] + second['new_infections_unmasked'] == 2
+    assert sum(second[column] for column in second if column.startswith('new_infections_') and
+               column not in ('new_infections_masked', 'new_infections_unmasked',
+                              'new_infections_vaccinated', 'new_infections_unvaccinated')) == 2
+    assert sim.collector.secondary_infections[patient_zero] == 2
+
+
+def test_reproduction_number(make_sim) -> None:
+    """The reproduction number is the mean number of people infected by the cohort infected between two
+    and one windows ago"""
+    sim = make_sim(epi_metrics=['reproduction_number'])
+    pop = sim.city.people
+    patient_zero = sim.city.infected.members[0]
+    a, b, c, d = sim.city.susceptible.members[:4]
+
+    # Nobody was infected in the window before the last one
+    pop.set_infected(np.array([a, b]), infectors=np.array([patient_zero, patient_zero]))
+    sim.collector.record()
+    assert math.isnan(get_rows(sim)[-1]['reproduction_number'])
+
+    # a and b were infected a window ago, and a has since infected c and d
+    sim.city.time_s = 86400 + 1
+    pop.set_infected(np.array([c, d]), infectors=np.array([a, a]))
+    sim.collector.record()
+    assert get_rows(sim)[-1]['reproduction_number'] == 1.0
+
+    # a and b are out of the cohort two windows later, and c and d haven't infected anyone
+    sim.city.time_s = 2 * 86400 + 2
+    sim.collector.record()
+    assert get_rows(sim)[-1]['reproduction_number'] == 0.0
+
+
+def test_totals_match_population(make_sim) -> None:
+    """Over a run, the collector's counts match the infections and deaths in the population"""
+    sim = make_sim(epi_metrics=True)
+    initially_infected = len(sim.city.infected)
+    for _ in range(50):
+        sim.progress_simulation(60)
+
+    pop = sim.city.people
+    rows = get_rows(sim)
+    assert len(rows) == 50
+    assert [row['time_s'] for row in rows] == pytest.approx([60 * (k + 1) for k in range(50)])
+    assert rows[-1]['cumulative_infections'] == int(pop.was_infected.sum())
+    assert initially_infected + sum(row['new_infections'] for row in rows) == int(pop.was_infected.sum())
+    assert rows[-1]['cumulative_infections'] > initially_infected
+    deaths = np.bincount(pop.cause_of_death[pop.is_dead].astype(np.int64), minlength=len(sc.Person.CausesOfDeath))
+    assert [rows[-1]['deaths_' + cause.name.lower()] for cause in sc.Person.CausesOfDeath] == deaths.tolist()
+    # Every infection at agent level has a known infector
+    assert sim.collector.secondary_infections.sum() == int(pop.was_infected.sum()) - initially_infected
@@ -0,0 +1,128 @@
+"""CovSim Tests: Metrics Sink
+
+Module Description
+==================
+Tests of the sinks recorded rows are written to.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.metrics_sink import CsvMetricsSink, ParquetMetricsSink, MemoryMetricsSink, open_metrics_sink
+import sim.metrics_sink as metrics_sink
+import csv
+import gc
+import weakref
+import pytest
+
+
+def read_csv(filename) -> list[list[str]]:
+    """Return the rows of the csv file filename"""
+    with open(filename, newline='') as f:
+        return list(csv.reader(f))
+
+
+def test_csv_writes_in_batches(tmp_path) -> None:
+    """Rows are buffered until max_rows of them are, or the sink is closed"""
+    filename = tmp_path / 'data.csv'
+    sink = CsvMetricsSink(str(filename), ['a', 'b'], max_rows=3, max_interval_s=None)
+    sink.write_row((1, 2))
+    sink.write_row((3, 4))
+    assert read_csv(filename) == [['a', 'b']]
+    sink.write_row((5, 6))
+    assert read_csv(filename) == [['a', 'b'], ['1', '2'], ['3', '4'], ['5', '6']]
+
+    sink.write_row((7, 8))
+    sink.close()
+    assert read_csv(filename)[-1] == ['7', '8']
+
+
+def test_csv_writes_after_interval(tmp_path) -> None:
+    """A row written max_interval_s after the last write triggers a write"""
+    filename = tmp_path / 'data.csv'
+    with CsvMetricsSink(str(filename), ['a'], max_rows=100, max_interval_s=0) as sink:
+        sink.write_row((1,))
+        assert read_csv(filename) == [['a'], ['1']]
+
+
+def test_close_twice(tmp_path) -> None:
+    """Closing a sink twice does nothing, and no rows can be written to a closed sink"""
+    sink = CsvMetricsSink(str(tmp_path / 'data.csv'), ['a'])
+    sink.write_row((1,))
+    sink.close()
+    sink.close()
+    assert sink.is_closed
+    assert read_csv(tmp_path / 'data.csv') == [['a'], ['1']]
+    with pytest.raises(ValueError):
+        sink.write_row((2,))
+
+
+def test_open_sinks_are_closed_at_exit(tmp_path) -> None:
+    """Sinks still open when the program exits write out their rows, and closed sinks are forgotten"""
+    open_sink = CsvMetricsSink(str(tmp_path / 'open.csv'), ['a'], max_interval_s=None)
+    closed_sink = CsvMetricsSink(str(tmp_path / 'closed.csv'), ['a'])
+    closed_sink.close()
+    assert open_sink in metrics_sink._open_sinks
+    assert closed_sink not in metrics_sink._open_sinks
+
+    open_sink.write_row((1,))
+    metrics_sink._close_open_sinks()
+    assert open_sink.is_closed
+    assert read_csv(tmp_path / 'open.csv') == [['a'], ['1']]
+
+
+def test_open_sinks_are_not_kept_alive(tmp_path) -> None:
+    """A sink dropped without being closed is freed"""
+    sink = CsvMetricsSink(str(tmp_path / 'data.csv'), ['a'])
+    ref = weakref.ref(sink)
+    del sink
+    gc.collect()
+    assert ref() is None
+
+
+def test_memory_keeps_every_row() -> None:
+    """Rows written to a memory sink are kept right away"""
+    sink = MemoryMetricsSink(['a', 'b'])
+    sink.write_row([1, 2])
+    assert sink.rows == [(1, 2)]
+    sink.close()
+    sink.close()
+    assert sink.rows == [(1, 2)]
+
+
+def test_open_rejects_unknown_format(tmp_path) -> None:
+    """Only the formats of METRICS_FORMATS can be opened"""
+    with pytest.raises(ValueError):
+        open_metrics_sink(str(tmp_path / 'data'), ['a'], 'xlsx')
+
+
+def test_parquet_round_trip(tmp_path) -> None:
+    """Rows written to a Parquet sink are read back with their types, columns of only None being floats"""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    filename = str(tmp_path / 'data.parquet')
+    with ParquetMetricsSink(filename, ['a', 'b', 'c'], max_rows=2) as sink:
+        for k in range(5):
+            sink.write_row((k, k / 2, None))
+
+    table = parquet.read_table(filename)
+    assert table.column_names == ['a', 'b', 'c']
+    assert table.column('a').to_pylist() == [0, 1, 2, 3, 4]
+    assert table.column('b').to_pylist() == [0, 0.5, 1, 1.5, 2]
+    assert str(table.schema.field('c').type) == 'double'
+    assert parquet.ParquetFile(filename).num_row_groups == 3
+
+
+def test_parquet_without_rows(tmp_path) -> None:
+    """A Parquet sink closed without any rows still writes a file holding its columns"""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    filename = str(tmp_path / 'data.parquet')
+    ParquetMetricsSink(filename, ['a', 'b']).close()
+    table = parquet.read_table(filename)
+    assert table.column_names == ['a', 'b']
+    assert table.num_rows == 0
@@ -0,0 +1,93 @@
+"""CovSim Tests: Models
+
+Module Description
+==================
+Tests that the batched infection kernels in sim.models agree with the scalar models they replace.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from geometry.geometry import Point, Vector, Path
+import sim.models as models
+import numpy as np
+import pytest
+
+
+def random_people(rng: np.random.Generator, n: int) -> list[np.ndarray]:
+    """Return the healthy and infected person arguments of the models, for n random pairs"""
+    return [rng.uniform(-150, 120, n), rng.uniform(-150, 150, n), rng.random(n) < 0.5, rng.random(n) < 0.5,
+            rng.random(n) < 0.3, rng.random(n) < 0.3]
+
+
+@pytest.mark.parametrize('is_exact_average', [True, False])
+def test_segments_match_vectors(is_exact_average: bool) -> None:
+    """Each row of the batched kernel equals the scalar model on the same pair of vectors"""
+    rng = np.random.default_rng(1)
+    n = 300
+    # Starts within a few DU of each other, so that probabilities aren't all rounded to 0
+    x1a, y1a = rng.uniform(0, 10, n), rng.uniform(0, 10, n)
+    x2a, y2a = rng.uniform(0, 10, n), rng.uniform(0, 10, n)
+    x1b, y1b, x2b, y2b = (start + rng.normal(0, 5, n) for start in (x1a, y1a, x2a, y2a))
+    # Some people stand still
+    x2b[:20], y2b[:20] = x2a[:20], y2a[:20]
+    delta_time_s = rng.uniform(0.5, 20, n)
+    people = random_people(rng, n)
+
+    batch = models.probabilities_infected_from_segments(x1a, y1a, x1b, y1b, x2a, y2a, x2b, y2b, delta_time_s,
+                                                        *people, is_exact_average)
+    scalar = [models.probability_infected_from_vectors(
+        Vector(Point(x1a[i], y1a[i]), Point(x1b[i], y1b[i])), Vector(Point(x2a[i], y2a[i]), Point(x2b[i], y2b[i])),
+        delta_time_s[i], *(bool(a[i]) if a.dtype == bool else float(a[i]) for a in people), is_exact_average)
+        for i in range(n)]
+    assert np.allclose(batch, scalar, rtol=0, atol=1e-12)
+    assert np.count_nonzero(batch) > n // 4
+
+
+def test_exact_average_matches_sampling() -> None:
+    """The closed form average distance agrees with fine trapezoidal sampling"""
+    rng = np.random.default_rng(2)
+    coordinates = [rng.uniform(0, 50, 200) for _ in range(8)]
+    exact = models.average_distance_between_segments_batch(*coordinates, 10)
+    sampled = models.average_distance_between_segments_batch(*coordinates, 10, is_exact_average=False,
+                                                             trapezoidal_intervals_per_sec=200)
+    assert np.allclose(exact, sampled, rtol=1e-4, atol=1e-6)
+
+
+def get_knots(path: list[Point], delta_time_s: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return the times, x and y of the knots of someone walking path at constant speed over delta_time_s"""
+    x = np.array([p.x for p in path])
+    y = np.array([p.y for p in path])
+    distance = np.concatenate(([0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+    return distance / distance[-1] * delta_time_s, x, y
+
+
+def test_movements_match_paths() -> None:
+    """Each row of the batched kernel equals the scalar model on the same pair of paths with several waypoints"""
+    rng = np.random.default_rng(3)
+    n = 100
+    delta_time_s = 10.0
+    people = random_people(rng, n)
+
+    knots = []
+    scalar = []
+    for i in range(n):
+        path1 = [Point(*rng.uniform(0, 8, 2)) for _ in range(3)]
+        path2 = [Point(*rng.uniform(0, 8, 2)) for _ in range(4)]
+        knots.append((get_knots(path1, delta_time_s), get_knots(path2, delta_time_s)))
+        scalar.append(models.probability_infected_from_paths(
+            Path(path1), Path(path2), delta_time_s,
+            *(bool(a[i]) if a.dtype == bool else float(a[i]) for a in people)))
+
+    t1, x1, y1 = (np.array([k[0][m] for k in knots]) for m in range(3))
+    t2, x2, y2 = (np.array([k[1][m] for k in knots]) for m in range(3))
+    batch = models.probabilities_infected_from_movements(t1, x1, y1, t2, x2, y2, *people)
+    assert np.allclose(batch, scalar, rtol=0, atol=1e-12)
+    assert np.count_nonzero(batch) > n // 4
+
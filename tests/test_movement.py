@@ -0,0 +1,31 @@
+"""CovSim Tests: Movement
+
+Module Description
+==================
+Tests of City.move_people, which follows paths from the navigation graph without checking buildings.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+import numpy as np
+
+
+def test_people_outside_never_walk_through_buildings(make_sim) -> None:
+    """Paths avoid buildings, so nobody outside is ever found inside a building, short of its walls"""
+    sim = make_sim(seed=3)
+    rects = np.array([[b.rect.left, b.rect.top, b.rect.width, b.rect.height] for b in sim.city.buildings])
+    left, top = rects[:, 0] + 1, rects[:, 1] + 1
+    right, bottom = rects[:, 0] + rects[:, 2] - 1, rects[:, 1] + rects[:, 3] - 1
+    for _ in range(100):
+        sim.progress_simulation(10)
+        outdoor = sim.city.outdoor.members
+        x = sim.city.people.x[outdoor, None]
+        y = sim.city.people.y[outdoor, None]
+        assert not np.any((left < x) & (x < right) & (top < y) & (y < bottom))
@@ -0,0 +1,71 @@
+"""CovSim Tests: Population
+
+Module Description
+==================
+Tests of the live index sets of people kept by Population.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.population import IndexSet
+import sim.sim_components as sc
+import numpy as np
+
+
+def assert_matches(index_set: IndexSet, mask: np.ndarray) -> None:
+    """Assert that index_set holds exactly the indexes where mask is set"""
+    assert len(index_set) == mask.sum()
+    assert sorted(index_set.members.tolist()) == np.flatnonzero(mask).tolist()
+    assert all((i in index_set) == mask[i] for i in range(len(mask)))
+
+
+def test_index_set_matches_mask() -> None:
+    """Random adds and removes, with repeats and absent indexes, keep the set equal to a mask"""
+    rng = np.random.default_rng(1)
+    mask = rng.random(200) < 0.5
+    index_set = IndexSet(200, mask)
+    assert_matches(index_set, mask)
+    for _ in range(100):
+        index = rng.integers(0, 200, rng.integers(0, 10))
+        if rng.random() < 0.5:
+            index_set.add(index)
+            mask[index] = True
+        else:
+            index_set.remove(index)
+            mask[index] = False
+        assert_matches(index_set, mask)
+
+
+def test_from_members_keeps_order() -> None:
+    """Sets restored from their members hold them in the same order"""
+    index_set = IndexSet.from_members(10, np.array([7, 2, 5]))
+    assert index_set.members.tolist() == [7, 2, 5]
+    index_set.remove([2])
+    assert index_set.members.tolist() == [7, 5]
+    assert 2 not in index_set
+
+
+def test_sets_follow_the_columns(make_sim) -> None:
+    """Every index set matches the columns it mirrors, however people change state during a run. Only
+    the infected set keeps dead people"""
+    sim = make_sim(seed=2)
+    pop = sim.city.people
+    for step in range(60):
+        sim.progress_simulation(10)
+        if step == 20:
+            pop.kill(np.arange(5), sc.Person.CausesOfDeath.AGE)
+        if step == 40:
+            pop.set_infected(np.arange(10, 15), False)
+        alive = ~pop.is_dead
+        assert_matches(pop.infected, pop.is_infected)
+        assert_matches(pop.susceptible, ~pop.is_infected & alive)
+        assert_matches(pop.dead, pop.is_dead)
+        assert_matches(pop.indoor, (pop.building >= 0) & alive)
+        assert_matches(pop.outdoor, (pop.building < 0) & alive)
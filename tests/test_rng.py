@@ -0,0 +1,50 @@
+"""CovSim Tests: Random Streams
+
+Module Description
+==================
+Tests that a seed reproduces a whole run, including the names of the files it writes.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.rng import SimRandom
+import os
+
+
+def test_stable_integer_is_seeded() -> None:
+    """The same seed gives the same integer, within bounds, without advancing any stream"""
+    rng = SimRandom(5)
+    value = rng.get_stable_integer(10000, 99999)
+    assert 10000 <= value <= 99999
+    assert SimRandom(5).get_stable_integer(10000, 99999) == value
+    assert rng.get_state() == SimRandom(5).get_state()
+    assert len({SimRandom(seed).get_stable_integer(10000, 99999) for seed in range(20)}) > 1
+
+
+def test_spawned_streams_differ() -> None:
+    """Spawned streams are reproducible, and independent of each other"""
+    first = SimRandom(5).spawn(2)
+    second = SimRandom(5).spawn(2)
+    assert first[0].get_state() == second[0].get_state()
+    assert first[0].infection.random() != first[1].infection.random()
+
+
+def test_seeded_runs_write_the_same_files(make_sim, tmp_path) -> None:
+    """Two runs with the same seed write the same data to files of the same names"""
+    contents = []
+    for run in ('a', 'b'):
+        output_dir = tmp_path / run
+        sim = make_sim(seed=11, output_dir=str(output_dir), epi_metrics=True)
+        for _ in range(60):
+            sim.progress_simulation(10)
+        sim.close()
+        contents.append({name: (output_dir / name).read_text() for name in sorted(os.listdir(output_dir))})
+    assert len(contents[0]) == 2
+    assert contents[0] == contents[1]
@@ -0,0 +1,88 @@
+"""CovSim Tests: Run
+
+Module Description
+==================
+Tests of the headless entry point sim.run.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from dataclasses import asdict
+from sim.run import load_params, run_simulation, main
+from sim.scheduler import AdaptiveScheduler
+import json
+import os
+import pytest
+
+
+def test_load_json_params(small_params, tmp_path) -> None:
+    """Parameters are read back from JSON"""
+    filename = tmp_path / 'params.json'
+    filename.write_text(json.dumps(asdict(small_params)))
+    assert load_params(str(filename)) == small_params
+
+
+def test_load_yaml_params(small_params, tmp_path) -> None:
+    """Parameters are read back from YAML, when PyYAML is installed"""
+    yaml = pytest.importorskip('yaml')
+    filename = tmp_path / 'params.yaml'
+    filename.write_text(yaml.safe_dump(asdict(small_params)))
+    assert load_params(str(filename)) == small_params
+
+
+def test_params_must_be_a_mapping(tmp_path) -> None:
+    """Files not holding a mapping of fields are rejected"""
+    filename = tmp_path / 'params.json'
+    filename.write_text('[1, 2, 3]')
+    with pytest.raises(ValueError):
+        load_params(str(filename))
+
+
+def test_run_covers_the_duration(small_params) -> None:
+    """The last step is shortened so that exactly the duration is simulated, with or without a scheduler"""
+    for scheduler in (None, AdaptiveScheduler(10, 600)):
+        sim = run_simulation(small_params, 95, 10, output_dir=None, seed=1, scheduler=scheduler)
+        assert sim.city.time_s == 95
+        assert sim.metrics is None
+
+
+def test_run_switches_to_aggregate_steps(small_params) -> None:
+    """Time after aggregate_after_s is progressed in aggregate steps"""
+    sim = run_simulation(small_params, 3 * 86400 + 1000, 10, output_dir=None, seed=1, aggregate_after_s=1000)
+    assert sim.city.time_s == 3 * 86400 + 1000
+    # History rows are stamped with the time they were recorded at, through both kinds of step
+    times = [time_s for time_s, _ in sim.history]
+    assert times == sorted(set(times))
+    assert [time_s for time_s in times if time_s > 1000] == [86400 + 1000, 2 * 86400 + 1000, 3 * 86400 + 1000]
+    assert times[0] == 510
+
+
+def test_main_writes_data(small_params, tmp_path, capsys) -> None:
+    """The command line writes the data and metrics to the output folder, and only there"""
+    params = tmp_path / 'params.json'
+    params.write_text(json.dumps(asdict(small_params)))
+    output_dir = tmp_path / 'out'
+    main([str(params), '--duration', '1000', '--seed', '1', '--metrics', '--output-dir', str(output_dir)])
+    files = sorted(os.listdir(output_dir))
+    assert len(files) == 2
+    assert files[0].startswith('metrics') and files[1].startswith('sim')
+    assert 'seed 1' in capsys.readouterr().out
+
+    main([str(params), '--duration', '100', '--no-output', '--output-dir', str(tmp_path / 'none')])
+    assert not os.path.exists(tmp_path / 'none')
+
+
+@pytest.mark.parametrize('arguments', [['--duration', '-1'], ['--duration', '10', '--tick', '0'],
+                                       ['--duration', '10', '--adaptive', '--tick', '20', '--max-step', '10'],
+                                       ['--duration', '10', '--aggregate-after', '0']])
+def test_main_rejects_bad_arguments(arguments, tmp_path) -> None:
+    """Arguments which can't describe a run are rejected before it starts"""
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / 'params.json')] + arguments)
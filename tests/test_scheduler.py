@@ -0,0 +1,77 @@
+"""CovSim Tests: Scheduler
+
+Module Description
+==================
+Tests that the adaptive scheduler never steps past a possible contact.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from types import SimpleNamespace
+from sim.scheduler import AdaptiveScheduler
+import math
+import numpy as np
+
+
+def make_city(x: list[float], y: list[float], speed: list[float], is_infected: list[bool],
+              cutoff: float = 10) -> SimpleNamespace:
+    """Return a stand-in for a city of people outside at x, y, walking at speed"""
+    people = SimpleNamespace(x=np.array(x, dtype=float), y=np.array(y, dtype=float),
+                             speed_DU_s=np.array(speed, dtype=float), building=np.full(len(x), -1),
+                             is_dead=np.zeros(len(x), dtype=bool))
+    is_infected = np.array(is_infected)
+    return SimpleNamespace(people=people, infection_cutoff_radius=cutoff,
+                           infected=SimpleNamespace(members=np.flatnonzero(is_infected)),
+                           susceptible=SimpleNamespace(members=np.flatnonzero(~is_infected)))
+
+
+def get_true_time_to_contact(city) -> float:
+    """Return the earliest time any infected and healthy pair of city could come within range, by brute force"""
+    pop = city.people
+    best = math.inf
+    for i in city.infected.members:
+        for j in city.susceptible.members:
+            distance = math.hypot(pop.x[i] - pop.x[j], pop.y[i] - pop.y[j])
+            best = min(best, max(distance - city.infection_cutoff_radius, 0) / (pop.speed_DU_s[i] + pop.speed_DU_s[j]))
+    return best
+
+
+def test_slow_pair_in_reach_does_not_hide_fast_pair() -> None:
+    """A slowly closing pair found in the first window doesn't bound the time to a fast pair just out of reach"""
+    # The slow pair is 1 DU out of range, closing at 0.02 DU/s, so 50 s from contact. The fast pair is
+    # 110 DU apart, out of the 50 DU reach of the first 10 s window, but closes at 4 DU/s, so it meets in 25 s
+    city = make_city(x=[0, 11, 1000, 1110], y=[0, 0, 0, 0], speed=[0.01, 0.01, 2, 2],
+                     is_infected=[True, False, True, False])
+    scheduler = AdaptiveScheduler(contact_step_s=10, max_step_s=600)
+    assert get_true_time_to_contact(city) == 25
+    assert scheduler.get_time_to_contact(city, 600) <= 25
+    assert scheduler.next_step(city) <= 25
+
+
+def test_bound_holds_for_random_cities() -> None:
+    """The time to contact never exceeds the true earliest contact"""
+    rng = np.random.default_rng(1)
+    scheduler = AdaptiveScheduler(contact_step_s=5, max_step_s=600)
+    for _ in range(50):
+        n = 40
+        city = make_city(x=rng.uniform(0, 2000, n), y=rng.uniform(0, 2000, n), speed=rng.uniform(0.1, 3, n),
+                         is_infected=rng.random(n) < 0.3)
+        if len(city.infected.members) == 0 or len(city.susceptible.members) == 0:
+            continue
+        assert scheduler.get_time_to_contact(city, 600) <= get_true_time_to_contact(city) + 1e-9
+
+
+def test_horizon_when_nobody_can_meet() -> None:
+    """Cities without infected and healthy people outside are crossed in the longest step"""
+    city = make_city(x=[0, 10], y=[0, 0], speed=[1, 1], is_infected=[True, True])
+    assert AdaptiveScheduler(max_step_s=300).next_step(city) == 300
+
+    city = make_city(x=[0, 10000], y=[0, 0], speed=[1, 1], is_infected=[True, False])
+    assert AdaptiveScheduler(max_step_s=300).next_step(city) == 300
@@ -0,0 +1,106 @@
+"""CovSim Tests: Shared Frames
+
+Module Description
+==================
+Tests of the double buffered frames shared between the simulation and graphics processes.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from shared_frames import SharedFrameBuffer
+from sim.trajectory import get_building_rows, get_frame_flags
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def buffers(make_sim):
+    """Return a simulation, the buffer it writes to, and a reader attached to it"""
+    sim = make_sim()
+    writer = SharedFrameBuffer.create(sim.city)
+    reader = SharedFrameBuffer.attach(writer.get_handle())
+    yield sim, writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_sees_latest_frame(buffers) -> None:
+    """Readers see the buildings, nothing before the first frame, then always the latest frame"""
+    sim, writer, reader = buffers
+    assert np.array_equal(reader.buildings, get_building_rows(sim.city))
+    assert reader.read(lambda frame: frame['time_s'].item()) is None
+
+    for _ in range(3):
+        sim.progress_simulation(10)
+        writer.write_frame(sim.city)
+        frame = reader.read(lambda f: f.copy())
+        assert frame['time_s'] == sim.city.time_s
+        assert np.array_equal(frame['building'], sim.city.people.building)
+        assert np.array_equal(frame['flags'], get_frame_flags(sim.city.people))
+
+
+def test_frames_alternate_slots(buffers) -> None:
+    """Each frame goes to the slot not holding the latest one, whose counter ends even"""
+    sim, writer, reader = buffers
+    slots = []
+    for _ in range(4):
+        writer.write_frame(sim.city)
+        slots.append(int(reader._control[2]))
+    assert slots == [0, 1, 0, 1]
+    assert reader._control[:2].tolist() == [4, 4]
+
+
+def test_read_retries_overwritten_frame(buffers) -> None:
+    """A frame overwritten while it was read is read again, and given up on after retries attempts"""
+    sim, writer, reader = buffers
+    writer.write_frame(sim.city)
+
+    calls = []
+
+    def overwrite_twice(frame) -> float:
+        # Writing twice comes back around to the slot being read
+        calls.append(frame['time_s'].item())
+        if len(calls) == 1:
+            sim.city.time_s += 1
+            writer.write_frame(sim.city)
+            sim.city.time_s += 1
+            writer.write_frame(sim.city)
+        return frame['time_s'].item()
+
+    assert reader.read(overwrite_twice) == sim.city.time_s
+    assert len(calls) == 2
+
+    def always_overwrite(frame) -> float:
+        writer.write_frame(sim.city)
+        writer.write_frame(sim.city)
+        return 0.0
+
+    assert reader.read(always_overwrite, retries=2) is None
+
+
+def test_read_skips_slot_being_written(buffers) -> None:
+    """A slot whose counter is odd is being written, so it isn't read"""
+    sim, writer, reader = buffers
+    writer.write_frame(sim.city)
+    writer._control[0] += 1
+    assert reader.read(lambda frame: frame['time_s'].item(), retries=0) is None
+    writer._control[0] += 1
+    assert reader.read(lambda frame: frame['time_s'].item()) == sim.city.time_s
+
+
+def test_close_is_idempotent(make_sim) -> None:
+    """Closing twice does nothing, and the owner frees the memory"""
+    writer = SharedFrameBuffer.create(make_sim().city)
+    handle = writer.get_handle()
+    writer.close()
+    writer.close()
+    assert writer.is_closed
+    with pytest.raises(FileNotFoundError):
+        SharedFrameBuffer.attach(handle)
@@ -0,0 +1,118 @@
+"""CovSim Tests: Trajectory
+
+Module Description
+==================
+Tests of the trajectory file format written by TrajectoryRecorder and read back by Trajectory.
+
+Copyright and Usage Information
+===============================
+
+This file pertains to the CovSim simulation software. The code inside
+this file may be viewed by CSC faculty at University of Toronto. Otherwise,
+this code is only to be used by running the program. Distributing or
+using this code in any other way is prohibited.
+
+This file is Copyright (c) 2021 Aleksey Panas, Rohit Shetty.
+"""
+from sim.trajectory import Trajectory, TrajectoryRecorder, FrameFlags, HEADER_ALIGNMENT, TRAJECTORY_MAGIC, \
+    get_building_rows, get_frame_flags
+import numpy as np
+import pytest
+
+
+def test_frames_match_people(make_sim, tmp_path) -> None:
+    """Every frame holds the position and state of every person at the end of its step"""
+    filename = str(tmp_path / 'run.traj')
+    sim = make_sim(trajectory_file=filename)
+    expected = []
+    for _ in range(5):
+        sim.progress_simulation(10)
+        pop = sim.city.people
+        expected.append((sim.city.time_s, pop.x.copy(), pop.y.copy(), pop.building.copy(), get_frame_flags(pop)))
+    sim.close()
+
+    trajectory = Trajectory(filename)
+    assert len(trajectory) == 5
+    assert trajectory.num_people == len(sim.city.people)
+    assert np.array_equal(trajectory.buildings, get_building_rows(sim.city))
+    for frame, (time_s, x, y, building, flags) in zip(trajectory, expected):
+        assert frame['time_s'] == time_s
+        assert np.array_equal(frame['x'], x.astype(np.float32), equal_nan=True)
+        assert np.array_equal(frame['y'], y.astype(np.float32), equal_nan=True)
+        assert np.array_equal(frame['building'], building)
+        assert np.array_equal(frame['flags'], flags)
+
+
+def test_flags_pack_state(make_sim) -> None:
+    """Each flag is set exactly for the people in the matching state"""
+    pop = make_sim().city.people
+    flags = get_frame_flags(pop)
+    assert np.array_equal((flags & FrameFlags.INFECTED) != 0, pop.is_infected)
+    assert np.array_equal((flags & FrameFlags.WEARING_MASK) != 0, pop.is_wearing_mask)
+    assert np.array_equal((flags & FrameFlags.VACCINATED) != 0, pop.is_vaccinated)
+    assert np.array_equal((flags & FrameFlags.INDOOR) != 0, pop.building >= 0)
+    assert np.array_equal((flags & FrameFlags.DEAD) != 0, pop.is_dead)
+
+
+def test_frames_are_aligned(make_sim, tmp_path) -> None:
+    """Frames start after the magic and header, at a multiple of HEADER_ALIGNMENT"""
+    filename = str(tmp_path / 'run.traj')
+    with TrajectoryRecorder(make_sim().city, filename) as recorder:
+        recorder.record()
+    with open(filename, 'rb') as f:
+        assert f.read(len(TRAJECTORY_MAGIC)) == TRAJECTORY_MAGIC
+    assert Trajectory(filename)._offset % HEADER_ALIGNMENT == 0
+
+
+def test_interval_skips_frames(make_sim, tmp_path) -> None:
+    """No two frames are recorded less than interval_s apart"""
+    filename = str(tmp_path / 'run.traj')
+    sim = make_sim(trajectory_file=filename, trajectory_interval_s=30)
+    for _ in range(10):
+        sim.progress_simulation(10)
+    sim.close()
+    times = Trajectory(filename).times
+    assert len(times) == 4
+    assert np.all(np.diff(times) >= 30)
+
+
+def test_refresh_maps_new_frames(make_sim, tmp_path) -> None:
+    """Frames written after a trajectory was opened are read once refreshed, but partly written ones aren't"""
+    filename = str(tmp_path / 'run.traj')
+    recorder = TrajectoryRecorder(make_sim().city, filename)
+    trajectory = Trajectory(filename)
+    assert len(trajectory) == 0
+
+    recorder.record()
+    recorder.city.time_s += 10
+    recorder.record()
+    recorder._file.write(b'\0' * 5)
+    recorder._file.flush()
+    trajectory.refresh()
+    assert len(trajectory) == 2
+    recorder.close()
+    with pytest.raises(ValueError):
+        recorder.record()
+
+
+def test_get_frame_index(make_sim, tmp_path) -> None:
+    """The frame shown at a time is the last one recorded at or before it"""
+    filename = str(tmp_path / 'run.traj')
+    sim = make_sim(trajectory_file=filename)
+    for _ in range(3):
+        sim.progress_simulation(10)
+    sim.close()
+    trajectory = Trajectory(filename)
+    first = trajectory.times[0]
+    assert trajectory.get_frame_index(first - 5) == 0
+    assert trajectory.get_frame_index(first) == 0
+    assert trajectory.get_frame_index(first + 15) == 1
+    assert trajectory.get_frame_index(first + 1000) == 2
+
+
+def test_rejects_other_files(tmp_path) -> None:
+    """Files not starting with the magic aren't read as trajectories"""
+    filename = tmp_path / 'other.traj'
+    filename.write_bytes(b'not a trajectory file')
+    with pytest.raises(ValueError):
+        Trajectory(str(filename))